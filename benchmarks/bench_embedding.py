@@ -0,0 +1,61 @@
+"""
+Training step time of an Embedding layer with row-sparse gradients and
+updates vs. the same table as a dense parameter, for growing tables.
+
+    python benchmarks/bench_embedding.py [--batch_size 256] [--dim 16]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.Tensor import Tensor
+from core.layers import Dense
+from core.layers import Embedding
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+
+
+def build(num_rows, dim, sparse):
+    embedding = Embedding(num_rows, dim)
+    if not sparse:
+        # a plain parameter: dense gradient and dense optimizer state
+        table = embedding.params["w"]
+        embedding.params["w"] = Tensor(table.values, requires_grad=True, dtype=table.dtype)
+    return Model(Net([embedding, Dense(1)]), MSELoss(), Adam(lr=1e-3))
+
+
+def bench(model, ids, targets, repeat):
+    model.partial_fit(ids, targets)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.partial_fit(ids, targets)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("%9s %12s %12s" % ("rows", "dense (ms)", "sparse (ms)"))
+    for num_rows in (10000, 100000, 500000):
+        ids = rng.integers(0, num_rows, size=(args.batch_size, 2))
+        targets = rng.normal(size=(args.batch_size, 1))
+        times = [bench(build(num_rows, args.dim, sparse), ids, targets, args.repeat)
+                 for sparse in (False, True)]
+        print("%9d %12.2f %12.2f" % (num_rows, times[0] * 1e3, times[1] * 1e3))
+
+
+if __name__ == "__main__":
+    main()
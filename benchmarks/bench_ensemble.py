@@ -0,0 +1,69 @@
+"""
+K small MLPs trained as K Models vs. one ensemble Model.
+
+    python benchmarks/bench_ensemble.py [--models 32] [--steps 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.layers import Dense
+from core.layers import ReLU
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+from core.Tensor import Tensor
+
+
+def build(num_models=None):
+    net = Net([Dense(64, num_models=num_models), ReLU(),
+               Dense(64, num_models=num_models), ReLU(),
+               Dense(1, num_models=num_models)])
+    return Model(net, MSELoss(), Adam(1e-3))
+
+
+def train_step(model, x, y):
+    model.zero_grad()
+    loss = model.loss.loss(model.forward(x), y)
+    loss.backward()
+    model.step()
+    return loss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=32)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--batch_size", type=int, default=256)
+    args = parser.parse_args()
+
+    x = Tensor(np.random.randn(args.batch_size, 24))
+    y = Tensor(np.random.randn(args.batch_size, 1))
+
+    models = [build() for _ in range(args.models)]
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        for model in models:
+            train_step(model, x, y)
+    separate = time.perf_counter() - start
+
+    ensemble = build(args.models)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        train_step(ensemble, x, y)
+    batched = time.perf_counter() - start
+
+    print("%d models, %d steps" % (args.models, args.steps))
+    print("  separate models  %7.1f ms/step" % (separate / args.steps * 1e3))
+    print("  ensemble         %7.1f ms/step" % (batched / args.steps * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Single-sample latency of Model.predict vs. the frozen runtime, and the
+resident memory of a process that only loads the exported model.
+
+    python benchmarks/bench_frozen.py [--repeat 10000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT)
+
+from core.export import export
+from core.layers import Dense
+from core.layers import ReLU
+from core.model import Model
+from core.nn import Net
+
+_RSS_PROBE = """
+import sys
+import numpy as np
+%s
+x = np.zeros((1, %d), np.float32)
+y = run(x)
+print([l for l in open("/proc/self/status") if l.startswith("VmRSS")][0].split()[1])
+"""
+
+_FROZEN = """
+from core import runtime
+net = runtime.load(%r)
+run = lambda x: net.run(x, copy=False)
+"""
+
+_PICKLED = """
+import pickle
+import core.ops as ops
+from core.Tensor import Tensor
+net = pickle.load(open(%r, "rb"))
+net.set_phase("TEST")
+def run(x):
+    with ops.no_grad():
+        return net.forward(Tensor(x))
+"""
+
+
+def latency(fn, x, repeat):
+    fn(x)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(x)
+    return (time.perf_counter() - start) / repeat
+
+
+def rss_kb(setup, num_in):
+    out = subprocess.check_output([sys.executable, "-c", _RSS_PROBE % (setup, num_in)],
+                                  cwd=ROOT)
+    return int(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10000)
+    parser.add_argument("--num_in", type=int, default=120)
+    parser.add_argument("--hidden", type=int, default=256)
+    args = parser.parse_args()
+
+    net = Net([Dense(args.hidden), ReLU(), Dense(args.hidden), ReLU(), Dense(10)])
+    net.init_parameters(args.num_in, seed=0)
+    model = Model(net, None, None)
+    model.set_phase("TEST")
+
+    tmp = tempfile.mkdtemp()
+    frozen_path = os.path.join(tmp, "model.pnn")
+    pickled_path = os.path.join(tmp, "model.pkl")
+    frozen = export(net, frozen_path)
+    model.save(pickled_path)
+
+    x = np.random.randn(1, args.num_in).astype(np.float32)
+    assert np.allclose(frozen.run(x), model.predict(x), atol=1e-5)
+
+    t_predict = latency(model.predict, x, args.repeat)
+    t_frozen = latency(lambda v: frozen.run(v, copy=False), x, args.repeat)
+    print("single-sample latency")
+    print("  Model.predict    %7.1f us" % (t_predict * 1e6))
+    print("  frozen runtime   %7.1f us" % (t_frozen * 1e6))
+
+    print("resident memory after loading and one forward")
+    print("  pickled Net      %7d kB" % rss_kb(_PICKLED % pickled_path, args.num_in))
+    print("  frozen (mmap)    %7d kB" % rss_kb(_FROZEN % frozen_path, args.num_in))
+
+
+if __name__ == "__main__":
+    main()
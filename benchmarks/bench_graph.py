@@ -0,0 +1,85 @@
+"""
+Per-op overhead of the autograd graph.
+
+Builds long chains of small elementwise ops and reports the time per op
+for forward (graph construction) and backward, and the bytes held per
+graph node. Run from the repository root:
+
+    python benchmarks/bench_graph.py [--ops 20000] [--size 4]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.Tensor import Tensor
+
+
+def build_chain(x, w, n_ops):
+    # two ops per step: a mul and an add
+    y = x
+    for _ in range(n_ops // 2):
+        y = y * w + x
+    return y.sum()
+
+
+def build_fanout(x, depth):
+    # every step uses its input twice, like Tanh/Sigmoid
+    y = x
+    for _ in range(depth):
+        y = y * y + y
+    return y.sum()
+
+
+def bench_chain(n_ops, size):
+    x = Tensor(np.random.uniform(-1, 1, size) * 0.1, requires_grad=True)
+    w = Tensor(np.full(size, 0.5), requires_grad=True)
+
+    start = time.perf_counter()
+    loss = build_chain(x, w, n_ops)
+    forward = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loss.backward()
+    backward = time.perf_counter() - start
+
+    tracemalloc.start()
+    loss = build_chain(x, w, n_ops)
+    graph_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loss
+
+    print("chain of %d ops on (%d,) arrays" % (n_ops, size))
+    print("  forward   %6.2f us/op" % (forward / n_ops * 1e6))
+    print("  backward  %6.2f us/op" % (backward / n_ops * 1e6))
+    print("  graph     %6.0f bytes/node" % (graph_bytes / n_ops))
+
+
+def bench_fanout(depth, size):
+    x = Tensor(np.random.uniform(-1, 1, size) * 0.1, requires_grad=True)
+    loss = build_fanout(x, depth)
+    start = time.perf_counter()
+    loss.backward()
+    backward = time.perf_counter() - start
+    print("fan-out graph of depth %d: backward %.2f ms" % (depth, backward * 1e3))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=14)
+    args = parser.parse_args()
+
+    bench_chain(args.ops, args.size)
+    bench_fanout(args.depth, args.size)
+
+
+if __name__ == "__main__":
+    main()
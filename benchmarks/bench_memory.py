@@ -0,0 +1,66 @@
+"""
+Peak memory of a training step per batch size, as measured by
+core.memory.MemoryTracker, and the time overhead of tracking.
+
+    python benchmarks/bench_memory.py [--hidden 512] [--layers 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.layers import Dense
+from core.layers import ReLU
+from core.losses import MSELoss
+from core.memory import MemoryTracker
+from core.memory import format_bytes
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+
+
+def build(num_in, hidden, num_layers):
+    layers = []
+    for _ in range(num_layers):
+        layers += [Dense(hidden), ReLU()]
+    net = Net(layers + [Dense(1)])
+    net.init_parameters(num_in, seed=0)
+    return Model(net, MSELoss(), Adam())
+
+
+def train(model, x, y, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.partial_fit(x, y)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_in", type=int, default=128)
+    parser.add_argument("--hidden", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print("%10s %14s %12s %12s" % ("batch", "peak / step", "plain (ms)", "tracked (ms)"))
+    for batch_size in (64, 256, 1024, 4096):
+        x = rng.normal(size=(batch_size, args.num_in))
+        y = rng.normal(size=(batch_size, 1))
+        model = build(args.num_in, args.hidden, args.layers)
+        plain = train(model, x, y, args.repeat)
+        with MemoryTracker() as tracker:
+            tracked = train(model, x, y, args.repeat)
+        print("%10d %14s %12.2f %12.2f" % (batch_size, format_bytes(max(tracker.step_peaks)),
+                                           plain * 1e3, tracked * 1e3))
+    print(tracker.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fused normalization op vs. the same normalization composed of primitive
+ops: graph nodes and forward + backward time.
+
+    python benchmarks/bench_norm.py [--batch_size 256] [--features 512]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import core.ops as ops
+from core.Tensor import Tensor
+
+
+def composed(x, gamma, beta, axis, eps=1e-5):
+    n = x.shape[axis]
+    mean = ops.sum(x, axis=axis) / n
+    centered = x - ops.reshape(mean, (1, -1) if axis == 0 else (-1, 1))
+    var = ops.sum(centered * centered, axis=axis) / n
+    std = (ops.reshape(var, (1, -1) if axis == 0 else (-1, 1)) + eps) ** 0.5
+    return gamma * (centered / std) + beta
+
+
+def fused(x, gamma, beta, axis, eps=1e-5):
+    return ops.normalize(x, gamma, beta, axis=axis, eps=eps)
+
+
+def count_nodes(root):
+    seen, stack = set(), [root]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        stack.extend(t for t, _ in node.dependency)
+    return len(seen)
+
+
+def bench(fn, x, gamma, beta, axis, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        x.zero_grad()
+        gamma.zero_grad()
+        beta.zero_grad()
+        fn(x, gamma, beta, axis).backward()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--features", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    x = Tensor(np.random.randn(args.batch_size, args.features), requires_grad=True)
+    gamma = Tensor(np.ones((1, args.features)), requires_grad=True)
+    beta = Tensor(np.zeros((1, args.features)), requires_grad=True)
+    for name, axis in (("batch norm", 0), ("layer norm", 1)):
+        ref, out = composed(x, gamma, beta, axis), fused(x, gamma, beta, axis)
+        assert np.allclose(ref.values, out.values, atol=1e-4)
+        print("%s (%d x %d)" % (name, args.batch_size, args.features))
+        for label, fn in (("composed", composed), ("fused", fused)):
+            nodes = count_nodes(fn(x, gamma, beta, axis))
+            t = bench(fn, x, gamma, beta, axis, args.repeat)
+            print("  %-9s %3d nodes  %7.1f us" % (label, nodes, t * 1e6))
+
+
+if __name__ == "__main__":
+    main()
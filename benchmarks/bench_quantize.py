@@ -0,0 +1,64 @@
+"""
+Float vs. int8 frozen MLP: weight bytes, single-sample latency and the
+output / accuracy delta on random data. int8 saves weight memory only,
+its latency is above float32 (the weights are widened for the float GEMM).
+
+    python benchmarks/bench_quantize.py [--hidden 1024]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.evaluator import AccEvaluator
+from core.export import freeze
+from core.layers import Dense
+from core.layers import ReLU
+from core.nn import Net
+from core.quantize import quantize
+from core.quantize import report
+
+
+def latency(frozen, x, repeat):
+    frozen.run(x, copy=False)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        frozen.run(x, copy=False)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_in", type=int, default=120)
+    parser.add_argument("--hidden", type=int, default=1024)
+    parser.add_argument("--samples", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    net = Net([Dense(args.hidden), ReLU(), Dense(args.hidden), ReLU(), Dense(10)])
+    net.init_parameters(args.num_in, seed=0)
+    frozen = freeze(net)
+
+    x = np.random.randn(args.samples, args.num_in).astype(np.float32)
+    labels = frozen.run(x).argmax(axis=-1)
+    x1 = x[:1]
+    print("%-22s %10s %12s %12s %12s" % ("", "weights", "latency", "max |diff|", "accuracy"))
+    print("%-22s %8.2f MB %9.1f us %12s %12s" % ("float32", frozen.nbytes / 2 ** 20,
+                                               latency(frozen, x1, args.repeat) * 1e6, "-", "-"))
+    for activations in (False, True):
+        quantized = quantize(frozen, x[:1024], activations=activations)
+        result = report(frozen, quantized, x, labels, AccEvaluator())
+        name = "int8 w + int8 x" if activations else "int8 w"
+        print("%-22s %8.2f MB %9.1f us %12.4g %+12.4f" % (
+            name, result["quantized_bytes"] / 2 ** 20,
+            latency(quantized, x1, args.repeat) * 1e6,
+            result["max_abs_diff"], result["delta"]["accuracy"]))
+
+
+if __name__ == "__main__":
+    main()
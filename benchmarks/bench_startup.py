@@ -0,0 +1,55 @@
+"""
+Import time of the package in fresh interpreters.
+
+Every module is imported in its own subprocess, repeated a few times, and
+the median is reported together with the heavy optional dependencies the
+import pulled in. Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat 7]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODULES = ["numpy", "core", "core.Tensor", "core.layers", "core.nn",
+           "core.model", "core.evaluator", "utils.data_iterator"]
+
+HEAVY = ["scipy", "numexpr"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in %r if m in sys.modules]]))
+"""
+
+
+def measure(module, repeat):
+    times, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", _PROBE % (module, HEAVY)],
+                                      cwd=ROOT)
+        elapsed, heavy = json.loads(out)
+        times.append(elapsed)
+    times.sort()
+    return times[len(times) // 2], heavy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    for module in MODULES:
+        median, heavy = measure(module, args.repeat)
+        print("%-22s %7.1f ms  %s" % (module, median * 1e3, ", ".join(heavy)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Wall-clock of Trainer.fit with validation and checkpointing in the step
+loop vs. in background threads.
+
+    python benchmarks/bench_trainer.py [--epochs 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.evaluator import RMSEEvaluator
+from core.layers import Dense
+from core.layers import ReLU
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+from core.trainer import Trainer
+from utils.data_iterator import BatchIterator
+
+
+def run(background, args, data, ckpt_dir):
+    train_x, train_y, valid_x, valid_y = data
+    net = Net([Dense(args.hidden), ReLU(), Dense(args.hidden), ReLU(), Dense(1)])
+    net.init_parameters(train_x.shape[1], seed=0)
+    model = Model(net, MSELoss(), Adam(1e-3))
+    trainer = Trainer(model, BatchIterator(args.batch_size), RMSEEvaluator(),
+                      checkpoint_path=os.path.join(ckpt_dir, "ckpt_{epoch}.pkl"),
+                      background=background, verbose=False)
+    start = time.perf_counter()
+    trainer.fit(train_x, train_y, args.epochs, valid_x, valid_y)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--hidden", type=int, default=256)
+    parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--train_size", type=int, default=20000)
+    parser.add_argument("--valid_size", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = [rng.standard_normal((args.train_size, 64), dtype=np.float32),
+            rng.standard_normal((args.train_size, 1), dtype=np.float32),
+            rng.standard_normal((args.valid_size, 64), dtype=np.float32),
+            rng.standard_normal((args.valid_size, 1), dtype=np.float32)]
+    ckpt_dir = tempfile.mkdtemp()
+    blocking = run(False, args, data, ckpt_dir)
+    background = run(True, args, data, ckpt_dir)
+    print("%d epochs, %d train / %d valid samples" % (args.epochs, args.train_size, args.valid_size))
+    print("  blocking validation + checkpoints    %6.2f s" % blocking)
+    print("  background validation + checkpoints  %6.2f s" % background)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,122 @@
 import numpy as np
+import core.memory as memory
 import core.ops as ops
+import core.pool as pool
+from core.dtype import get_default_dtype
+from core.dtype import result_dtype
 
 
 def to_Tensor(obj):
     return Tensor(obj) if not isinstance(obj, Tensor) else obj
 
 
+def _new_buffer(arr, values):
+    # arr = np.asarray(values): a new buffer unless values was an array already
+    return not isinstance(values, np.ndarray) or (arr is not values and arr.base is not values)
+
+
 class Tensor(object):
+    """
+    A node of the autograd graph.
+
+    `dependency` is a tuple of (tensor, grad_fn) edges to the inputs of
+    the op that produced this tensor. Only leaves (tensors created with
+    requires_grad=True and no dependency, e.g. parameters) keep a `.grad`
+    buffer; gradients of intermediate tensors are dropped once backward
+    has propagated them.
+
+    Arrays passed in are wrapped without a copy and stay the caller's:
+    in-place operators (+=, -=, ...) write into the value buffer only when
+    the tensor owns it (`_owns_values`, e.g. parameters allocated by the
+    initializers) and copy it on the first update otherwise.
+    """
+
+    # note:__weakref__ lets core.memory track tensors without keeping them alive
+    __slots__ = ("_values", "_owns_values", "grad", "requires_grad", "dependency",
+                 "__weakref__")
 
     def __init__(self,
                  values=0,
                  requires_grad=False,
-                 dependency=None,
+                 dependency=(),
                  dtype=None):
+        if dtype is None:
+            dtype = result_dtype(values)
         self._values = np.asarray(values, dtype)
+        self._owns_values = _new_buffer(self._values, values)
         self.grad = None
         self.requires_grad = requires_grad
+        self.dependency = dependency or ()
 
-        if self.requires_grad:
+        if requires_grad and not self.dependency:
             self.zero_grad()
-
-        self.dependency = dependency
-        if self.dependency is None:
-            self.dependency = []
+        if memory._active is not None:
+            memory._active.track(self)
 
     @property
     def values(self):
         return self._values
 
     @values.setter
-    def values(self, new_values):
-        self._values = np.asarray(new_values)
+    def values(self, values):
+        new_values = np.asarray(values)
+        # note:keep the storage dtype of floating tensors (e.g. float16 params)
+        if new_values.dtype.kind == "f" and self._values.dtype.kind == "f":
+            new_values = new_values.astype(self._values.dtype, copy=False)
+        self._values = new_values
+        self._owns_values = _new_buffer(new_values, values)
         self.grad = None #赋值后清空梯度
+        if memory._active is not None:
+            memory._active.track_array(new_values, "values")
 
     @property
     def shape(self):
         return self._values.shape
 
+    @property
+    def dtype(self):
+        return self._values.dtype
+
+    def _accumulate_grad(self, g):
+        # leaf gradients: dense arrays, or ops.SparseRows from lookups
+        if isinstance(g, ops.SparseRows):
+            if self.grad is None:
+                self.grad = g
+            elif isinstance(self.grad, ops.SparseRows):
+                self.grad = self.grad + g
+            else:
+                g.add_to(self.grad)
+            return
+        if self.grad is None or isinstance(self.grad, ops.SparseRows):
+            sparse = self.grad
+            Tensor.zero_grad(self)
+            if sparse is not None:
+                sparse.add_to(self.grad)
+        self.grad += g
+
     def zero_grad(self):
-        self.grad = np.zeros(self.shape)
+        dtype = self.dtype if self.dtype.kind == "f" else get_default_dtype()
+        if (isinstance(self.grad, np.ndarray) and self.grad.shape == self.shape
+                and self.grad.dtype == dtype):
+            # note:reuse the gradient buffer instead of allocating every step
+            self.grad.fill(0)
+        else:
+            self.grad = pool.zeros(self.shape, dtype)
+
+    def _inplace(self, ufunc, other):
+        other = to_Tensor(other).values
+        if self._owns_values:
+            try:
+                # keep the value buffer (and the gradient buffer) when possible
+                ufunc(self._values, other, out=self._values, casting="same_kind")
+                return self
+            except (ValueError, TypeError):
+                # result has another shape/dtype or values are read-only
+                pass
+        self.values = ufunc(self._values, other)
+        # note:the result is a new array, later updates may go in place
+        self._owns_values = True
+        return self
 
     def __repr__(self):
         return "Tensor(values = %s, shape=%s, requires_grad=%s)" % (self.values,
@@ -63,8 +141,7 @@ class Tensor(object):
         return ops.add_(to_Tensor(other), self)
 
     def __iadd__(self, other):
-        self.values = self.values + to_Tensor(other).values
-        return self
+        return self._inplace(np.add, other)
 
     def __sub__(self, other):
         return ops.sub_(self, to_Tensor(other))
@@ -73,8 +150,7 @@ class Tensor(object):
         return ops.sub_(to_Tensor(other), self)
 
     def __isub__(self, other):
-        self.values = self.values - to_Tensor(other).values
-        return self
+        return self._inplace(np.subtract, other)
 
     def __mul__(self, other):
         return ops.mul_(self, to_Tensor(other))
@@ -83,8 +159,7 @@ class Tensor(object):
         return ops.mul_(to_Tensor(other), self)
 
     def __imul__(self, other):
-        self.values = self.values * to_Tensor(other).values
-        return self
+        return self._inplace(np.multiply, other)
 
     def __truediv__(self, other):
         return ops.div_(self, to_Tensor(other))
@@ -93,8 +168,7 @@ class Tensor(object):
         return ops.div_(to_Tensor(other), self)
 
     def __itruediv__(self, other):
-        self.values = self.values / to_Tensor(other).values
-        return self
+        return self._inplace(np.divide, other)
 
     def __neg__(self):
         return ops.neg_(self)
@@ -109,8 +183,7 @@ class Tensor(object):
         return ops.pow_(to_Tensor(other), self)
 
     def __ipow__(self, other):
-        self.values = self.values ** to_Tensor(other).values
-        return self
+        return self._inplace(np.power, other)
 
     def __matmul__(self, other):
         return ops.dot_(self, to_Tensor(other))
@@ -155,13 +228,101 @@ class Tensor(object):
 
     def backward(self, grad=None):
         assert self.requires_grad, "Call backward() on a non-requires-grad tensor."
-        grad = 1.0 if grad is None else grad
-        grad = np.array(grad)
-
-        # accumulate gradient
-        self.grad += grad
+        if grad is None:
+            dtype = self.dtype if self.dtype.kind == "f" else get_default_dtype()
+            # note:a non-scalar tensor (e.g. per-model ensemble losses)
+            # backpropagates the sum of its elements
+            grad = np.ones(self.shape, dtype=dtype)
+        grad = np.asarray(grad)
+
+        # note:每个节点只反向传播一次，多个下游节点的梯度先求和
+        grads = {id(self): grad}
+        # with a buffer pool active, count the pending gradients holding each
+        # array so that temporaries are handed back once consumed
+        recycle = pool.get_buffer_pool() is not None
+        tracker = memory.get_memory_tracker()
+        refs = {id(grad): 1}
+        bases = {}  # id(view) -> array it views
+
+        def drop(arr):
+            n = refs.pop(id(arr), 1) - 1
+            if n:
+                refs[id(arr)] = n
+                return
+            if arr is not grad:
+                pool.release(arr)
+            base = bases.pop(id(arr), None)
+            if base is not None:
+                drop(base)
+
+        for node in self._topological_order():
+            g = grads.pop(id(node))
+            if not node.dependency:
+                # leaf: accumulate gradient
+                node._accumulate_grad(g)
+                if tracker is not None:
+                    tracker.track_array(node.grad, "grads")
+                if recycle:
+                    drop(g)
+                continue
+
+            for tensor, grad_fn in node.dependency:
+                g_dep = grad_fn(g)
+                if tracker is not None:
+                    tracker.track_array(g_dep, "grads")
+                acc = grads.get(id(tensor))
+                if acc is None:
+                    grads[id(tensor)] = g_dep
+                elif isinstance(acc, ops.SparseRows) or isinstance(g_dep, ops.SparseRows):
+                    total = grads[id(tensor)] = acc + g_dep
+                else:
+                    total = np.add(acc, g_dep, out=ops._out(acc, g_dep))
+                    grads[id(tensor)] = total
+                if not recycle:
+                    continue
+                if (g_dep is not g and isinstance(g_dep, np.ndarray)
+                        and np.may_share_memory(g_dep, g)):
+                    # a view of g (reshape, transpose) keeps g alive
+                    refs[id(g)] += 1
+                    bases[id(g_dep)] = g
+                if acc is None:
+                    refs[id(g_dep)] = refs.get(id(g_dep), 0) + 1
+                else:
+                    refs[id(total)] = 1
+                    drop(acc)
+                    if g_dep is not g:
+                        drop(g_dep)
+            if recycle:
+                drop(g)
+
+    def _topological_order(self):
+        """Graph nodes behind this tensor, every node after all its consumers."""
+        order, seen = [], set()
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.append((node, True))
+            for tensor, _ in node.dependency:
+                if id(tensor) not in seen:
+                    stack.append((tensor, False))
+        order.reverse()
+        return order
+
+
+class RowSparseTensor(Tensor):
+    """
+    A leaf (e.g. an embedding table) whose gradient is kept row-sparse as
+    ops.SparseRows: zero_grad drops the gradient instead of zeroing a
+    table-sized buffer, and optimizers update only the rows looked up.
+    """
+
+    __slots__ = ()
 
-        # propagate the gradient to its dependencies
-        for dep in self.dependency:
-            grad_for_dep = dep["grad_fn"](grad)
-            dep["tensor"].backward(grad_for_dep)
+    def zero_grad(self):
+        self.grad = None
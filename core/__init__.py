@@ -0,0 +1,26 @@
+"""
+powernn core package.
+
+Submodules are imported on first attribute access (`core.layers`,
+`core.model`, ...), so `import core` itself costs next to nothing and a
+process only pays for what it uses.
+"""
+
+import importlib
+
+_SUBMODULES = ("Tensor", "autodiff", "dtype", "evaluator", "export", "fusion",
+               "initializer", "layers", "losses", "memory", "model", "nn", "ops",
+               "optimizer", "pool", "quantize", "runtime", "trace",
+               "trainer")
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module("%s.%s" % (__name__, name))
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES))
@@ -0,0 +1,402 @@
+"""
+Jacobians, vector-Jacobian and Jacobian-vector products of functions.
+
+`fn` is traced once on `x` with the trace Recorder (without building an
+autograd graph). Seeds then flow through the recorded primitives in one
+pass: cotangents backwards (vjp) or tangents forwards (jvp). A batch of k
+seeds travels as a single array with a leading seed axis, so a full
+Jacobian costs one pass over the trace instead of one backward() per
+output row. Results are dense numpy arrays; `.grad` is never touched.
+"""
+
+import numpy as np
+
+import core.ops as ops
+from core.Tensor import Tensor
+from core.trace import Recorder
+
+
+def _shift(axis, ndim):
+    # primal axis -> axis of an array with a leading seed axis
+    if axis is None:
+        return tuple(range(1, ndim + 1))
+    if isinstance(axis, tuple):
+        return tuple(a + 1 if a >= 0 else a for a in axis)
+    return axis + 1 if axis >= 0 else axis
+
+
+def _key(key):
+    return (slice(None),) + (key if isinstance(key, tuple) else (key,))
+
+
+def _unbroadcast(g, shape):
+    """Reduce a seed-batched gradient `g` to (k,) + shape."""
+    while g.ndim > len(shape) + 1:
+        g = g.sum(axis=1)
+    for i, dim in enumerate(shape):
+        if dim == 1 and g.shape[i + 1] != 1:
+            g = g.sum(axis=i + 1, keepdims=True)
+    return np.broadcast_to(g, (g.shape[0],) + tuple(shape))
+
+
+def _expand(g, axis, ndim):
+    # re-insert the reduced axes of max_/min_/sum_ (g carries a seed axis)
+    if axis is None:
+        return g.reshape(g.shape[:1] + (1,) * ndim)
+    return np.expand_dims(g, _shift(axis, ndim))
+
+
+def _extreme_mask(v, y, axis):
+    return v[0] == (y if axis is None else np.expand_dims(y, axis))
+
+
+def _tangent_sum(*terms):
+    terms = [t for t in terms if t is not None]
+    total = terms[0]
+    for t in terms[1:]:
+        total = total + t
+    return total
+
+
+# binary ops broadcasting their inputs against each other
+_BROADCASTING = {"add_", "sub_", "mul_", "div_", "pow_", "dot_", "maximum_", "minimum_",
+                 "power_flow_residual_", "normalize_"}
+
+
+def _power_flow_jvp(t, v, y, kw):
+    ybus, n = kw["ybus"], y.shape[-1] // 2
+    rotation = np.exp(1j * v[1])
+    volt = v[0] * rotation
+    dv = 0
+    if t[0] is not None:
+        dv = dv + t[0] * rotation
+    if t[1] is not None:
+        dv = dv + 1j * volt * t[1]
+    if t[0] is None and t[1] is None:
+        ds = np.zeros(y.shape[:-1] + (n,), dtype=rotation.dtype)
+    else:
+        # dS = dV * conj(I) + V * conj(Ybus dV)
+        ds = (dv * np.conj(ops._bus_currents(ybus, volt))
+              + volt * np.conj(ops._bus_currents(ybus, dv)))
+    dp = np.real(ds) if t[2] is None else np.real(ds) - t[2]
+    dq = np.imag(ds) if t[3] is None else np.imag(ds) - t[3]
+    dp, dq = np.broadcast_arrays(dp, dq)
+    return np.concatenate([dp, dq], axis=-1)
+
+
+def _normalize_stats(v, kw):
+    """x_hat and 1 / sqrt(var + eps) of a normalize_ record."""
+    x, axis = v[0], kw["axis"]
+    if kw["mean"] is None:
+        mean, var = x.mean(axis=axis, keepdims=True), x.var(axis=axis, keepdims=True)
+    else:
+        mean, var = kw["mean"], kw["var"]
+    inv_std = 1.0 / np.sqrt(var + kw["eps"])
+    return (x - mean) * inv_std, inv_std
+
+
+def _normalize_dx(t, v, kw):
+    # d x_hat / d x is self-adjoint: tangents and cotangents share the rule
+    x_hat, inv_std = _normalize_stats(v, kw)
+    if kw["mean"] is None:
+        # batch statistics depend on x too
+        axis = _shift(kw["axis"], v[0].ndim)
+        t = (t - t.mean(axis=axis, keepdims=True)
+             - x_hat * (t * x_hat).mean(axis=axis, keepdims=True))
+    return t * inv_std, x_hat
+
+
+def _normalize_jvp(t, v, y, kw):
+    dx, x_hat = None, None
+    if t[0] is not None:
+        dx, x_hat = _normalize_dx(t[0], v, kw)
+        dx = dx * v[1]
+    dgamma = None
+    if t[1] is not None:
+        if x_hat is None:
+            x_hat = _normalize_stats(v, kw)[0]
+        dgamma = t[1] * x_hat
+    return _tangent_sum(dx, dgamma, t[2])
+
+
+# forward rules: fn(tangents, input_values, output_values, attrs) returns the
+# tangent of the output, tangents of inputs independent of x are None
+_JVP = {
+    "add_": lambda t, v, y, kw: _tangent_sum(t[0], t[1]),
+    "sub_": lambda t, v, y, kw: _tangent_sum(t[0], None if t[1] is None else -t[1]),
+    "mul_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else t[0] * v[1],
+        None if t[1] is None else v[0] * t[1]),
+    "div_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else t[0] / v[1],
+        None if t[1] is None else -t[1] * y / v[1]),
+    "pow_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else t[0] * (v[1] * v[0] ** (v[1] - 1)),
+        None if t[1] is None else t[1] * (np.log(v[0]) * y)),
+    "dot_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else np.matmul(t[0], v[1]),
+        None if t[1] is None else np.matmul(v[0], t[1])),
+    "maximum_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else t[0] * (v[0] >= v[1]),
+        None if t[1] is None else t[1] * (v[1] > v[0])),
+    "minimum_": lambda t, v, y, kw: _tangent_sum(
+        None if t[0] is None else t[0] * (v[0] <= v[1]),
+        None if t[1] is None else t[1] * (v[1] < v[0])),
+    "exp_": lambda t, v, y, kw: t[0] * y,
+    "log_": lambda t, v, y, kw: t[0] / v[0],
+    "neg_": lambda t, v, y, kw: -t[0],
+    "max_": lambda t, v, y, kw: np.sum(t[0] * _extreme_mask(v, y, kw["axis"]),
+                                       axis=_shift(kw["axis"], v[0].ndim)),
+    "min_": lambda t, v, y, kw: np.sum(t[0] * _extreme_mask(v, y, kw["axis"]),
+                                       axis=_shift(kw["axis"], v[0].ndim)),
+    "sum_": lambda t, v, y, kw: np.sum(t[0], axis=_shift(kw["axis"], v[0].ndim)),
+    "transpose_": lambda t, v, y, kw: t[0].transpose(
+        (0,) + tuple(a + 1 for a in (kw["axes"] or reversed(range(v[0].ndim))))),
+    "reshape_": lambda t, v, y, kw: t[0].reshape(t[0].shape[:1] + y.shape),
+    "flatten_": lambda t, v, y, kw: t[0].reshape(t[0].shape[:1] + y.shape),
+    "getitem_": lambda t, v, y, kw: t[0][_key(kw["key"])],
+    "clip_": lambda t, v, y, kw: t[0] * ((v[0] >= (-np.inf if kw["min"] is None else kw["min"])) &
+                                         (v[0] <= (np.inf if kw["max"] is None else kw["max"]))),
+    "power_flow_residual_": _power_flow_jvp,
+    "normalize_": _normalize_jvp,
+}
+
+
+def _sum_vjp(g, v, y, kw):
+    return np.broadcast_to(_expand(g, kw["axis"], v[0].ndim), g.shape[:1] + v[0].shape)
+
+
+def _extreme_vjp(g, v, y, kw):
+    return _expand(g, kw["axis"], v[0].ndim) * _extreme_mask(v, y, kw["axis"])
+
+
+def _transpose_vjp(g, v, y, kw):
+    axes = kw["axes"]
+    if axes is None:
+        axes = reversed(range(v[0].ndim))
+    return g.transpose((0,) + tuple(int(a) + 1 for a in np.argsort(list(axes))))
+
+
+def _getitem_vjp(g, v, y, kw):
+    out = np.zeros(g.shape[:1] + v[0].shape, dtype=g.dtype)
+    out[_key(kw["key"])] = g
+    return out
+
+
+def _clip_vjp(g, v, y, kw):
+    return _JVP["clip_"]([g], v, y, kw)
+
+
+def _power_flow_vjp(index):
+    def rule(g, v, y, kw):
+        ybus, n = kw["ybus"], y.shape[-1] // 2
+        if index >= 2:
+            return -g[..., :n] if index == 2 else -g[..., n:]
+        rotation = np.exp(1j * v[1])
+        volt = v[0] * rotation
+        a = ops._power_flow_adjoint(ybus, volt, ops._bus_currents(ybus, volt), g)
+        return np.real(a * rotation) if index == 0 else -np.imag(a * volt)
+    return rule
+
+
+# reverse rules: one fn(cotangent, input_values, output_values, attrs) per
+# input, returning the (unreduced) cotangent of that input
+_VJP = {
+    "add_": (lambda g, v, y, kw: g, lambda g, v, y, kw: g),
+    "sub_": (lambda g, v, y, kw: g, lambda g, v, y, kw: -g),
+    "mul_": (lambda g, v, y, kw: g * v[1], lambda g, v, y, kw: g * v[0]),
+    "div_": (lambda g, v, y, kw: g / v[1], lambda g, v, y, kw: -g * y / v[1]),
+    "pow_": (lambda g, v, y, kw: g * (v[1] * v[0] ** (v[1] - 1)),
+             lambda g, v, y, kw: g * (np.log(v[0]) * y)),
+    "dot_": (lambda g, v, y, kw: np.matmul(g, ops._mT(v[1])),
+             lambda g, v, y, kw: np.matmul(ops._mT(v[0]), g)),
+    "maximum_": (lambda g, v, y, kw: g * (v[0] >= v[1]),
+                 lambda g, v, y, kw: g * (v[1] > v[0])),
+    "minimum_": (lambda g, v, y, kw: g * (v[0] <= v[1]),
+                 lambda g, v, y, kw: g * (v[1] < v[0])),
+    "exp_": (lambda g, v, y, kw: g * y,),
+    "log_": (lambda g, v, y, kw: g / v[0],),
+    "neg_": (lambda g, v, y, kw: -g,),
+    "max_": (_extreme_vjp,),
+    "min_": (_extreme_vjp,),
+    "sum_": (_sum_vjp,),
+    "transpose_": (_transpose_vjp,),
+    "reshape_": (lambda g, v, y, kw: g.reshape(g.shape[:1] + v[0].shape),),
+    "flatten_": (lambda g, v, y, kw: g.reshape(g.shape[:1] + v[0].shape),),
+    "getitem_": (_getitem_vjp,),
+    "clip_": (_clip_vjp,),
+    "power_flow_residual_": tuple(_power_flow_vjp(i) for i in range(4)),
+    "normalize_": (lambda g, v, y, kw: _normalize_dx(g * v[1], v, kw)[0],
+                   lambda g, v, y, kw: g * _normalize_stats(v, kw)[0],
+                   lambda g, v, y, kw: g),
+}
+
+
+class _Trace(object):
+    """The primitives of fn(x) that depend on x."""
+
+    def __init__(self, fn, x):
+        values = x.values if isinstance(x, Tensor) else x
+        self.x = Tensor(values)
+        # note:tracing in TRAIN phase must not move running statistics
+        with ops.no_grad(), ops.no_state_update(), Recorder() as recorder:
+            self.y = fn(self.x)
+
+        live = {id(self.x)}
+        self.records = []
+        for rec in recorder.records:
+            if any(id(t) in live for t in rec.inputs):
+                self.records.append(rec)
+                live.add(id(rec.output))
+        self.live = live
+
+    def _rule(self, table, rec):
+        if rec.name not in table:
+            raise NotImplementedError("No derivative rule for op %s." % rec.name)
+        return table[rec.name]
+
+    def push(self, seeds):
+        """Tangents (k,) + y.shape of the seeds (k,) + x.shape."""
+        k = len(seeds)
+        tangents = {id(self.x): seeds}
+        for rec in self.records:
+            t = [tangents.get(id(ts)) for ts in rec.inputs]
+            if rec.name in _BROADCASTING:
+                # align the primal axes of lower rank inputs with the output
+                ndim = rec.output.values.ndim
+                t = [None if tt is None else
+                     tt.reshape(tt.shape[:1] + (1,) * (ndim + 1 - tt.ndim) + tt.shape[1:])
+                     for tt in t]
+            values = [ts.values for ts in rec.inputs]
+            out = self._rule(_JVP, rec)(t, values, rec.output.values, rec.attrs)
+            tangents[id(rec.output)] = np.broadcast_to(out, (k,) + rec.output.shape)
+        tangent = tangents.get(id(self.y))
+        if tangent is None:
+            return np.zeros((k,) + self.y.shape, dtype=self.y.dtype)
+        return np.asarray(tangent)
+
+    def pull(self, seeds):
+        """Cotangents (k,) + x.shape of the seeds (k,) + y.shape."""
+        k = len(seeds)
+        grads = {id(self.y): seeds}
+        for rec in reversed(self.records):
+            g = grads.pop(id(rec.output), None)
+            if g is None:
+                continue
+            values = [ts.values for ts in rec.inputs]
+            rules = self._rule(_VJP, rec)
+            for rule, ts in zip(rules, rec.inputs):
+                if id(ts) not in self.live:
+                    continue
+                contrib = _unbroadcast(rule(g, values, rec.output.values, rec.attrs), ts.shape)
+                prev = grads.get(id(ts))
+                grads[id(ts)] = contrib if prev is None else prev + contrib
+        grad = grads.get(id(self.x))
+        if grad is None:
+            return np.zeros((k,) + self.x.shape, dtype=self.x.dtype)
+        return np.asarray(grad)
+
+
+def _seeded(trace, seeds, primal_shape, push):
+    seeds = np.asarray(seeds)
+    batched = seeds.shape != primal_shape
+    if batched and seeds.shape[1:] != primal_shape:
+        raise ValueError("Seeds must have shape %s or (k,) + %s, got %s."
+                         % (primal_shape, primal_shape, seeds.shape))
+    result = (trace.push if push else trace.pull)(seeds if batched else seeds[None])
+    return result if batched else result[0]
+
+
+def vjp(fn, x, v):
+    """
+    Return (fn(x), v^T J) where J = d fn(x) / d x.
+
+    `v` has the shape of fn(x), or (k,) + that shape for k cotangents
+    pulled back in one reverse pass (result (k,) + x.shape).
+    """
+    trace = _Trace(fn, x)
+    return trace.y.values, _seeded(trace, v, trace.y.shape, push=False)
+
+
+def jvp(fn, x, u):
+    """
+    Return (fn(x), J u) where J = d fn(x) / d x.
+
+    `u` has the shape of x, or (k,) + x.shape for k tangents pushed
+    forward in one pass (result (k,) + fn(x).shape).
+    """
+    trace = _Trace(fn, x)
+    return trace.y.values, _seeded(trace, u, trace.x.shape, push=True)
+
+
+def _eye_seeds(size, shape, start, stop, dtype):
+    seeds = np.zeros((stop - start, size), dtype=dtype)
+    seeds[np.arange(stop - start), np.arange(start, stop)] = 1
+    return seeds.reshape((stop - start,) + shape)
+
+
+def _mode(mode, num_out, num_in):
+    if mode == "auto":
+        return "rev" if num_out <= num_in else "fwd"
+    if mode not in ("rev", "fwd"):
+        raise ValueError("mode must be 'auto', 'rev' or 'fwd', got %r." % mode)
+    return mode
+
+
+def jacobian(fn, x, mode="auto", chunk_size=None):
+    """
+    Dense Jacobian of fn at x with shape fn(x).shape + x.shape.
+
+    Reverse mode ("rev") seeds every output element at once, forward mode
+    ("fwd") every input element; "auto" picks the smaller side.
+    `chunk_size` bounds the number of seeds per pass (and so the memory).
+    """
+    trace = _Trace(fn, x)
+    x_shape, y_shape = trace.x.shape, trace.y.shape
+    num_in, num_out = int(np.prod(x_shape)), int(np.prod(y_shape))
+    mode = _mode(mode, num_out, num_in)
+    dtype = np.result_type(trace.x.dtype, trace.y.dtype)
+
+    size, shape = (num_out, y_shape) if mode == "rev" else (num_in, x_shape)
+    chunk_size = chunk_size or size
+    rows = []
+    for start in range(0, size, chunk_size):
+        seeds = _eye_seeds(size, shape, start, min(start + chunk_size, size), dtype)
+        rows.append(trace.pull(seeds) if mode == "rev" else trace.push(seeds))
+    rows = np.concatenate(rows) if rows else np.zeros((0,) + shape, dtype)
+
+    if mode == "rev":
+        return rows.reshape(y_shape + x_shape)
+    return rows.reshape(num_in, num_out).T.reshape(y_shape + x_shape)
+
+
+def batch_jacobian(fn, x, mode="auto"):
+    """
+    Per-sample Jacobians of a function applied row-wise to a batch.
+
+    fn must treat the samples (first axis of x) independently, as a
+    network forward does. Returns an array of shape
+    (batch_size,) + sample output shape + sample input shape, computed
+    with one pass whose seed count is the per-sample output (or input) size.
+    """
+    trace = _Trace(fn, x)
+    x_shape, y_shape = trace.x.shape, trace.y.shape
+    batch_size = x_shape[0]
+    num_in, num_out = int(np.prod(x_shape[1:])), int(np.prod(y_shape[1:]))
+    mode = _mode(mode, num_out, num_in)
+    dtype = np.result_type(trace.x.dtype, trace.y.dtype)
+
+    # the same one-hot seed for every sample
+    if mode == "rev":
+        seeds = np.broadcast_to(np.eye(num_out, dtype=dtype)[:, None, :],
+                                (num_out, batch_size, num_out))
+        rows = trace.pull(seeds.reshape((num_out,) + y_shape))
+        # (num_out, batch, num_in) -> (batch, num_out, num_in)
+        jac = rows.reshape(num_out, batch_size, num_in).transpose(1, 0, 2)
+    else:
+        seeds = np.broadcast_to(np.eye(num_in, dtype=dtype)[:, None, :],
+                                (num_in, batch_size, num_in))
+        rows = trace.push(seeds.reshape((num_in,) + x_shape))
+        # (num_in, batch, num_out) -> (batch, num_out, num_in)
+        jac = rows.reshape(num_in, batch_size, num_out).transpose(1, 2, 0)
+    return jac.reshape((batch_size,) + y_shape[1:] + x_shape[1:])
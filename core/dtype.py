@@ -0,0 +1,117 @@
+"""Framework-wide floating point policy and loss scaling."""
+
+from contextlib import contextmanager
+
+import numpy as np
+
+_DEFAULT_DTYPE = np.float32
+# dtype used to store parameters, None means "same as the default dtype"
+_STORAGE_DTYPE = None
+
+
+def get_default_dtype():
+    return _DEFAULT_DTYPE
+
+
+def set_default_dtype(dtype):
+    """Set the dtype used for tensor values, gradients and data batches."""
+    global _DEFAULT_DTYPE
+    dtype = np.dtype(dtype)
+    if dtype.kind != "f":
+        raise ValueError("Default dtype must be a floating dtype, got %s." % dtype)
+    _DEFAULT_DTYPE = dtype.type
+
+
+def get_storage_dtype():
+    return _DEFAULT_DTYPE if _STORAGE_DTYPE is None else _STORAGE_DTYPE
+
+
+def set_storage_dtype(dtype):
+    """
+    Set the dtype parameters are stored in.
+
+    Passing np.float16 enables float16-storage/float32-compute: parameters
+    and their gradients are kept in half precision while ops promote to the
+    default dtype. Use a LossScaler to keep small gradients from underflowing.
+    Passing None restores the default dtype.
+    """
+    global _STORAGE_DTYPE
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype.kind != "f":
+            raise ValueError("Storage dtype must be a floating dtype, got %s." % dtype)
+        dtype = dtype.type
+    _STORAGE_DTYPE = dtype
+
+
+@contextmanager
+def default_dtype(dtype):
+    prev = _DEFAULT_DTYPE
+    set_default_dtype(dtype)
+    try:
+        yield
+    finally:
+        set_default_dtype(prev)
+
+
+def result_dtype(values):
+    """
+    dtype a Tensor takes for `values` when no explicit dtype is given.
+    Floating arrays and sequences take the default dtype, integer and bool
+    ones (labels, indices) keep the dtype numpy gives them. Python numbers
+    are weakly typed and take the default dtype, so that scalar operands
+    (e.g. `1.0 + x`, `x * 2`) never promote.
+    """
+    if isinstance(values, (bool, np.bool_)):
+        return None
+    if isinstance(values, (int, float)):
+        return _DEFAULT_DTYPE
+    if not isinstance(values, np.ndarray):
+        values = np.asarray(values)
+    return _DEFAULT_DTYPE if values.dtype.kind == "f" else None
+
+
+class LossScaler(object):
+    """
+    Dynamic loss scaling for float16 storage.
+
+    The loss is multiplied by `loss_scale` before backward so that small
+    gradients survive half precision. Gradients are unscaled into the
+    default dtype before the optimizer sees them. A step whose gradients
+    contain inf/nan is skipped and the scale shrinks; after
+    `growth_interval` clean steps the scale grows again.
+    """
+
+    def __init__(self,
+                 init_scale=2.0 ** 15,
+                 growth_factor=2.0,
+                 backoff_factor=0.5,
+                 growth_interval=2000):
+        self.loss_scale = init_scale
+        self._growth_factor = growth_factor
+        self._backoff_factor = backoff_factor
+        self._growth_interval = growth_interval
+        self._good_steps = 0
+
+    def scale(self, loss):
+        return loss * self.loss_scale
+
+    def unscale(self, grad):
+        grad = grad.astype(get_default_dtype())
+        grad *= 1.0 / self.loss_scale
+        return grad
+
+    def update(self, grads):
+        """Adjust the scale, return False if this step must be skipped."""
+        # note:row-sparse gradients (ops.SparseRows) are checked on their rows
+        finite = all(v is None or np.isfinite(getattr(v, "rows", v)).all()
+                     for grad in grads for v in grad.values())
+        if not finite:
+            self.loss_scale *= self._backoff_factor
+            self._good_steps = 0
+            return False
+        self._good_steps += 1
+        if self._good_steps == self._growth_interval:
+            self.loss_scale *= self._growth_factor
+            self._good_steps = 0
+        return True
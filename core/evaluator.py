@@ -0,0 +1,187 @@
+"""
+Evaluation metrics.
+
+Every evaluator accumulates over batches: call `update(preds, targets)`
+once per batch and `result()` at the end, or `evaluate(preds, targets)`
+for a single pass. Only running sums are kept, so memory does not grow
+with the size of the evaluation set.
+
+Predictions of an ensemble (num_models, batch_size, ...) are scored per
+model and the metrics come out as vectors of length num_models.
+"""
+
+import numpy as np
+
+
+def _to_array(obj):
+    return obj.values if hasattr(obj, "values") else np.asarray(obj)
+
+
+def _to_labels(obj, ensemble=False):
+    # scores / one-hot rows -> class indices
+    arr = _to_array(obj)
+    if arr.ndim == 1 or (ensemble and arr.ndim == 2):
+        return arr
+    return arr.argmax(axis=-1)
+
+
+def _sample_axes(arr):
+    # every axis but the model axis of ensemble predictions
+    return tuple(range(1, arr.ndim)) if arr.ndim == 3 else None
+
+
+class BaseEvaluator(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        raise NotImplementedError
+
+    def update(self, preds, targets):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+    def evaluate(self, preds, targets):
+        self.reset()
+        self.update(preds, targets)
+        return self.result()
+
+
+class AccEvaluator(BaseEvaluator):
+    """
+    Classification accuracy. `preds` and `targets` may be class indices,
+    or scores / one-hot rows of shape (batch_size, num_classes).
+    """
+
+    def reset(self):
+        self.total_num = 0
+        self.hit_num = 0
+
+    def update(self, preds, targets):
+        ensemble = _to_array(preds).ndim == 3
+        preds, targets = _to_labels(preds, ensemble), _to_labels(targets)
+        self.total_num += preds.shape[-1]
+        self.hit_num = self.hit_num + np.sum(preds == targets, axis=-1)
+
+    def result(self):
+        accuracy = self.hit_num / self.total_num if self.total_num else 0.0
+        return {"total_num": self.total_num,
+                "hit_num": self.hit_num,
+                "accuracy": accuracy}
+
+
+class ConfusionMatrixEvaluator(BaseEvaluator):
+    """
+    Confusion matrix with rows indexed by the true class and columns by the
+    predicted class, plus per-class precision and recall.
+    """
+
+    def __init__(self, num_classes):
+        self.num_classes = num_classes
+        super().__init__()
+
+    def reset(self):
+        self.matrix = None
+
+    def update(self, preds, targets):
+        ensemble = _to_array(preds).ndim == 3
+        preds, targets = _to_labels(preds, ensemble), _to_labels(targets)
+        n = self.num_classes
+        preds = np.atleast_2d(preds).astype(np.int64)
+        num_models = len(preds)
+        # one bincount over (model, true class, predicted class)
+        index = (np.arange(num_models)[:, None] * n + targets.astype(np.int64)) * n + preds
+        counts = np.bincount(index.ravel(), minlength=num_models * n * n)
+        counts = counts.reshape(num_models, n, n)
+        if not ensemble:
+            counts = counts[0]
+        self.matrix = counts if self.matrix is None else self.matrix + counts
+
+    def result(self):
+        n = self.num_classes
+        matrix = self.matrix if self.matrix is not None else np.zeros((n, n), np.int64)
+        hits = np.diagonal(matrix, axis1=-2, axis2=-1)
+        predicted, actual = matrix.sum(axis=-2), matrix.sum(axis=-1)
+        total_num = matrix.sum(axis=(-2, -1))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, hits / predicted, 0.0)
+            recall = np.where(actual > 0, hits / actual, 0.0)
+            accuracy = np.where(total_num > 0, hits.sum(axis=-1) / total_num, 0.0)
+        return {"confusion_matrix": matrix.copy(),
+                "accuracy": accuracy,
+                "precision": precision,
+                "recall": recall}
+
+
+class _RegressionEvaluator(BaseEvaluator):
+    # note:sums are kept in float64 so that long streams do not lose precision
+
+    def reset(self):
+        self.total_num = 0
+        self.total = 0.0
+
+    def update(self, preds, targets):
+        preds, targets = _to_array(preds), _to_array(targets)
+        err = preds.astype(np.float64) - targets
+        axes = _sample_axes(err)
+        self.total = self.total + self._error(err, targets).sum(axis=axes, dtype=np.float64)
+        self.total_num += err.size if axes is None else err[0].size
+
+    def _error(self, err, targets):
+        raise NotImplementedError
+
+    def _mean(self):
+        # an empty stream has total == 0
+        return np.divide(self.total, np.maximum(self.total_num, 1))
+
+
+class MAEEvaluator(_RegressionEvaluator):
+
+    def _error(self, err, targets):
+        return np.abs(err)
+
+    def result(self):
+        return {"total_num": self.total_num, "mae": self._mean()}
+
+
+class MSEEvaluator(_RegressionEvaluator):
+
+    def _error(self, err, targets):
+        return err * err
+
+    def result(self):
+        return {"total_num": self.total_num, "mse": self._mean()}
+
+
+class RMSEEvaluator(MSEEvaluator):
+
+    def result(self):
+        return {"total_num": self.total_num, "rmse": np.sqrt(self._mean())}
+
+
+class MAPEEvaluator(_RegressionEvaluator):
+    """
+    Mean absolute percentage error (in percent). Targets whose magnitude is
+    below `eps` (e.g. zero load) are skipped instead of dividing by zero.
+    """
+
+    def __init__(self, eps=1e-8):
+        self.eps = eps
+        super().__init__()
+
+    def update(self, preds, targets):
+        preds, targets = _to_array(preds), _to_array(targets)
+        preds, targets = np.broadcast_arrays(preds, targets)
+        mask = np.abs(targets) >= self.eps
+        err = np.abs(preds.astype(np.float64) - targets)
+        np.divide(err, np.abs(targets), out=err, where=mask)
+        err[~mask] = 0.0
+        axes = _sample_axes(err)
+        self.total = self.total + err.sum(axis=axes)
+        self.total_num = self.total_num + mask.sum(axis=axes)
+
+    def result(self):
+        return {"total_num": self.total_num, "mape": 100.0 * self._mean()}
@@ -0,0 +1,109 @@
+"""
+Freeze a trained Net into an inference-only FrozenNet (see core.runtime).
+
+Layers are lowered to the runtime's op list and constants are folded on
+the way: an activation is fused into the preceding op (bias add and
+activation run in place on the matmul output), batch norm with its
+running statistics is folded into the preceding dense op, dropout is
+dropped, and two dense ops with no nonlinearity in between are
+multiplied into one when that is not more expensive than running them
+separately.
+"""
+
+import numpy as np
+
+from core import layers
+from core.runtime import FrozenNet
+
+
+def _values(param, dtype):
+    if param is None:
+        raise ValueError("Cannot freeze a network with uninitialized parameters.")
+    # note:always a copy, a frozen net is a snapshot of the parameters
+    return np.array(param.values, dtype=dtype, order="C")
+
+
+def _freeze_dense(layer, ops, dtype):
+    w, b = _values(layer.params["w"], dtype), _values(layer.params["b"], dtype)
+    if ops and ops[-1][0] == "dense" and ops[-1][3] is None:
+        _, w0, b0, _ = ops[-1]
+        # (x @ w0 + b0) @ w + b == x @ (w0 @ w) + (b0 @ w + b)
+        folded = np.matmul(w0, w)
+        if folded.size <= w0.size + w.size:
+            ops[-1] = ("dense", folded, np.matmul(b0, w) + b, None)
+            return
+    ops.append(("dense", w, b, None))
+
+
+def _freeze_batch_norm(layer, ops, dtype):
+    gamma, beta = _values(layer.params["gamma"], dtype), _values(layer.params["beta"], dtype)
+    mean, var = layer.buffers["running_mean"], layer.buffers["running_var"]
+    scale = (gamma / np.sqrt(var + layer.eps)).astype(dtype)
+    shift = (beta - mean * scale).astype(dtype)
+    if ops and ops[-1][0] == "dense" and ops[-1][3] is None:
+        # (x @ w + b) * scale + shift == x @ (w * scale) + (b * scale + shift)
+        _, w, b, _ = ops[-1]
+        ops[-1] = ("dense", w * scale, b * scale + shift, None)
+    else:
+        ops.append(("affine", scale, shift, None))
+
+
+def _freeze_layer_norm(layer, ops, dtype):
+    gamma, beta = _values(layer.params["gamma"], dtype), _values(layer.params["beta"], dtype)
+    ops.append(("layernorm", gamma, beta, np.array(layer.eps, dtype), None))
+
+
+def _freeze_embedding(layer, ops, dtype):
+    ops.append(("embedding", _values(layer.params["w"], dtype), None))
+
+
+def _freeze_identity(layer, ops, dtype):
+    pass
+
+
+def _activation(name):
+    def freeze(layer, ops, dtype):
+        if ops and ops[-1][0] != "act" and ops[-1][-1] is None:
+            ops[-1] = ops[-1][:-1] + (name,)
+        else:
+            ops.append(("act", name))
+    return freeze
+
+
+_FREEZERS = {
+    layers.Dense: _freeze_dense,
+    layers.BatchNorm1d: _freeze_batch_norm,
+    layers.LayerNorm: _freeze_layer_norm,
+    layers.Embedding: _freeze_embedding,
+    layers.Dropout: _freeze_identity,
+    layers.ReLU: _activation("relu"),
+    layers.Sigmoid: _activation("sigmoid"),
+    layers.Tanh: _activation("tanh"),
+    layers.Softmax: _activation("softmax"),
+}
+
+
+def _flatten(layer_list):
+    for layer in layer_list:
+        if isinstance(layer, layers.Checkpoint):
+            yield from _flatten(layer.layers)
+        else:
+            yield layer
+
+
+def freeze(net, dtype=np.float32):
+    """Lower `net` (a trained Net) to a FrozenNet computing in `dtype`."""
+    ops = []
+    for layer in _flatten(net.layers):
+        freezer = _FREEZERS.get(type(layer))
+        if freezer is None:
+            raise ValueError("Cannot freeze layer %s (%s)." % (layer.name, type(layer).__name__))
+        freezer(layer, ops, dtype)
+    return FrozenNet(ops, dtype=dtype)
+
+
+def export(net, path, dtype=np.float32):
+    """Freeze `net` and write it to `path`, load it with core.runtime.load."""
+    frozen = freeze(net, dtype)
+    frozen.save(path)
+    return frozen
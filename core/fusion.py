@@ -0,0 +1,302 @@
+"""
+Elementwise-chain fusion for traced graphs.
+
+A chain is a run of elementwise primitives where each op consumes the
+previous op's output (and nothing else does), e.g. the four ops of
+Sigmoid.func. Every other input of the chain ("side" inputs such as the
+constant 1.0 or the targets of a loss) must not require grad, so the whole
+chain is a function y = f(x) of a single tensor and dy/dx is elementwise.
+
+A FusedChain runs the chain as a sequence of in-place ufuncs on the output
+buffer and computes dy/dx alongside y in a second buffer (forward-mode),
+so no intermediate is materialized and backward is a single multiply.
+Chains that need no gradient are evaluated as one numexpr expression when
+numexpr is installed and the arrays are large enough."""
+
+import numpy as np
+
+# numexpr's threading only pays off for large arrays
+NUMEXPR_MIN_SIZE = 1 << 14
+
+_numexpr = False  # not looked up yet
+
+
+def _get_numexpr():
+    # note:numexpr is optional and only imported once a large chain runs
+    global _numexpr
+    if _numexpr is False:
+        try:
+            import numexpr
+        except ImportError:
+            numexpr = None
+        _numexpr = numexpr
+    return _numexpr
+
+
+_ELEMENTWISE = {"neg_", "exp_", "log_", "add_", "sub_", "mul_", "div_",
+                "pow_", "clip_", "maximum_", "minimum_"}
+
+# numexpr templates for ops that reference the chain value once
+_EXPR = {
+    ("neg_", 0): "(-{s})",
+    ("exp_", 0): "exp({s})",
+    ("log_", 0): "log({s})",
+    ("add_", 0): "({s} + {c})",
+    ("add_", 1): "({c} + {s})",
+    ("sub_", 0): "({s} - {c})",
+    ("sub_", 1): "({c} - {s})",
+    ("mul_", 0): "({s} * {c})",
+    ("mul_", 1): "({c} * {s})",
+    ("div_", 0): "({s} / {c})",
+    ("div_", 1): "({c} / {s})",
+    ("pow_", 0): "({s} ** {c})",
+    ("pow_", 1): "({c} ** {s})",
+}
+
+
+def _chain_position(rec, tail=None):
+    """
+    Return (pos, side, square) if `rec` can extend a chain whose value is
+    `tail` (or start a new chain when tail is None), else None.
+    """
+    if rec.name not in _ELEMENTWISE:
+        return None
+    inputs = rec.inputs
+    if len(inputs) == 1:
+        pos, side, square = 0, None, False
+        if tail is not None and inputs[0] is not tail:
+            return None
+    elif inputs[0] is inputs[1]:
+        # only x * x is supported with the chain value on both sides
+        if rec.name != "mul_" or (tail is not None and inputs[0] is not tail):
+            return None
+        pos, side, square = 0, None, True
+    else:
+        if tail is not None:
+            if inputs[0] is tail:
+                pos = 0
+            elif inputs[1] is tail:
+                pos = 1
+            else:
+                return None
+        else:
+            # start from the input carrying the gradient (or the full shape)
+            pos = 0
+            if inputs[1].requires_grad or (not inputs[0].requires_grad and
+                                           inputs[0].shape != rec.output.shape):
+                pos = 1
+        side, square = inputs[1 - pos], False
+        if side.requires_grad:
+            return None
+    if rec.output.shape != inputs[pos].shape:
+        return None
+    return pos, side, square
+
+
+def fuse_elementwise(records, outputs):
+    """
+    Replace elementwise chains of length >= 2 in `records` with FusedChain
+    records. `outputs` are the tensors read from outside the plan.
+    """
+    consumers = {}
+    for rec in records:
+        for t in rec.inputs:
+            consumers[id(t)] = consumers.get(id(t), 0) + 1
+    for t in outputs:
+        consumers[id(t)] = consumers.get(id(t), 0) + 1
+
+    chains = {}   # id(tail tensor) -> list of (record, pos, side, square)
+    placed = {}   # id(last record of a chain) -> chain
+    for rec in records:
+        extended = False
+        for t in rec.inputs:
+            chain = chains.get(id(t))
+            if chain is None or consumers.get(id(t)) != 1:
+                continue
+            link = _chain_position(rec, tail=t)
+            if link is not None:
+                del chains[id(t)]
+                chain.append((rec,) + link)
+                chains[id(rec.output)] = chain
+                extended = True
+                break
+        if not extended:
+            link = _chain_position(rec)
+            if link is not None:
+                chains[id(rec.output)] = [(rec,) + link]
+
+    for chain in chains.values():
+        if len(chain) >= 2:
+            placed[id(chain[-1][0])] = chain
+
+    fused_away = {id(link[0]) for chain in placed.values() for link in chain}
+    result = []
+    for rec in records:
+        if id(rec) in placed:
+            result.append(FusedChain(placed[id(rec)]))
+        elif id(rec) not in fused_away:
+            result.append(rec)
+    return result
+
+
+def _dmul(d, factor, started):
+    if started:
+        np.multiply(d, factor, out=d)
+    else:
+        np.copyto(d, factor)
+    return True
+
+
+def _ddiv(d, factor, started):
+    if started:
+        np.divide(d, factor, out=d)
+    else:
+        np.divide(1.0, factor, out=d)
+    return True
+
+
+def _dneg(d, started):
+    if started:
+        np.negative(d, out=d)
+    else:
+        d.fill(-1)
+    return True
+
+
+class FusedChain(object):
+    """A chain of elementwise records executed as one kernel."""
+
+    name = "fused_"
+
+    def __init__(self, chain):
+        rec, pos = chain[0][:2]
+        self.input = rec.inputs[pos]
+        self.output = chain[-1][0].output
+        self.names = [link[0].name for link in chain]
+        self._steps = [(rec.name, pos, side, rec.attrs, square)
+                       for rec, pos, side, square in chain]
+        sides = [side for _, _, side, _, _ in self._steps if side is not None]
+        self.inputs = [self.input] + sides
+        self.attrs = {}
+
+        self._d = None
+        self._expr = self._build_expr()
+
+    def _build_expr(self):
+        expr = "x"
+        for i, (name, pos, side, attrs, square) in enumerate(self._steps):
+            template = _EXPR.get((name, pos))
+            if template is None or square:
+                return None
+            expr = template.format(s=expr, c="c%d" % i)
+        return expr
+
+    def _run(self, s, d):
+        """Evaluate the chain into `s`, and dy/dx into `d` unless it is None."""
+        src = self.input.values
+        started = False
+        for name, pos, side, attrs, square in self._steps:
+            c = side.values if side is not None else None
+            if name == "neg_":
+                np.negative(src, out=s)
+                if d is not None:
+                    started = _dneg(d, started)
+            elif name == "exp_":
+                np.exp(src, out=s)
+                if d is not None:
+                    started = _dmul(d, s, started)
+            elif name == "log_":
+                if d is not None:
+                    started = _ddiv(d, src, started)
+                np.log(src, out=s)
+            elif name == "add_":
+                np.add(src, c, out=s)
+            elif name == "sub_":
+                if pos == 0:
+                    np.subtract(src, c, out=s)
+                else:
+                    np.subtract(c, src, out=s)
+                    if d is not None:
+                        started = _dneg(d, started)
+            elif name == "mul_":
+                if square:
+                    if d is not None:
+                        started = _dmul(d, src, started)
+                        d *= 2
+                    np.multiply(src, src, out=s)
+                else:
+                    if d is not None:
+                        started = _dmul(d, c, started)
+                    np.multiply(src, c, out=s)
+            elif name == "div_":
+                if pos == 0:
+                    if d is not None:
+                        started = _ddiv(d, c, started)
+                    np.divide(src, c, out=s)
+                else:
+                    # D_y / D_x = -c / x**2 = -y / x
+                    if d is not None:
+                        started = _ddiv(d, src, started)
+                    np.divide(c, src, out=s)
+                    if d is not None:
+                        _dmul(d, s, started)
+                        _dneg(d, started)
+            elif name == "pow_":
+                if pos == 0:
+                    if d is not None:
+                        factor = np.power(src, c - 1)
+                        factor *= c
+                        started = _dmul(d, factor, started)
+                    np.power(src, c, out=s)
+                else:
+                    np.power(c, src, out=s)
+                    if d is not None:
+                        started = _dmul(d, s, started)
+                        _dmul(d, np.log(c), started)
+            elif name == "clip_":
+                if d is not None:
+                    mask = np.ones(src.shape, dtype=bool)
+                    if attrs["min"] is not None:
+                        mask &= src >= attrs["min"]
+                    if attrs["max"] is not None:
+                        mask &= src <= attrs["max"]
+                    started = _dmul(d, mask, started)
+                np.clip(src, attrs["min"], attrs["max"], out=s)
+            elif name in ("maximum_", "minimum_"):
+                if d is not None:
+                    if name == "maximum_":
+                        mask = src >= c if pos == 0 else src > c
+                    else:
+                        mask = src <= c if pos == 0 else src < c
+                    started = _dmul(d, mask, started)
+                if name == "maximum_":
+                    np.maximum(src, c, out=s)
+                else:
+                    np.minimum(src, c, out=s)
+            src = s
+        if d is not None and not started:
+            d.fill(1)
+
+    def forward(self):
+        out = self.output.values
+        if not self.input.requires_grad:
+            numexpr = None
+            if self._expr is not None and out.size >= NUMEXPR_MIN_SIZE:
+                numexpr = _get_numexpr()
+            if numexpr is not None:
+                local_dict = {"x": self.input.values}
+                for i, (_, _, side, _, _) in enumerate(self._steps):
+                    if side is not None:
+                        local_dict["c%d" % i] = side.values
+                numexpr.evaluate(self._expr, local_dict=local_dict, out=out,
+                                 casting="same_kind")
+            else:
+                self._run(out, None)
+            return
+
+        if self._d is None:
+            self._d = np.empty_like(out)
+        self._run(out, self._d)
+
+    def grad(self, grad, out=None):
+        return np.multiply(grad, self._d, out=out)
@@ -1,9 +1,10 @@
 """Various of network parameter initializers."""
 
 import numpy as np
-import scipy.stats as stats
 
+from core.dtype import get_storage_dtype
 from core.Tensor import Tensor
+from utils.seeder import get_rng
 
 
 def get_fans(shape):
@@ -13,32 +14,78 @@ def get_fans(shape):
 
 
 class Initializer(object):
+    """
+    Initializers draw in place, straight in the storage dtype, from a
+    np.random.Generator: the `rng` argument or the global stream of
+    utils.seeder.
+    """
 
-    def __call__(self, shape):
-        values = self.init(shape)
-        return Tensor(values, requires_grad=True, dtype=np.float32)
-
-    def init(self, shape):
+    def __call__(self, shape, num_models=None, rng=None):
+        """
+        With `num_models`, return one independent draw of `shape` per model
+        stacked along a leading model axis (used by ensemble layers).
+        """
+        if num_models is not None:
+            shape = (num_models,) + tuple(shape)
+        values = np.empty(shape, dtype=get_storage_dtype())
+        self.fill(values, num_models, rng)
+        param = Tensor(values, requires_grad=True, dtype=values.dtype)
+        # note:the buffer is ours, optimizer steps may update it in place
+        param._owns_values = True
+        return param
+
+    def fill(self, out, num_models=None, rng=None):
+        """Initialize the array `out` in place."""
+        rng = get_rng() if rng is None else rng
+        for view in (out if num_models is not None else [out]):
+            if view.dtype in (np.float32, np.float64):
+                self.init(view, rng)
+            else:
+                # note:Generator draws float32/float64 only (e.g. float16 storage)
+                tmp = np.empty(view.shape, dtype=np.float32)
+                self.init(tmp, rng)
+                view[...] = tmp
+
+    def init(self, out, rng):
         raise NotImplementedError
 
 
+def _normal(out, rng, mean, std):
+    rng.standard_normal(out=out, dtype=out.dtype)
+    out *= std
+    out += mean
+
+
+def _uniform(out, rng, low, high):
+    rng.random(out=out, dtype=out.dtype)
+    out *= high - low
+    out += low
+
+
 class NormalInit(Initializer):
 
     def __init__(self, mean=0.0, std=1.0):
         self._mean = mean
         self._std = std
 
-    def init(self, shape):
-        return np.random.normal(loc=self._mean, scale=self._std, size=shape)
+    def init(self, out, rng):
+        _normal(out, rng, self._mean, self._std)
 
 
 class TruncatedNormalInit(Initializer):
 
     def __init__(self, mean=0.0, std=1.0):
-        self._tn = stats.truncnorm(- 2 * std, 2 * std, loc=mean, scale=std)
+        self._mean = mean
+        self._std = std
+        self._tn = None
 
-    def init(self, shape):
-        return self._tn.rvs(size=shape)
+    def init(self, out, rng):
+        if self._tn is None:
+            # note:scipy is imported on first use, not with the package
+            import scipy.stats as stats
+            self._tn = stats.truncnorm(- 2 * self._std, 2 * self._std,
+                                       loc=self._mean, scale=self._std)
+        out[...] = self._tn.rvs(size=out.shape, random_state=rng)
 
 
 class UniformInit(Initializer):
@@ -47,8 +94,8 @@ class UniformInit(Initializer):
         self._a = a
         self._b = b
 
-    def init(self, shape):
-        return np.random.uniform(low=self._a, high=self._b, size=shape)
+    def init(self, out, rng):
+        _uniform(out, rng, self._a, self._b)
 
 
 class ConstantInit(Initializer):
@@ -56,8 +103,8 @@ class ConstantInit(Initializer):
     def __init__(self, val):
         self._val = val
 
-    def init(self, shape):
-        return np.full(shape=shape, fill_value=self._val)
+    def init(self, out, rng):
+        out.fill(self._val)
 
 
 class ZerosInit(ConstantInit):
@@ -80,10 +127,10 @@ class XavierUniformInit(Initializer):
     def __init__(self, gain=1.0):
         self._gain = gain
 
-    def init(self, shape):
-        fan_in, fan_out = get_fans(shape)
+    def init(self, out, rng):
+        fan_in, fan_out = get_fans(out.shape)
         a = self._gain * np.sqrt(6.0 / (fan_in + fan_out))
-        return np.random.uniform(low=-a, high=a, size=shape)
+        _uniform(out, rng, -a, a)
 
 
 class XavierNormalInit(Initializer):
@@ -99,10 +146,10 @@ class XavierNormalInit(Initializer):
     def __init__(self, gain=1.0):
         self._gain = gain
 
-    def init(self, shape):
-        fan_in, fan_out = get_fans(shape)
+    def init(self, out, rng):
+        fan_in, fan_out = get_fans(out.shape)
         std = self._gain * np.sqrt(2.0 / (fan_in + fan_out))
-        return np.random.normal(loc=0.0, scale=std, size=shape)
+        _normal(out, rng, 0.0, std)
 
 
 class HeUniformInit(Initializer):
@@ -118,10 +165,10 @@ class HeUniformInit(Initializer):
     def __init__(self, gain=1.0):
         self._gain = gain
 
-    def init(self, shape):
-        fan_in, _ = get_fans(shape)
+    def init(self, out, rng):
+        fan_in, _ = get_fans(out.shape)
         a = self._gain * np.sqrt(6.0 / fan_in)
-        return np.random.uniform(low=-a, high=a, size=shape)
+        _uniform(out, rng, -a, a)
 
 
 class HeNormalInit(Initializer):
@@ -137,7 +184,7 @@ class HeNormalInit(Initializer):
     def __init__(self, gain=1.0):
         self._gain = gain
 
-    def init(self, shape):
-        fan_in, _ = get_fans(shape)
+    def init(self, out, rng):
+        fan_in, _ = get_fans(out.shape)
         std = self._gain * np.sqrt(2.0 / fan_in)
-        return np.random.normal(loc=0.0, scale=std, size=shape)
+        _normal(out, rng, 0.0, std)
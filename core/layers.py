@@ -3,8 +3,12 @@
 import numpy as np
 
 import core.ops as ops
+from core.initializer import ConstantInit
+from core.initializer import NormalInit
 from core.initializer import XavierUniformInit
 from core.initializer import ZerosInit
+from core.Tensor import RowSparseTensor
+from utils.seeder import get_rng
 
 
 class Layer(object):
@@ -13,6 +17,8 @@ class Layer(object):
         self.name = name
 
         self.params, self.grads = {}, {}
+        # note:non-trainable state such as running statistics, updated in place
+        self.buffers = {}
         self.is_training = True
 
     # note:override this in your layer
@@ -22,6 +28,17 @@ class Layer(object):
     def set_phase(self, phase):
         self.is_training = True if phase == "TRAIN" else False
 
+    def param_specs(self, num_in):
+        """
+        Parameters this layer creates for inputs with `num_in` features, as
+        a list of (name, shape, initializer, num_models), and the number of
+        output features. Used by Net.init_parameters.
+        """
+        return [], num_in
+
+    def bind_params(self, params):
+        self.params.update(params)
+
     # todo pprint  parameters of layer
     # note:you can override this
     def __repr__(self) -> str:
@@ -29,18 +46,30 @@ class Layer(object):
 
 
 class Dense(Layer):
+    """
+    Fully connected layer.
+
+    With `num_models=K` the layer holds K independent models: w has shape
+    (K, num_in, num_out) and b (K, 1, num_out). Inputs of shape
+    (batch_size, num_in) are shared by all models, inputs of shape
+    (K, batch_size, num_in) are per model, and outputs always have shape
+    (K, batch_size, num_out), so a Net of ensemble layers trains K models
+    with batched matmuls in one pass.
+    """
 
     def __init__(self,
                  num_out,
                  num_in=None,
                  w_init=XavierUniformInit(),
-                 b_init=ZerosInit()):
+                 b_init=ZerosInit(),
+                 num_models=None):
         super().__init__("Linear")
 
         # note:bind initialization function for this layer
         self.initializers = {"w": w_init, "b": b_init}
         self.shapes = {"w": [num_in, num_out], "b": [1, num_out]}
         self.params = {"w": None, "b": None}
+        self.num_models = num_models
 
         self.is_init = False
         if num_in is not None:
@@ -51,24 +80,69 @@ class Dense(Layer):
     def forward(self, inputs):
         # note:initialize parameters denpending on shape of inputs while this layer hasn't been initialized
         if not self.is_init:
-            self._init_parameters(inputs.shape[1])
+            self._init_parameters(inputs.shape[-1])
 
         self.inputs = inputs
         # todo:change this
         return inputs @ self.params["w"] + self.params["b"]
 
+    def param_specs(self, num_in):
+        self.shapes["w"][0] = num_in
+        specs = [(name, tuple(self.shapes[name]), self.initializers[name], self.num_models)
+                 for name in ("w", "b")]
+        return specs, self.shapes["w"][1]
+
+    def bind_params(self, params):
+        super().bind_params(params)
+        self.is_init = True
+
     # todo
     def _init_parameters(self, input_size):
         self.shapes["w"][0] = input_size
 
-        self.params["w"] = self.initializers["w"](shape=self.shapes["w"])
-        self.params["b"] = self.initializers["b"](shape=self.shapes["b"])
+        self.params["w"] = self.initializers["w"](self.shapes["w"], self.num_models)
+        self.params["b"] = self.initializers["b"](self.shapes["b"], self.num_models)
 
         self.params["w"].zero_grad()
         self.params["b"].zero_grad()
         self.is_init = True
 
 
+class Embedding(Layer):
+    """
+    Lookup table of `num_embeddings` learned rows of size `embedding_dim`,
+    e.g. one vector per device id. Inputs are integer ids of shape
+    (batch_size,) or (batch_size, num_fields), all fields sharing the
+    table; outputs have shape (batch_size, num_fields * embedding_dim).
+
+    The table is a RowSparseTensor: backward yields a row-sparse gradient
+    and the optimizers update only the rows looked up, so a step costs
+    O(batch_size) however many rows the table has.
+    """
+
+    def __init__(self, num_embeddings, embedding_dim, w_init=NormalInit()):
+        super().__init__("Embedding")
+        self.initializers = {"w": w_init}
+        self.shapes = {"w": [num_embeddings, embedding_dim]}
+        self.params = {"w": None}
+        # note:the table does not depend on the inputs, create it right away
+        self.bind_params({"w": w_init(self.shapes["w"])})
+
+    def forward(self, inputs):
+        outputs = ops.embedding(self.params["w"], inputs)
+        if len(outputs.shape) > 2:
+            outputs = ops.reshape(outputs, (outputs.shape[0], -1))
+        return outputs
+
+    def param_specs(self, num_in):
+        spec = ("w", tuple(self.shapes["w"]), self.initializers["w"], None)
+        return [spec], num_in * self.shapes["w"][1]
+
+    def bind_params(self, params):
+        w = params["w"]
+        super().bind_params({"w": RowSparseTensor(w.values, requires_grad=True, dtype=w.dtype)})
+
+
 class Softmax(Layer):
 
     def __init__(self,
@@ -121,3 +195,181 @@ class ReLU(Activation):
 
     def func(self, x):
         return ops.clip(x, 0.0)
+
+
+class _Normalization(Layer):
+    """Learned per-feature scale gamma and shift beta, created lazily like Dense."""
+
+    def __init__(self, name, num_features=None, eps=1e-5, num_models=None):
+        super().__init__(name)
+        self.eps = eps
+        self.num_models = num_models
+        self.initializers = {"gamma": ConstantInit(1.0), "beta": ZerosInit()}
+        self.shapes = {"gamma": [1, num_features], "beta": [1, num_features]}
+        self.params = {"gamma": None, "beta": None}
+
+        self.is_init = False
+        if num_features is not None:
+            self._init_parameters(num_features)
+
+    def param_specs(self, num_in):
+        self.shapes["gamma"][1] = self.shapes["beta"][1] = num_in
+        specs = [(name, tuple(self.shapes[name]), self.initializers[name], self.num_models)
+                 for name in ("gamma", "beta")]
+        return specs, num_in
+
+    def bind_params(self, params):
+        super().bind_params(params)
+        self._init_state()
+        self.is_init = True
+
+    def _init_parameters(self, num_features):
+        self.shapes["gamma"][1] = self.shapes["beta"][1] = num_features
+        for name in ("gamma", "beta"):
+            self.params[name] = self.initializers[name](self.shapes[name], self.num_models)
+        self._init_state()
+        self.is_init = True
+
+    def _init_state(self):
+        pass
+
+
+class BatchNorm1d(_Normalization):
+    """
+    Batch normalization over the batch axis of (batch_size, num_features)
+    inputs, per model for ensemble inputs (num_models, batch_size,
+    num_features).
+
+    In TRAIN phase the batch statistics are used and the running statistics
+    are updated in place with `momentum`; in TEST phase the running
+    statistics are used.
+    """
+
+    def __init__(self, num_features=None, momentum=0.1, eps=1e-5, num_models=None):
+        self.momentum = momentum
+        super().__init__("BatchNorm1d", num_features, eps, num_models)
+
+    def _init_state(self):
+        gamma = self.params["gamma"]
+        # note:running statistics stay in at least float32 with float16 storage
+        dtype = np.promote_types(gamma.dtype, np.float32)
+        self.buffers = {"running_mean": np.zeros(gamma.shape, dtype),
+                        "running_var": np.ones(gamma.shape, dtype)}
+
+    def forward(self, inputs):
+        if not self.is_init:
+            self._init_parameters(inputs.shape[-1])
+        gamma, beta = self.params["gamma"], self.params["beta"]
+        mean, var = self.buffers["running_mean"], self.buffers["running_var"]
+        # ensemble inputs are normalized per model, unless the layer is shared
+        axis = -2 if self.num_models is not None else tuple(range(len(inputs.shape) - 1))
+        if self.is_training:
+            return ops.normalize(inputs, gamma, beta, axis=axis, eps=self.eps,
+                                 running=(mean, var, self.momentum))
+        return ops.normalize(inputs, gamma, beta, axis=axis, eps=self.eps, mean=mean, var=var)
+
+
+class LayerNorm(_Normalization):
+    """Layer normalization over the feature (last) axis."""
+
+    def __init__(self, num_features=None, eps=1e-5, num_models=None):
+        super().__init__("LayerNorm", num_features, eps, num_models)
+
+    def forward(self, inputs):
+        if not self.is_init:
+            self._init_parameters(inputs.shape[-1])
+        return ops.normalize(inputs, self.params["gamma"], self.params["beta"],
+                             axis=-1, eps=self.eps)
+
+
+class Dropout(Layer):
+    """
+    Inverted dropout: in TRAIN phase each element is zeroed with probability
+    `rate` and the rest are scaled by 1 / (1 - rate); in TEST phase the
+    layer passes its inputs through untouched. Masks are drawn from `rng`
+    (a np.random.Generator), or from the global stream of utils.seeder.
+    """
+
+    def __init__(self, rate=0.5, rng=None):
+        super().__init__("Dropout")
+        if not 0.0 <= rate < 1.0:
+            raise ValueError("Dropout rate must be in [0, 1), got %s." % rate)
+        self.rate = rate
+        self.rng = rng
+
+    def forward(self, inputs):
+        if not self.is_training or self.rate == 0.0:
+            return inputs
+        rng = get_rng() if self.rng is None else self.rng
+        return ops.dropout(inputs, self.rate, rng)
+
+
+class Checkpoint(Layer):
+    """
+    Gradient checkpointing for a segment of layers.
+
+    Forward runs the segment without building a graph and keeps only the
+    segment input. Backward recomputes the segment forward from that input
+    and backpropagates through it, trading one extra forward for the
+    activation memory of the segment. The recompute reuses the dropout
+    masks of the forward and does not update batch norm running statistics
+    again. Parameters of the wrapped layers are exposed as "<index>.<name>"
+    in self.params.
+    """
+
+    def __init__(self, layers):
+        super().__init__("Checkpoint")
+        self.layers = list(layers)
+        self._pull_params()
+
+    def _run(self, inputs):
+        for layer in self.layers:
+            inputs = layer.forward(inputs)
+        # note:layers such as Dense keep their inputs, which would hold the
+        # activations of the no-grad forward and the graph of the recompute
+        for layer in self.layers:
+            if getattr(layer, "inputs", None) is not None:
+                layer.inputs = None
+        return inputs
+
+    def _push_params(self):
+        # note:pick up parameters replaced through Net.set_parameters
+        for key, param in self.params.items():
+            i, name = key.split(".", 1)
+            self.layers[int(i)].params[name] = param
+
+    def _pull_params(self):
+        self.params = {"%d.%s" % (i, name): param
+                       for i, layer in enumerate(self.layers)
+                       for name, param in layer.params.items()}
+        self.buffers = {"%d.%s" % (i, name): buf
+                        for i, layer in enumerate(self.layers)
+                        for name, buf in layer.buffers.items()}
+
+    def param_specs(self, num_in):
+        specs = []
+        for i, layer in enumerate(self.layers):
+            layer_specs, num_in = layer.param_specs(num_in)
+            specs += [("%d.%s" % (i, spec[0]),) + spec[1:] for spec in layer_specs]
+        return specs, num_in
+
+    def bind_params(self, params):
+        for i, layer in enumerate(self.layers):
+            prefix = "%d." % i
+            layer_params = {key[len(prefix):]: param for key, param in params.items()
+                            if key.startswith(prefix)}
+            if layer_params:
+                layer.bind_params(layer_params)
+        self._pull_params()
+
+    def forward(self, inputs):
+        self._push_params()
+        outputs = ops.checkpoint(inputs, self._run)
+        # parameters of lazily initialized layers exist from now on
+        self._pull_params()
+        return outputs
+
+    def set_phase(self, phase):
+        super().set_phase(phase)
+        for layer in self.layers:
+            layer.set_phase(phase)
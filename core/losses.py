@@ -0,0 +1,52 @@
+"""
+Loss functions, built from ops so that backward comes from autograd.
+
+Predictions of an ensemble (num_models, batch_size, num_out) give a vector
+of per-model losses, backward on it trains every model on its own loss.
+"""
+
+import core.ops as ops
+
+
+def _batch_mean(ts, predicted):
+    """Sum `ts` per sample and average over the batch (per model)."""
+    if len(predicted.shape) == 3:
+        return ops.sum(ts, axis=(1, 2)) / predicted.shape[1]
+    return ops.sum(ts) / predicted.shape[0]
+
+
+class BaseLoss(object):
+
+    def loss(self, predicted, actual):
+        raise NotImplementedError
+
+
+class MSELoss(BaseLoss):
+
+    def loss(self, predicted, actual):
+        err = predicted - actual
+        return 0.5 * _batch_mean(err * err, predicted)
+
+
+class MAELoss(BaseLoss):
+
+    def loss(self, predicted, actual):
+        err = predicted - actual
+        # |x| = max(x, -x)
+        return _batch_mean(ops.maximum(err, -err), predicted)
+
+
+class SoftmaxCrossEntropyLoss(BaseLoss):
+
+    def loss(self, logits, labels):
+        """
+        Args:
+            logits: (batch_size, num_classes), or
+                (num_models, batch_size, num_classes) for an ensemble
+            labels: one-hot labels of shape (batch_size, num_classes)
+        """
+        keep = logits.shape[:-1] + (1,)
+        # shift by the row max for numerical stability
+        shifted = logits - logits.max(axis=-1).reshape(keep)
+        log_z = ops.log(ops.sum(ops.exp(shifted), axis=-1)).reshape(keep)
+        return -_batch_mean(labels * (shifted - log_z), logits)
@@ -0,0 +1,240 @@
+"""
+Memory tracker for autograd graphs.
+
+While a MemoryTracker is active (`with tracker:`), every Tensor created
+(by the ops in core.ops or directly) is registered with the arrays its
+grad_fns capture in their closures, and backward registers the gradients
+it produces. Bytes are counted once per underlying buffer, so views
+(reshape, transpose, ...) are free, and are subtracted again as soon as
+the buffer is freed. The tracker reports
+
+    live and peak bytes, split into "values", "grads" and "closures"
+    per layer: peak bytes while the layer runs forward inside
+        Net.forward, and the change in live bytes it leaves behind
+        (negative when it frees the graph of the previous step), keyed
+        by "<index>.<Layer.name>"
+    per step: peak bytes between two end_step() calls (Model.step
+        makes one)
+
+and `dump_graph` lists the live graph with the bytes held by each node,
+together with the layer attributes that still point into it (e.g. a
+retained Dense.inputs).
+"""
+
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+
+_active = None
+
+CATEGORIES = ("values", "grads", "closures")
+
+
+def get_memory_tracker():
+    return _active
+
+
+def _owner(arr):
+    # the array owning the memory of a view
+    while isinstance(arr.base, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+def _closure_arrays(grad_fn):
+    for cell in getattr(grad_fn, "__closure__", None) or ():
+        try:
+            obj = cell.cell_contents
+        except ValueError:
+            # empty cell
+            continue
+        for item in obj if isinstance(obj, (tuple, list)) else (obj,):
+            if isinstance(item, np.ndarray):
+                yield item
+
+
+def _op_name(tensor):
+    if not tensor.dependency:
+        return "leaf" if tensor.requires_grad else "input"
+    # e.g. "matmul_.<locals>.grad_fn1" -> "matmul"
+    name = getattr(tensor.dependency[0][1], "__qualname__", "?").split(".")[0]
+    return name.rstrip("_") or name
+
+
+def format_bytes(n):
+    if abs(n) < 1024:
+        return "%d B" % n
+    for unit in ("KB", "MB", "GB"):
+        n /= 1024.0
+        if abs(n) < 1024 or unit == "GB":
+            return "%.1f %s" % (n, unit)
+
+
+class MemoryTracker(object):
+
+    def __init__(self):
+        self._buffers = {}  # id(owner array) -> (category, nbytes, weakref)
+        self._tensors = {}  # id(tensor) -> weakref
+        self._layers = []  # [key, peak] of the layers running forward
+        self.live = dict.fromkeys(CATEGORIES, 0)
+        self.live_bytes = 0
+        self.layer_peaks = {}
+        self.layer_deltas = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.peak_bytes = self.live_bytes
+        self.step_peaks = []
+        self._step_peak = self.live_bytes
+        self.layer_peaks.clear()
+        self.layer_deltas.clear()
+
+    def __enter__(self):
+        global _active
+        self._prev, _active = _active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active, self._prev = self._prev, None
+
+    def track_array(self, arr, category):
+        if not isinstance(arr, np.ndarray):
+            # e.g. ops.SparseRows gradients
+            for part in (getattr(arr, "indices", None), getattr(arr, "rows", None)):
+                if isinstance(part, np.ndarray):
+                    self.track_array(part, category)
+            return
+        owner = _owner(arr)
+        key = id(owner)
+        if key in self._buffers:
+            return
+        nbytes = owner.nbytes
+        ref = weakref.ref(owner, lambda _, k=key: self._forget(k))
+        self._buffers[key] = (category, nbytes, ref)
+        self.live[category] += nbytes
+        self.live_bytes += nbytes
+        live = self.live_bytes
+        if live > self._step_peak:
+            self._step_peak = live
+            if live > self.peak_bytes:
+                self.peak_bytes = live
+        for entry in self._layers:
+            if live > entry[1]:
+                entry[1] = live
+
+    def _forget(self, key):
+        entry = self._buffers.pop(key, None)
+        if entry is not None:
+            self.live[entry[0]] -= entry[1]
+            self.live_bytes -= entry[1]
+
+    def track(self, tensor):
+        """Register a tensor, its gradient, its closures and untracked inputs."""
+        stack = [tensor]
+        while stack:
+            t = stack.pop()
+            key = id(t)
+            if key in self._tensors:
+                continue
+            self._tensors[key] = weakref.ref(t, lambda _, k=key: self._tensors.pop(k, None))
+            self.track_array(t.values, "values")
+            if t.grad is not None:
+                self.track_array(t.grad, "grads")
+            for dep, grad_fn in t.dependency:
+                for arr in _closure_arrays(grad_fn):
+                    self.track_array(arr, "closures")
+                # note:pick up leaves created before the tracker was active
+                stack.append(dep)
+
+    def live_tensors(self):
+        tensors = (ref() for ref in list(self._tensors.values()))
+        return [t for t in tensors if t is not None]
+
+    @contextmanager
+    def layer(self, key):
+        start = self.live_bytes
+        entry = [key, start]
+        self._layers.append(entry)
+        try:
+            yield
+        finally:
+            self._layers.remove(entry)
+            self.layer_peaks[key] = max(self.layer_peaks.get(key, 0), entry[1])
+            self.layer_deltas[key] = self.live_bytes - start
+
+    def end_step(self):
+        """Close the current step and return its peak bytes."""
+        self.step_peaks.append(self._step_peak)
+        self._step_peak = self.live_bytes
+        return self.step_peaks[-1]
+
+    def summary(self):
+        lines = ["live %s (%s), peak %s" % (
+            format_bytes(self.live_bytes),
+            ", ".join("%s %s" % (c, format_bytes(self.live[c])) for c in CATEGORIES),
+            format_bytes(self.peak_bytes))]
+        if self.step_peaks:
+            lines.append("steps %d, peak per step: last %s, max %s" % (
+                len(self.step_peaks), format_bytes(self.step_peaks[-1]),
+                format_bytes(max(self.step_peaks))))
+        if self.layer_peaks:
+            lines.append("%-24s %12s %12s" % ("layer", "peak", "delta"))
+            for key, peak in self.layer_peaks.items():
+                lines.append("%-24s %12s %12s" % (key, format_bytes(peak),
+                                                   format_bytes(self.layer_deltas[key])))
+        return "\n".join(lines)
+
+    def dump_graph(self, root=None, net=None):
+        """
+        One line per live tensor (the graph behind `root`, or every tracked
+        tensor) with its op, shape and bytes; a buffer shared by views is
+        charged to the first tensor listed. With `net`, tensors held by
+        layer attributes are marked with the holder, e.g. "0.Linear.inputs".
+        """
+        if root is not None:
+            nodes = root._topological_order()[::-1]
+        else:
+            nodes = self.live_tensors()
+        holders = {}
+        for key, layer in _named_layers(net.layers if net is not None else ()):
+            for attr, value in vars(layer).items():
+                if hasattr(value, "dependency") and attr not in ("params", "grads", "buffers"):
+                    holders.setdefault(id(value), []).append("%s.%s" % (key, attr))
+
+        seen, total = set(), dict.fromkeys(CATEGORIES, 0)
+        lines = ["%-12s %-14s %-18s %10s %10s %10s" % (
+            "id", "op", "shape", "values", "grad", "closures")]
+        for t in nodes:
+            sizes = dict.fromkeys(CATEGORIES, 0)
+            arrays = [(t.values, "values")]
+            if t.grad is not None:
+                arrays.append((t.grad, "grads"))
+            arrays += [(a, "closures") for _, fn in t.dependency for a in _closure_arrays(fn)]
+            for arr, category in arrays:
+                for part in (arr,) if isinstance(arr, np.ndarray) else (arr.indices, arr.rows):
+                    owner = _owner(part)
+                    if id(owner) not in seen:
+                        seen.add(id(owner))
+                        sizes[category] += owner.nbytes
+            for c in CATEGORIES:
+                total[c] += sizes[c]
+            held = holders.get(id(t))
+            lines.append("%-12x %-14s %-18s %10s %10s %10s%s" % (
+                id(t) & 0xffffffffffff, _op_name(t), tuple(t.shape),
+                format_bytes(sizes["values"]), format_bytes(sizes["grads"]),
+                format_bytes(sizes["closures"]),
+                "  <- " + ", ".join(held) if held else ""))
+        lines.append("%d tensors, %s" % (len(nodes), ", ".join(
+            "%s %s" % (c, format_bytes(total[c])) for c in CATEGORIES)))
+        return "\n".join(lines)
+
+
+def _named_layers(layer_list, prefix=""):
+    for i, layer in enumerate(layer_list):
+        key = "%s%d.%s" % (prefix, i, layer.name)
+        yield key, layer
+        # note:layers wrapped by a Checkpoint
+        if hasattr(layer, "layers"):
+            yield from _named_layers(layer.layers, key + ".")
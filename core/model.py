@@ -2,19 +2,91 @@
 
 import pickle
 
+import numpy as np
+
+import core.memory as memory
+import core.ops as ops
+from core.Tensor import Tensor
+
 
 class Model(object):
 
-    def __init__(self, net, loss, optimizer):
+    def __init__(self, net, loss, optimizer, loss_scaler=None):
         self.net = net
         self.loss = loss
         self.optimizer = optimizer
+        # note:set a LossScaler when parameters are stored in float16
+        self.loss_scaler = loss_scaler
+        self.plan = None
 
         self._phase = "TRAIN"
 
     def forward(self, inputs):
         return self.net.forward(inputs)
 
+    def predict(self, inputs, batch_size=1024, out=None):
+        """
+        Forward `inputs` in chunks of `batch_size` without building a graph.
+
+        Predictions are written into `out` (allocated from the first chunk
+        when None), which may be any preallocated array with a batch
+        dimension of len(inputs), e.g. a np.memmap for very large sets.
+        Per-model ensemble inputs (num_models, batch_size, num_in) are
+        chunked along the batch axis 1. Ensemble predictions have shape
+        (num_models, batch_size, ...).
+        The phase is not changed, call set_phase("TEST") beforehand.
+        """
+        inputs = inputs.values if isinstance(inputs, Tensor) else inputs
+        in_axis = 1 if inputs.ndim == 3 else 0
+        num_samples = inputs.shape[in_axis]
+        with ops.no_grad():
+            for start in range(0, num_samples, batch_size):
+                chunk = (slice(None),) * in_axis + (slice(start, start + batch_size),)
+                pred = self.net.forward(Tensor(inputs[chunk])).values
+                # ensemble outputs carry the batch on axis 1
+                axis = 1 if pred.ndim == 3 else 0
+                if out is None:
+                    shape = list(pred.shape)
+                    shape[axis] = num_samples
+                    out = np.empty(shape, dtype=pred.dtype)
+                index = (slice(None),) * axis + (slice(start, start + pred.shape[axis]),)
+                out[index] = pred
+        return out
+
+    def partial_fit(self, inputs, targets):
+        """
+        One optimizer step on a batch, for incremental training; returns
+        the loss. Uses the compiled plan when there is one.
+        """
+        self.zero_grad()
+        if self.plan is not None:
+            loss = self.plan.run(inputs, targets)
+        else:
+            inputs = inputs if isinstance(inputs, Tensor) else Tensor(inputs)
+            targets = targets if isinstance(targets, Tensor) else Tensor(targets)
+            loss = self.loss.loss(self.forward(inputs), targets)
+            if self.loss_scaler is not None:
+                self.loss_scaler.scale(loss).backward()
+            else:
+                loss.backward()
+            loss = loss.values
+        self.step()
+        return loss
+
+    def compile(self, inputs, targets, fuse=True):
+        """
+        Trace forward + loss on a sample batch into a static plan.
+
+        Afterwards `self.plan.run(inputs, targets)` replaces the
+        forward/loss/backward calls of a training step for batches of the
+        same shape, accumulating gradients into the parameters as usual.
+        With `fuse`, chains of elementwise ops run as single kernels.
+        """
+        # note:the tracer is only needed for compiled models
+        from core.trace import trace_step
+        self.plan = trace_step(self, inputs, targets, fuse=fuse)
+        return self.plan
+
     def save(self, path):
         with open(path, "wb") as f:
             pickle.dump(self.net, f, -1)
@@ -43,22 +115,36 @@ class Model(object):
         self._phase = phase
 
     def step(self):
+        # forward and backward of this step are over, close it for the tracker
+        tracker = memory.get_memory_tracker()
+        if tracker is not None:
+            tracker.end_step()
+
         # grad all grads
+        scaler = self.loss_scaler
         all_grads = []
         params = self.net.get_parameters()
         for param in params:
             grad = dict()
             for k, v in param.items():
-                grad[k] = param[k].grad
+                grad[k] = v.grad if scaler is None or v.grad is None else scaler.unscale(v.grad)
             all_grads.append(grad)
 
+        # skip the step if the scaled gradients overflowed
+        if scaler is not None and not scaler.update(all_grads):
+            return
+
         # compute step
         steps = self.optimizer.compute_step(all_grads, params)
 
         # apply grad
         for step, param in zip(steps, params):
             for k, v in param.items():
-                param[k] += step[k]
+                if isinstance(step[k], ops.SparseRows):
+                    # note:row-sparse steps have unique indices
+                    v.values[step[k].indices] += step[k].rows
+                else:
+                    param[k] += step[k]
 
     def zero_grad(self):
         params = self.net.get_parameters()
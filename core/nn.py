@@ -1,5 +1,15 @@
 """Feed-forward Neural Network class."""
 
+import math
+
+import numpy as np
+
+from core.dtype import get_storage_dtype
+from core.layers import Checkpoint
+from core.memory import get_memory_tracker
+from core.Tensor import Tensor
+from utils.seeder import spawn_seeds
+
 
 class Net(object):
 
@@ -8,10 +18,54 @@ class Net(object):
         self._phase = "TRAIN"
 
     def forward(self, inputs):
-        for layer in self.layers:
-            inputs = layer.forward(inputs)
+        tracker = get_memory_tracker()
+        for i, layer in enumerate(self.layers):
+            if tracker is None:
+                inputs = layer.forward(inputs)
+                continue
+            with tracker.layer("%d.%s" % (i, layer.name)):
+                inputs = layer.forward(inputs)
         return inputs
 
+    def init_parameters(self, num_in, seed=None):
+        """
+        Initialize the parameters of all layers for inputs with `num_in`
+        features in one pass, as views into a single flat buffer
+        (`self.flat_parameters`).
+
+        Every layer draws from its own child stream of `seed` (or of the
+        global seed, see utils.seeder), so the values of a layer do not
+        depend on the other layers and workers or ensemble members can
+        initialize independently and reproducibly.
+        """
+        layer_specs = []
+        for layer in self.layers:
+            specs, num_in = layer.param_specs(num_in)
+            layer_specs.append(specs)
+
+        sizes = [int(np.prod(shape)) * (num_models or 1)
+                 for specs in layer_specs for _, shape, _, num_models in specs]
+        self.flat_parameters = np.empty(sum(sizes), dtype=get_storage_dtype())
+
+        offset = 0
+        seeds = spawn_seeds(len(self.layers), seed)
+        for layer, specs, seed_seq in zip(self.layers, layer_specs, seeds):
+            rng = np.random.Generator(np.random.PCG64(seed_seq))
+            params = {}
+            for name, shape, initializer, num_models in specs:
+                if num_models is not None:
+                    shape = (num_models,) + shape
+                size = int(np.prod(shape))
+                values = self.flat_parameters[offset: offset + size].reshape(shape)
+                initializer.fill(values, num_models, rng)
+                params[name] = Tensor(values, requires_grad=True, dtype=values.dtype)
+                # note:steps update the views in place, i.e. the flat buffer
+                params[name]._owns_values = True
+                offset += size
+            if specs:
+                layer.bind_params(params)
+        return self.flat_parameters
+
     def get_parameters(self):
         return [layer.params for layer in self.layers]
 
@@ -29,3 +83,16 @@ class Net(object):
         for layer in self.layers:
             layer.set_phase(phase)
         self._phase = phase
+
+
+def checkpoint_sequential(layers, num_segments=None):
+    """
+    Wrap consecutive layers into Checkpoint segments. By default the layers
+    are split into about sqrt(len(layers)) segments, which keeps activation
+    memory at O(sqrt(L)) for one extra forward pass.
+    """
+    layers = list(layers)
+    if num_segments is None:
+        num_segments = max(1, int(math.sqrt(len(layers))))
+    size = math.ceil(len(layers) / num_segments)
+    return [Checkpoint(layers[i:i + size]) for i in range(0, len(layers), size)]
@@ -1,25 +1,118 @@
 """Tensor operations (with autograd context)"""
+from contextlib import contextmanager
+
 import numpy as np
 
+import core.pool as pool
+
+_grad_enabled = True
+
+
+def is_grad_enabled():
+    return _grad_enabled
+
+
+@contextmanager
+def no_grad():
+    """Ops inside this block build no graph and return plain tensors."""
+    global _grad_enabled
+    prev, _grad_enabled = _grad_enabled, False
+    try:
+        yield
+    finally:
+        _grad_enabled = prev
+
+
+_state_updates = True
+
+
+@contextmanager
+def no_state_update():
+    """Ops inside this block leave running statistics unchanged."""
+    global _state_updates
+    prev, _state_updates = _state_updates, False
+    try:
+        yield
+    finally:
+        _state_updates = prev
+
+
+class _SegmentLog(object):
+    """
+    State of the stateful ops (dropout masks, running statistics) of a
+    checkpoint_ segment. The forward records the RNG state of every
+    dropout draw; the recompute in backward replays those draws and does
+    not update running statistics a second time. Segments nested in a
+    recompute take their draws from the enclosing log.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.states = []
+        self.replaying = False
+        self._pos = 0
+
+    @contextmanager
+    def replay(self):
+        global _segment_log
+        prev, _segment_log = _segment_log, self
+        self.replaying, self._pos = True, 0
+        try:
+            yield
+        finally:
+            _segment_log, self.replaying = prev, False
+
+    @property
+    def updates_state(self):
+        return not self.replaying and (self.parent is None or self.parent.updates_state)
+
+    def rng(self, rng):
+        """The generator a dropout draw of this segment must use."""
+        if self.replaying:
+            state = self.states[self._pos]
+            self._pos += 1
+            rng = np.random.Generator(type(rng.bit_generator)())
+            rng.bit_generator.state = state
+            return rng
+        if self.parent is not None:
+            rng = self.parent.rng(rng)
+        self.states.append(rng.bit_generator.state)
+        return rng
+
+
+_segment_log = None
+
 
 def build_binary_ops_tensor(ts1, ts2, grad_fn_ts1, grad_fn_ts2, values):
-    requires_grad = ts1.requires_grad or ts2.requires_grad
-    dependency = []
-    if ts1.requires_grad:
-        dependency.append(dict(tensor=ts1, grad_fn=grad_fn_ts1))
-    if ts2.requires_grad:
-        dependency.append(dict(tensor=ts2, grad_fn=grad_fn_ts2))
-    tensor_cls = ts1.__class__
-    return tensor_cls(values, requires_grad, dependency)
+    if not _grad_enabled:
+        return ts1.__class__(values)
+    if ts1.requires_grad and ts2.requires_grad:
+        dependency = ((ts1, grad_fn_ts1), (ts2, grad_fn_ts2))
+    elif ts1.requires_grad:
+        dependency = ((ts1, grad_fn_ts1),)
+    elif ts2.requires_grad:
+        dependency = ((ts2, grad_fn_ts2),)
+    else:
+        return ts1.__class__(values)
+    return ts1.__class__(values, True, dependency)
 
 
 def build_unary_ops_tensor(ts, grad_fn, values):
-    requires_grad = ts.requires_grad
-    dependency = []
-    if ts.requires_grad:
-        dependency.append(dict(tensor=ts, grad_fn=grad_fn))
-    tensor_cls = ts.__class__
-    return tensor_cls(values, requires_grad, dependency)
+    if not _grad_enabled:
+        return ts.__class__(values)
+    if not ts.requires_grad:
+        return ts.__class__(values)
+    return ts.__class__(values, True, ((ts, grad_fn),))
+
+
+def build_nary_ops_tensor(tss, grad_fns, values):
+    if not _grad_enabled:
+        return tss[0].__class__(values)
+    dependency = tuple((ts, grad_fn) for ts, grad_fn in zip(tss, grad_fns)
+                       if ts.requires_grad)
+    if not dependency:
+        return tss[0].__class__(values)
+    return tss[0].__class__(values, True, dependency)
 
 
 def handle_broadcasting(grad, ts):
@@ -43,12 +136,84 @@ def handle_broadcasting(grad, ts):
     return grad
 
 
+def _out(*arrays):
+    """Result buffer of an elementwise op, drawn from the active buffer pool."""
+    if pool.get_buffer_pool() is None:
+        return None
+    dtype = np.result_type(*arrays)
+    if dtype.kind != "f":
+        return None
+    return pool.empty(np.broadcast_shapes(*(a.shape for a in arrays)), dtype)
+
+
+def _matmul_out(a, b):
+    if pool.get_buffer_pool() is None or a.ndim < 2 or b.ndim < 2:
+        return None
+    shape = np.broadcast_shapes(a.shape[:-2], b.shape[:-2]) + (a.shape[-2], b.shape[-1])
+    return pool.empty(shape, np.result_type(a, b))
+
+
+def _mT(a):
+    """Transpose of the matrices in the last two axes."""
+    return a.T if a.ndim <= 2 else np.swapaxes(a, -1, -2)
+
+
 def to_Tensor(obj):
     # avoid looping import
-    from Tensor import to_Tensor
+    from core.Tensor import to_Tensor
     return to_Tensor(obj)
 
 
+class SparseRows(object):
+    """
+    Row-sparse gradient of a (num_rows, ...) table: rows[i] belongs to row
+    indices[i] of the table, repeated indices add up. Produced by
+    embedding_ for leaf tables, so a lookup of a few rows does not
+    allocate a gradient of the whole table.
+    """
+
+    # note:make numpy defer to __radd__ in `dense + sparse`
+    __array_ufunc__ = None
+
+    def __init__(self, indices, rows, shape):
+        self.indices = indices
+        self.rows = rows
+        self.shape = tuple(shape)
+
+    @property
+    def dtype(self):
+        return self.rows.dtype
+
+    def astype(self, dtype):
+        return SparseRows(self.indices, self.rows.astype(dtype), self.shape)
+
+    def coalesce(self):
+        """The same gradient with unique, sorted indices."""
+        indices, inverse = np.unique(self.indices, return_inverse=True)
+        rows = np.zeros((len(indices),) + self.rows.shape[1:], dtype=self.dtype)
+        np.add.at(rows, inverse, self.rows)
+        return SparseRows(indices, rows, self.shape)
+
+    def add_to(self, dense):
+        np.add.at(dense, self.indices, self.rows)
+        return dense
+
+    def to_dense(self):
+        return self.add_to(np.zeros(self.shape, dtype=self.dtype))
+
+    def __add__(self, other):
+        if isinstance(other, SparseRows):
+            return SparseRows(np.concatenate([self.indices, other.indices]),
+                              np.concatenate([self.rows, other.rows]), self.shape)
+        return self.add_to(np.array(other, dtype=np.result_type(other, self.rows)))
+
+    __radd__ = __add__
+
+    def __imul__(self, factor):
+        self.rows *= factor
+        return self
+
+
 def add_(ts1, ts2):
     """    
     c = a + b
@@ -66,7 +231,7 @@ def add_(ts1, ts2):
     Returns:
         _type_: _description_
     """
-    values = ts1.values + ts2.values
+    values = np.add(ts1.values, ts2.values, out=_out(ts1.values, ts2.values))
 
     def grad_fn_ts1(grad):
         return handle_broadcasting(grad, ts1)
@@ -83,17 +248,17 @@ def sub_(ts1, ts2):
 
 
 def mul_(ts1, ts2):
-    values = ts1.values * ts2.values
+    values = np.multiply(ts1.values, ts2.values, out=_out(ts1.values, ts2.values))
 
     # c = a * b
     # D_c / D_a = b
     # D_c / D_b = a
     def grad_fn_ts1(grad):
-        grad = grad * ts2.values
+        grad = np.multiply(grad, ts2.values, out=_out(grad, ts2.values))
         return handle_broadcasting(grad, ts1)
 
     def grad_fn_ts2(grad):
-        grad = grad * ts1.values
+        grad = np.multiply(grad, ts1.values, out=_out(grad, ts1.values))
         return handle_broadcasting(grad, ts2)
 
     return build_binary_ops_tensor(
@@ -101,17 +266,20 @@ def mul_(ts1, ts2):
 
 
 def div_(ts1, ts2):
-    values = ts1.values / ts2.values
+    values = np.divide(ts1.values, ts2.values, out=_out(ts1.values, ts2.values))
 
     # c = a / b
     # D_c / D_a = 1 / b
     # D_c / D_b = -a / b**2
     def grad_fn_ts1(grad):
-        grad = grad / ts2.values
+        grad = np.divide(grad, ts2.values, out=_out(grad, ts2.values))
         return handle_broadcasting(grad, ts1)
 
     def grad_fn_ts2(grad):
-        grad = -grad * ts1.values / ts2.values ** 2
+        out = np.multiply(grad, ts1.values, out=_out(grad, ts1.values, ts2.values))
+        out /= ts2.values
+        out /= ts2.values
+        grad = np.negative(out, out=out)
         return handle_broadcasting(grad, ts2)
 
     return build_binary_ops_tensor(
@@ -137,30 +305,38 @@ def pow_(ts1, ts2):
 
 
 def dot_(ts1, ts2):
-    values = ts1.values @ ts2.values
+    values = np.matmul(ts1.values, ts2.values, out=_matmul_out(ts1.values, ts2.values))
 
     # c = a @ b
     # D_c / D_a = grad @ b.T
     # D_c / D_b = a.T @ grad
+    # batched operands (e.g. ensemble weights of shape (K, n, m)) are
+    # transposed in their last two axes and broadcast axes are summed
     def grad_fn_ts1(grad):
-        return grad @ ts2.values.T
+        b_t = _mT(ts2.values)
+        grad = np.matmul(grad, b_t, out=_matmul_out(grad, b_t))
+        return handle_broadcasting(grad, ts1)
 
     def grad_fn_ts2(grad):
-        return ts1.values.T @ grad
+        a_t = _mT(ts1.values)
+        grad = np.matmul(a_t, grad, out=_matmul_out(a_t, grad))
+        return handle_broadcasting(grad, ts2)
 
     return build_binary_ops_tensor(
         ts1, ts2, grad_fn_ts1, grad_fn_ts2, values)
 
 
 def maximum_(ts1, ts2):
-    values = np.maximum(ts1.values, ts2.values)
+    values = np.maximum(ts1.values, ts2.values, out=_out(ts1.values, ts2.values))
 
     def grad_fn_ts1(grad):
-        grad = grad * (ts1.values >= ts2.values)
+        mask = ts1.values >= ts2.values
+        grad = np.multiply(grad, mask, out=_out(grad, mask))
         return handle_broadcasting(grad, ts1)
 
     def grad_fn_ts2(grad):
-        grad = grad * (ts2.values > ts1.values)
+        mask = ts2.values > ts1.values
+        grad = np.multiply(grad, mask, out=_out(grad, mask))
         return handle_broadcasting(grad, ts2)
 
     return build_binary_ops_tensor(
@@ -168,14 +344,16 @@ def maximum_(ts1, ts2):
 
 
 def minimum_(ts1, ts2):
-    values = np.minimum(ts1.values, ts2.values)
+    values = np.minimum(ts1.values, ts2.values, out=_out(ts1.values, ts2.values))
 
     def grad_fn_ts1(grad):
-        grad = grad * (ts1.values <= ts2.values)
+        mask = ts1.values <= ts2.values
+        grad = np.multiply(grad, mask, out=_out(grad, mask))
         return handle_broadcasting(grad, ts1)
 
     def grad_fn_ts2(grad):
-        grad = grad * (ts2.values < ts1.values)
+        mask = ts2.values < ts1.values
+        grad = np.multiply(grad, mask, out=_out(grad, mask))
         return handle_broadcasting(grad, ts2)
 
     return build_binary_ops_tensor(
@@ -183,10 +361,10 @@ def minimum_(ts1, ts2):
 
 
 def exp_(ts):
-    values = np.exp(ts.values)
+    values = np.exp(ts.values, out=_out(ts.values))
 
     def grad_fn(grad):
-        return values * grad
+        return np.multiply(values, grad, out=_out(values, grad))
 
     return build_unary_ops_tensor(ts, grad_fn, values)
 
@@ -196,6 +374,8 @@ def max_(ts, axis=None):
 
     def grad_fn(grad):
         # 保留value中最大的元素的梯度
+        if axis is not None:
+            grad = np.expand_dims(grad, axis)
         return grad * (ts.values.max(axis=axis, keepdims=1) == ts.values)
 
     return build_unary_ops_tensor(ts, grad_fn, values)
@@ -206,34 +386,33 @@ def min_(ts, axis=None):
 
     def grad_fn(grad):
         # 保留value中最小的元素的梯度
+        if axis is not None:
+            grad = np.expand_dims(grad, axis)
         return grad * (ts.values.min(axis=axis, keepdims=1) == ts.values)
 
     return build_unary_ops_tensor(ts, grad_fn, values)
 
 
 def log_(ts):
-    values = np.log(ts.values)
+    values = np.log(ts.values, out=_out(ts.values))
 
     def grad_fn(grad):
-        return grad / ts.values
+        return np.divide(grad, ts.values, out=_out(grad, ts.values))
 
     return build_unary_ops_tensor(ts, grad_fn, values)
 
 
 def sum_(ts, axis):
     values = ts.values.sum(axis=axis)
-    if axis is not None:
-        repeat = ts.values.shape[axis]
 
     def grad_fn(grad):
-        if axis is None:
-            # 默认对所有元素求和，恢复梯度形状
-            grad = grad * np.ones_like(ts.values)
-        else:
+        if axis is not None:
             # 沿指定维度恢复梯度形状
             grad = np.expand_dims(grad, axis)
-            grad = np.repeat(grad, repeat, axis)
-        return grad
+        # 广播回原始形状
+        out = pool.empty(ts.shape, np.result_type(grad, ts.values))
+        out[...] = grad
+        return out
 
     return build_unary_ops_tensor(ts, grad_fn, values)
 
@@ -257,7 +436,7 @@ def getitem_(ts, key):
     values = ts.values[key]
 
     def grad_fn(grad):
-        recover_grad = np.zeros_like(ts.values)
+        recover_grad = pool.zeros(ts.shape, ts.values.dtype)
         recover_grad[key] = grad
         return recover_grad
 
@@ -265,10 +444,10 @@ def getitem_(ts, key):
 
 
 def neg_(ts):
-    values = -ts.values
+    values = np.negative(ts.values, out=_out(ts.values))
 
     def grad_fn(grad):
-        return -grad
+        return np.negative(grad, out=_out(grad))
 
     return build_unary_ops_tensor(ts, grad_fn, values)
 
@@ -307,7 +486,7 @@ def flatten_(ts):
 
 def clip_(ts, min, max):
     # 清零被整流的元素的梯度
-    values = ts.values.clip(min, max)
+    values = np.clip(ts.values, min, max, out=_out(ts.values))
     mask = np.ones(ts.shape, dtype=bool)
     if min is not None:
         mask &= ts.values >= min
@@ -315,10 +494,219 @@ def clip_(ts, min, max):
         mask &= ts.values <= max
 
     def grad_fn(grad):
-        return grad * mask
+        return np.multiply(grad, mask, out=_out(grad, mask))
+    return build_unary_ops_tensor(ts, grad_fn, values)
+
+
+def _bus_currents(ybus, v):
+    """I = Ybus V for complex voltages v of shape (..., n)."""
+    flat = v.reshape(-1, v.shape[-1])
+    return np.asarray(ybus @ flat.T).T.reshape(v.shape)
+
+
+def _power_flow_adjoint(ybus, v, i, g):
+    """
+    A with dL = Re(sum_k A_k dV_k) for S = V * conj(Ybus V), given the
+    gradients g = [D_L / D_P, D_L / D_Q] of shape (..., 2n).
+
+    A = conj(G * I) + Ybus^T (G * conj(V)),  G = D_L / D_P + j D_L / D_Q
+    """
+    n = v.shape[-1]
+    gs = g[..., :n] + 1j * g[..., n:]
+    return np.conj(gs * i) + _bus_currents(ybus.T, gs * np.conj(v))
+
+
+def power_flow_residual_(vm, va, p, q, ybus):
+    """
+    AC power-flow mismatch of a batch of operating points.
+
+    S = V * conj(Ybus V),  V = vm * exp(j va)
+    c = [Re(S) - p, Im(S) - q] along the last axis, shape (..., 2n)
+
+    D_c / D_p = -1,  D_c / D_q = -1
+    with A from _power_flow_adjoint:
+    D_L / D_vm = Re(A exp(j va)),  D_L / D_va = -Im(A V)
+
+    Args:
+        vm, va: bus voltage magnitudes and angles (rad), shape (..., n)
+        p, q: specified active/reactive injections, broadcastable to vm
+        ybus: (n, n) complex admittance matrix, dense or scipy.sparse
+    """
+    rotation = np.exp(1j * va.values)
+    v = vm.values * rotation
+    i = _bus_currents(ybus, v)
+    s = v * np.conj(i)
+    dtype = np.result_type(vm.values, va.values, p.values, q.values)
+    values = np.concatenate([np.real(s) - p.values, np.imag(s) - q.values],
+                            axis=-1).astype(dtype, copy=False)
+    n = v.shape[-1]
+    # note:vm and va share one sparse adjoint product per backward
+    adjoint = [None, None]
+
+    def adjoint_of(grad):
+        if adjoint[0] is not grad:
+            adjoint[:] = grad, _power_flow_adjoint(ybus, v, i, grad)
+        return adjoint[1]
+
+    def grad_fn_vm(grad):
+        a = adjoint_of(grad)
+        return handle_broadcasting(np.real(a * rotation).astype(dtype, copy=False), vm)
+
+    def grad_fn_va(grad):
+        a = adjoint_of(grad)
+        return handle_broadcasting(-np.imag(a * v).astype(dtype, copy=False), va)
+
+    def grad_fn_p(grad):
+        return handle_broadcasting(-grad[..., :n], p)
+
+    def grad_fn_q(grad):
+        return handle_broadcasting(-grad[..., n:], q)
+
+    return build_nary_ops_tensor((vm, va, p, q),
+                                 (grad_fn_vm, grad_fn_va, grad_fn_p, grad_fn_q),
+                                 values)
+
+
+def normalize_(ts, gamma, beta, axis, eps=1e-5, mean=None, var=None, running=None):
+    """
+    c = gamma * x_hat + beta,  x_hat = (a - mean) / sqrt(var + eps)
+
+    One node for batch norm (statistics over the batch axis) and layer norm
+    (statistics over the feature axis). mean and var are taken over `axis`
+    unless given (e.g. running statistics at test time). With
+    running=(running_mean, running_var, momentum) the running statistics
+    are updated in place from the batch statistics (unbiased variance).
+
+    D_L / D_beta = sum(g),  D_L / D_gamma = sum(g * x_hat)
+    with fixed statistics:  D_L / D_a = g * gamma / sqrt(var + eps)
+    with batch statistics, over the m elements of `axis` and h = g * gamma:
+    D_L / D_a = (h - mean(h) - x_hat * mean(h * x_hat)) / sqrt(var + eps)
+    """
+    x = ts.values
+    fixed = mean is not None
+    if not fixed:
+        mean = x.mean(axis=axis, keepdims=True)
+        var = x.var(axis=axis, keepdims=True)
+        # note:a checkpoint_ recompute must not update the statistics again
+        if running is not None and _state_updates and (
+                _segment_log is None or _segment_log.updates_state):
+            running_mean, running_var, momentum = running
+            m = x.size // mean.size
+            # note:max/sum are shadowed by the ops of this module
+            unbias = m / (m - 1) if m > 1 else 1.0
+            running_mean *= 1 - momentum
+            running_mean += momentum * mean.reshape(running_mean.shape)
+            running_var *= 1 - momentum
+            running_var += momentum * unbias * var.reshape(running_var.shape)
+    inv_std = 1.0 / np.sqrt(var + eps)
+    x_hat = np.subtract(x, mean, out=_out(x, mean))
+    x_hat *= inv_std
+    x_hat = x_hat.astype(x.dtype, copy=False)
+    values = np.multiply(x_hat, gamma.values, out=_out(x_hat, gamma.values))
+    values += beta.values
+
+    def grad_fn_ts(grad):
+        h = np.multiply(grad, gamma.values, out=_out(grad, gamma.values))
+        if not fixed:
+            h_mean = h.mean(axis=axis, keepdims=True)
+            hx_mean = (h * x_hat).mean(axis=axis, keepdims=True)
+            h -= h_mean
+            h -= x_hat * hx_mean
+        h *= inv_std
+        return h
+
+    def grad_fn_gamma(grad):
+        return handle_broadcasting(grad * x_hat, gamma)
+
+    def grad_fn_beta(grad):
+        return handle_broadcasting(grad, beta)
+
+    return build_nary_ops_tensor((ts, gamma, beta),
+                                 (grad_fn_ts, grad_fn_gamma, grad_fn_beta),
+                                 values)
+
+
+def dropout_(ts, rate, rng):
+    """
+    c = a * mask / (1 - rate),  mask ~ Bernoulli(1 - rate)
+
+    The mask is drawn from the np.random.Generator `rng` inside the op, so
+    replays of a traced plan draw a new mask every step; the recompute of
+    a checkpoint_ segment draws the mask of its forward again.
+    D_c / D_a = mask / (1 - rate)
+    """
+    if _segment_log is not None:
+        rng = _segment_log.rng(rng)
+    x = ts.values
+    dtype = x.dtype if x.dtype.kind == "f" else np.float32
+    mask = rng.random(x.shape, dtype=np.float32) >= rate
+    scale = np.multiply(mask, dtype.type(1.0 / (1.0 - rate)), dtype=dtype)
+    values = np.multiply(x, scale, out=_out(x, scale))
+
+    def grad_fn(grad):
+        return np.multiply(grad, scale, out=_out(grad, scale))
+
     return build_unary_ops_tensor(ts, grad_fn, values)
 
 
+def embedding_(table, ids):
+    """
+    c = table[ids], one row of the table per id, shape ids.shape + row shape
+
+    D_L / D_table is the row-sparse SparseRows(ids, g) for leaf tables:
+    its cost scales with the number of ids, not with the table size.
+    """
+    from core.Tensor import Tensor
+    idx = ids.values.astype(np.intp, copy=False)
+    values = np.take(table.values, idx, axis=0)
+    if not (_grad_enabled and table.requires_grad):
+        return Tensor(values)
+    row_shape = table.shape[1:]
+
+    def grad_fn(grad):
+        # note:copy the rows, the upstream gradient may go back to the pool
+        rows = np.array(grad.reshape((-1,) + row_shape))
+        sparse = SparseRows(idx.ravel(), rows, table.shape)
+        return sparse if not table.dependency else sparse.to_dense()
+
+    # note:the result is a plain Tensor whatever the class of the table
+    return Tensor(values, True, ((table, grad_fn),))
+
+
+def checkpoint_(ts, fn):
+    """
+    c = fn(a) without keeping the graph built by fn.
+
+    Backward recomputes fn(a) with a graph and backpropagates through it, so
+    gradients of the parameters used by fn are accumulated as usual.
+    Stateful ops in fn are replayed (see _SegmentLog): the recompute uses
+    the dropout masks of the forward and leaves running statistics alone.
+    """
+    global _segment_log
+    log = _SegmentLog(_segment_log)
+    prev, _segment_log = _segment_log, log
+    try:
+        with no_grad():
+            values = fn(ts.__class__(ts.values)).values
+    finally:
+        _segment_log = prev
+    if not _grad_enabled:
+        return ts.__class__(values)
+
+    def grad_fn(grad):
+        x = ts.__class__(ts.values, requires_grad=ts.requires_grad)
+        with log.replay():
+            out = fn(x)
+            if out.requires_grad:
+                out.backward(grad)
+        return x.grad if x.requires_grad else np.zeros((), dtype=values.dtype)
+
+    # the recomputation hangs on the input edge, a scalar sink stands in for
+    # inputs that need no gradient
+    sink = ts if ts.requires_grad else ts.__class__(0.0, requires_grad=True)
+    return ts.__class__(values, True, ((sink, grad_fn),))
+
+
 def max(obj, axis=None):
     return max_(to_Tensor(obj), axis=axis)
 
@@ -357,3 +745,25 @@ def flatten(obj):
 
 def clip(obj, min=None, max=None):
     return clip_(to_Tensor(obj), min, max)
+
+
+def power_flow_residual(vm, va, p, q, ybus):
+    return power_flow_residual_(to_Tensor(vm), to_Tensor(va), to_Tensor(p),
+                                to_Tensor(q), ybus)
+
+
+def normalize(obj, gamma, beta, axis, eps=1e-5, mean=None, var=None, running=None):
+    return normalize_(to_Tensor(obj), to_Tensor(gamma), to_Tensor(beta), axis,
+                      eps=eps, mean=mean, var=var, running=running)
+
+
+def dropout(obj, rate, rng):
+    return dropout_(to_Tensor(obj), rate, rng)
+
+
+def embedding(table, ids):
+    return embedding_(to_Tensor(table), to_Tensor(ids))
+
+
+def checkpoint(obj, fn):
+    return checkpoint_(to_Tensor(obj), fn)
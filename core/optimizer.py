@@ -0,0 +1,247 @@
+"""Various optimization algorithms."""
+
+import numpy as np
+
+from core.dtype import get_default_dtype
+from core.ops import SparseRows
+from core.Tensor import RowSparseTensor
+
+
+class BaseOptimizer(object):
+
+    def __init__(self, lr, weight_decay):
+        self.lr = lr
+        self.weight_decay = weight_decay
+
+    def compute_step(self, grads, params):
+        # flatten all gradients, computed in the default dtype whatever the
+        # storage dtype of the parameters is
+        # note:row-sparse tables are stepped row by row and kept out of the
+        # flat vector, so its layout (and the optimizer state) is fixed
+        flatten_grads = [np.ravel(g.to_dense() if isinstance(g, SparseRows) else g)
+                         for grad, param in zip(grads, params)
+                         for k, g in grad.items()
+                         if not isinstance(param[k], RowSparseTensor)]
+        # compute step
+        flatten_step = None
+        if flatten_grads:
+            flatten_step = self._compute_step(
+                np.concatenate(flatten_grads, dtype=get_default_dtype()))
+
+        # reshape to the layout of the parameters
+        steps = []
+        p = 0
+        for i, (grad, param) in enumerate(zip(grads, params)):
+            layer = dict()
+            for k, v in param.items():
+                if isinstance(v, RowSparseTensor):
+                    layer[k] = self._sparse_step((i, k), grad[k], v)
+                    continue
+                block = int(np.prod(v.shape))
+                _step = flatten_step[p:p + block].reshape(v.shape)
+                if self.weight_decay:
+                    _step -= self.lr * self.weight_decay * v.values
+                layer[k] = _step
+                p += block
+            steps.append(layer)
+        return steps
+
+    def _sparse_step(self, key, grad, param):
+        """
+        Step of a RowSparseTensor as SparseRows over the rows that have a
+        gradient; rows that were not looked up are left untouched, as is
+        their optimizer state (lazy updates).
+        """
+        if grad is None:
+            grad = SparseRows(np.empty(0, np.intp), np.empty((0,) + param.shape[1:]),
+                              param.shape)
+        elif not isinstance(grad, SparseRows):
+            grad = SparseRows(np.arange(param.shape[0]), grad, param.shape)
+        grad = grad.coalesce().astype(get_default_dtype())
+        step = self._compute_sparse_step(key, grad)
+        if self.weight_decay:
+            step -= self.lr * self.weight_decay * param.values[grad.indices]
+        return SparseRows(grad.indices, step, param.shape)
+
+    def _compute_step(self, grad):
+        raise NotImplementedError
+
+    def _compute_sparse_step(self, key, grad):
+        raise NotImplementedError
+
+
+class SGD(BaseOptimizer):
+
+    def __init__(self, lr, weight_decay=0.0):
+        super().__init__(lr, weight_decay)
+
+    def _compute_step(self, grad):
+        return -self.lr * grad
+
+    def _compute_sparse_step(self, key, grad):
+        return -self.lr * grad.rows
+
+
+class Momentum(BaseOptimizer):
+
+    def __init__(self, lr, momentum=0.9, weight_decay=0.0):
+        super().__init__(lr, weight_decay)
+        self._momentum = momentum
+        self._acc = None
+        self._sparse_acc = {}
+
+    def _compute_step(self, grad):
+        if self._acc is None:
+            self._acc = np.zeros_like(grad)
+        self._acc *= self._momentum
+        self._acc += grad
+        return -self.lr * self._acc
+
+    def _compute_sparse_step(self, key, grad):
+        if key not in self._sparse_acc:
+            self._sparse_acc[key] = np.zeros(grad.shape, grad.dtype)
+        acc = self._sparse_acc[key]
+        acc_rows = acc[grad.indices] * self._momentum + grad.rows
+        acc[grad.indices] = acc_rows
+        return -self.lr * acc_rows
+
+
+class Adam(BaseOptimizer):
+
+    def __init__(self,
+                 lr=0.001,
+                 beta1=0.9,
+                 beta2=0.999,
+                 epsilon=1e-8,
+                 weight_decay=0.0):
+        super().__init__(lr, weight_decay)
+        self._b1 = beta1
+        self._b2 = beta2
+        self._eps = epsilon
+
+        self._t = 0
+        # note:moments are kept in the dtype of the gradients
+        self._m = None
+        self._v = None
+        # note:(m, v, t) per row-sparse table, t counts the steps of that table
+        self._sparse = {}
+
+    def _compute_step(self, grad):
+        if self._m is None:
+            self._m = np.zeros_like(grad)
+            self._v = np.zeros_like(grad)
+        self._t += 1
+        self._m *= self._b1
+        self._m += (1 - self._b1) * grad
+        self._v *= self._b2
+        self._v += (1 - self._b2) * grad ** 2
+
+        # bias correction
+        _m = self._m / (1 - self._b1 ** self._t)
+        _v = self._v / (1 - self._b2 ** self._t)
+        return -self.lr * _m / (_v ** 0.5 + self._eps)
+
+    def _compute_sparse_step(self, key, grad):
+        if key not in self._sparse:
+            self._sparse[key] = [np.zeros(grad.shape, grad.dtype),
+                                 np.zeros(grad.shape, grad.dtype), 0]
+        state = self._sparse[key]
+        m, v, idx = state[0], state[1], grad.indices
+        state[2] += 1
+        m_rows = m[idx] * self._b1 + (1 - self._b1) * grad.rows
+        v_rows = v[idx] * self._b2 + (1 - self._b2) * grad.rows ** 2
+        m[idx], v[idx] = m_rows, v_rows
+
+        # bias correction
+        m_rows /= 1 - self._b1 ** state[2]
+        v_rows /= 1 - self._b2 ** state[2]
+        return -self.lr * m_rows / (v_rows ** 0.5 + self._eps)
+
+
+class BaseScheduler(object):
+    """
+    Learning rate schedule. Call `step()` once per epoch (or per optimizer
+    step, as long as it is done consistently); it sets and returns the
+    learning rate of the optimizer.
+    """
+
+    def __init__(self, optimizer):
+        self._optim = optimizer
+        self._initial_lr = optimizer.lr
+        self._t = 0
+
+    def step(self):
+        self._t += 1
+        self._optim.lr = self._compute_lr()
+        return self._optim.lr
+
+    def _compute_lr(self):
+        raise NotImplementedError
+
+
+class StepLR(BaseScheduler):
+    """Multiply the learning rate by `gamma` every `step_size` steps."""
+
+    def __init__(self, optimizer, step_size, gamma=0.1):
+        super().__init__(optimizer)
+        self._step_size = step_size
+        self._gamma = gamma
+
+    def _compute_lr(self):
+        return self._initial_lr * self._gamma ** (self._t // self._step_size)
+
+
+class MultiStepLR(BaseScheduler):
+    """Multiply the learning rate by `gamma` at each of the `milestones`."""
+
+    def __init__(self, optimizer, milestones, gamma=0.1):
+        super().__init__(optimizer)
+        self._milestones = sorted(milestones)
+        self._gamma = gamma
+
+    def _compute_lr(self):
+        passed = sum(1 for m in self._milestones if self._t >= m)
+        return self._initial_lr * self._gamma ** passed
+
+
+class ExponentialLR(BaseScheduler):
+
+    def __init__(self, optimizer, decay_rate):
+        super().__init__(optimizer)
+        self._decay_rate = decay_rate
+
+    def _compute_lr(self):
+        return self._initial_lr * self._decay_rate ** self._t
+
+
+class CosineLR(BaseScheduler):
+    """Cosine annealing from the initial learning rate to `min_lr` over `total_steps`."""
+
+    def __init__(self, optimizer, total_steps, min_lr=0.0):
+        super().__init__(optimizer)
+        self._total_steps = total_steps
+        self._min_lr = min_lr
+
+    def _compute_lr(self):
+        progress = min(self._t, self._total_steps) / self._total_steps
+        cosine = 0.5 * (1 + float(np.cos(np.pi * progress)))
+        return self._min_lr + (self._initial_lr - self._min_lr) * cosine
+
+
+class WarmupLR(BaseScheduler):
+    """Linear warmup over `warmup_steps`, then hand over to `scheduler` (if any)."""
+
+    def __init__(self, optimizer, warmup_steps, scheduler=None):
+        super().__init__(optimizer)
+        self._warmup_steps = warmup_steps
+        self._scheduler = scheduler
+        optimizer.lr = self._initial_lr / (warmup_steps + 1)
+
+    def step(self):
+        if self._t >= self._warmup_steps and self._scheduler is not None:
+            self._t += 1
+            return self._scheduler.step()
+        return super().step()
+
+    def _compute_lr(self):
+        return self._initial_lr * min(1.0, (self._t + 1) / (self._warmup_steps + 1))
@@ -0,0 +1,171 @@
+"""
+Size-keyed buffer pool for op results and gradients.
+
+While a BufferPool is active (`with pool:`), ops and grad_fns in core.ops
+take their result arrays from the pool instead of allocating them.
+Gradient temporaries go back to the pool as soon as backward has consumed
+them. Node values and gradients go back when the graph is released with
+`pool.release_graph(loss)` after backward. Free buffers are kept per
+(element count, dtype) and evicted least-recently-used first once the
+pooled bytes exceed `max_bytes`.
+"""
+
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+_active = None
+
+
+def get_buffer_pool():
+    return _active
+
+
+def empty(shape, dtype):
+    if _active is None:
+        return np.empty(shape, dtype)
+    return _active.acquire(shape, dtype)
+
+
+def zeros(shape, dtype):
+    if _active is None:
+        return np.zeros(shape, dtype)
+    buf = _active.acquire(shape, dtype)
+    buf.fill(0)
+    return buf
+
+
+def release(arr):
+    if _active is not None:
+        _active.release(arr)
+
+
+class BufferPool(object):
+
+    def __init__(self, max_bytes=256 << 20, min_bytes=4096):
+        """
+        Args:
+            max_bytes: cap on the bytes held by free buffers
+            min_bytes: smaller arrays are allocated normally
+        """
+        self.max_bytes = max_bytes
+        self.min_bytes = min_bytes
+
+        self._free = OrderedDict()  # (size, dtype) -> [flat buffers]
+        self._lent = {}  # id(array) -> (weakref(array), flat buffer)
+        self._prev = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pooled_bytes = sum(b.nbytes for bufs in self._free.values() for b in bufs)
+        self.lent_bytes = 0
+        self.peak_pooled_bytes = self.pooled_bytes
+        self.peak_bytes = self.pooled_bytes
+
+    def __enter__(self):
+        global _active
+        self._prev, _active = _active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active, self._prev = self._prev, None
+
+    def acquire(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        if size * dtype.itemsize < self.min_bytes:
+            return np.empty(shape, dtype)
+
+        key = (size, dtype)
+        bufs = self._free.get(key)
+        if bufs:
+            buf = bufs.pop()
+            if not bufs:
+                del self._free[key]
+            self.hits += 1
+            self.pooled_bytes -= buf.nbytes
+        else:
+            buf = np.empty(size, dtype)
+            self.misses += 1
+
+        arr = buf.reshape(shape)
+        key_id = id(arr)
+        ref = weakref.ref(arr, lambda _, k=key_id: self._forget(k))
+        self._lent[key_id] = (ref, buf)
+        self.lent_bytes += buf.nbytes
+        self.peak_bytes = max(self.peak_bytes, self.lent_bytes + self.pooled_bytes)
+        return arr
+
+    def _forget(self, key_id):
+        # a lent array died without being released
+        entry = self._lent.pop(key_id, None)
+        if entry is not None:
+            self.lent_bytes -= entry[1].nbytes
+
+    def release(self, arr):
+        """Give back an array returned by acquire(); anything else is ignored."""
+        entry = self._lent.get(id(arr))
+        if entry is None or entry[0]() is not arr:
+            return
+        del self._lent[id(arr)]
+        buf = entry[1]
+        self.lent_bytes -= buf.nbytes
+
+        key = (buf.size, buf.dtype)
+        self._free.setdefault(key, []).append(buf)
+        self._free.move_to_end(key)
+        self.pooled_bytes += buf.nbytes
+        self.peak_pooled_bytes = max(self.peak_pooled_bytes, self.pooled_bytes)
+        self._evict()
+
+    def _evict(self):
+        while self.pooled_bytes > self.max_bytes and self._free:
+            key, bufs = next(iter(self._free.items()))
+            buf = bufs.pop(0)
+            if not bufs:
+                del self._free[key]
+            self.pooled_bytes -= buf.nbytes
+            self.evictions += 1
+
+    def release_graph(self, root, keep=()):
+        """
+        Return the values and gradients of the graph nodes behind `root`
+        to the pool and drop the graph. Leaves (parameters, inputs) are not
+        touched and the value of `root` itself is kept. Do not read
+        intermediate tensors afterwards unless they are listed in `keep`.
+        """
+        keep = {id(t) for t in keep}
+        keep.add(id(root))
+        stack, seen = [root], set()
+        while stack:
+            node = stack.pop()
+            if id(node) in seen or not node.dependency:
+                continue
+            seen.add(id(node))
+            stack.extend(tensor for tensor, _ in node.dependency)
+            node.dependency = ()
+            if node.grad is not None:
+                self.release(node.grad)
+                node.grad = None
+            if id(node) not in keep:
+                self.release(node.values)
+
+    def clear(self):
+        self._free.clear()
+        self.pooled_bytes = 0
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    hit_rate=self.hits / requests if requests else 0.0,
+                    evictions=self.evictions,
+                    pooled_bytes=self.pooled_bytes,
+                    peak_pooled_bytes=self.peak_pooled_bytes,
+                    lent_bytes=self.lent_bytes,
+                    peak_bytes=self.peak_bytes)
@@ -0,0 +1,116 @@
+"""
+Int8 post-training quantization of frozen networks.
+
+`quantize` turns the dense ops of a FrozenNet (see core.export) into
+qdense ops: weights are stored as int8 with a symmetric scale per output
+channel (per model for ensembles), which makes them 4x smaller on disk and
+in memory. With calibration inputs and `activations=True` the input of
+every dense op is quantized as well, with a symmetric per-tensor scale
+taken from the largest magnitude seen on the calibration set.
+
+This is a size-only optimization: numpy has no integer GEMM, so the
+runtime widens the int8 weights back to float block by block and runs
+the float GEMM. A qdense op is somewhat slower than the float dense op it
+replaces (see benchmarks/bench_quantize.py); quantize for smaller model
+files and weight memory, not for latency.
+
+`report` compares the quantized network to the float one on a sample set.
+"""
+
+import copy
+
+import numpy as np
+
+from core.runtime import FrozenNet
+
+QMAX = 127
+
+
+def quantize_weights(w):
+    """Symmetric per-output-channel int8 quantization, w ~= w_q * scale."""
+    w = np.asarray(w, np.float32)
+    scale = np.abs(w).max(axis=-2, keepdims=True) / QMAX
+    # note:all-zero channels get scale 1 instead of dividing by zero
+    scale[scale == 0] = 1.0
+    w_q = np.clip(np.rint(w / scale), -QMAX, QMAX).astype(np.int8)
+    return w_q, scale.astype(np.float32)
+
+
+def _calibrate(frozen, inputs, batch_size):
+    # largest input magnitude of every op over the calibration set
+    stages = [FrozenNet([op], frozen.dtype) for op in frozen.ops]
+    ranges = [0.0] * len(stages)
+    for start in range(0, len(inputs), batch_size):
+        x = np.asarray(inputs[start: start + batch_size], frozen.dtype)
+        for i, stage in enumerate(stages):
+            ranges[i] = max(ranges[i], float(np.abs(x).max()))
+            x = stage.run(x, copy=False)
+    return ranges
+
+
+def quantize(frozen, calib_inputs=None, activations=False, batch_size=1024):
+    """
+    Return a copy of `frozen` with every dense op quantized to int8.
+    The weights take 4x less memory, inference does not get faster.
+
+    Args:
+        frozen: a FrozenNet with float dense ops
+        calib_inputs: sample inputs, required when `activations` is set
+        activations: also quantize the inputs of the dense ops
+    """
+    ranges = None
+    if activations:
+        if calib_inputs is None:
+            raise ValueError("Quantizing activations needs calibration inputs.")
+        ranges = _calibrate(frozen, calib_inputs, batch_size)
+
+    ops = []
+    for i, op in enumerate(frozen.ops):
+        if op[0] != "dense":
+            ops.append(op)
+            continue
+        _, w, b, act = op
+        w_q, w_scale = quantize_weights(w)
+        x_scale = None
+        if ranges is not None:
+            x_scale = np.float32(ranges[i] / QMAX if ranges[i] > 0 else 1.0)
+        ops.append(("qdense", w_q, w_scale, b, x_scale, act))
+    return FrozenNet(ops, dtype=frozen.dtype)
+
+
+def report(frozen, quantized, inputs, targets=None, evaluator=None, batch_size=1024):
+    """
+    Accuracy delta of `quantized` vs. the float network `frozen`.
+
+    Returns the weight bytes of both, the max / mean absolute difference of
+    their outputs and, with `targets` and an evaluator from core.evaluator,
+    both evaluation results and the change of every metric.
+    """
+    max_err, abs_err, count = 0.0, 0.0, 0
+    if evaluator is not None:
+        float_eval, quant_eval = evaluator, copy.copy(evaluator)
+        float_eval.reset()
+        quant_eval.reset()
+    for start in range(0, len(inputs), batch_size):
+        x = inputs[start: start + batch_size]
+        pred, qpred = frozen.run(x), quantized.run(x)
+        err = np.abs(qpred.astype(np.float64) - pred)
+        max_err = max(max_err, float(err.max()))
+        abs_err += float(err.sum())
+        count += err.size
+        if evaluator is not None and targets is not None:
+            y = targets[start: start + batch_size]
+            float_eval.update(pred, y)
+            quant_eval.update(qpred, y)
+
+    result = {"float_bytes": frozen.nbytes,
+              "quantized_bytes": quantized.nbytes,
+              "max_abs_diff": max_err,
+              "mean_abs_diff": abs_err / max(count, 1)}
+    if evaluator is not None and targets is not None:
+        float_metrics, quant_metrics = float_eval.result(), quant_eval.result()
+        result["float"] = float_metrics
+        result["quantized"] = quant_metrics
+        result["delta"] = {k: quant_metrics[k] - float_metrics[k] for k in float_metrics
+                           if k != "total_num" and not isinstance(float_metrics[k], dict)}
+    return result
@@ -0,0 +1,273 @@
+"""
+Inference runtime for frozen networks.
+
+This module depends on numpy only: no Tensor, graph or layer objects are
+created, so a deployment needs nothing but this file and the exported
+model. A frozen network is a flat list of ops over constant arrays,
+
+    ("dense", w, b, activation)   x @ w + b, then the activation in place
+    ("qdense", w_q, w_scale, b, x_scale, activation)
+                                  the same with int8 weights, see below
+    ("affine", scale, shift, activation)
+                                  x * scale + shift (e.g. batch norm)
+    ("layernorm", gamma, beta, eps, activation)
+                                  layer norm over the last axis
+    ("embedding", table, activation)
+                                  row lookup of integer ids, flattened
+                                  to (batch_size, num_ids * row_size)
+    ("act", activation)           activation in place
+
+with activation one of None, "relu", "sigmoid", "tanh", "softmax".
+
+A qdense op (built by core.quantize) stores w as int8 w_q with one float
+scale per output channel, w ~= w_q * w_scale. With an activation scale
+x_scale the input is rounded to int8 levels too, x ~= x_q * x_scale, and
+x_q @ w_q is rescaled by x_scale * w_scale; without it only the weights
+are quantized. numpy has no fast integer GEMM, so the integer product is
+computed by the float GEMM, block by block of input rows: each block of
+w_q is widened into a small cache-resident scratch buffer, so the full
+float weights are never materialized (the products are exact as long as
+the sums stay below 2**24). qdense therefore only saves weight memory;
+the widening makes it slower than a float dense op.
+
+Every op writes into a buffer that is allocated once per batch size and
+reused on later calls, so a steady-state forward allocates nothing.
+
+File layout written by `save` (all integers little endian):
+
+    b"PNNFROZ1" | uint64 header size | JSON header | padding | raw arrays
+
+Arrays are stored C-contiguous at 64-byte aligned offsets, so `load`
+maps the file and the weights stay in the page cache instead of being
+copied onto the heap.
+"""
+
+import json
+
+import numpy as np
+
+MAGIC = b"PNNFROZ1"
+ALIGN = 64
+
+# elements of w_q widened to float at a time by a qdense op
+QDENSE_BLOCK = 1 << 17
+
+ACTIVATIONS = (None, "relu", "sigmoid", "tanh", "softmax")
+
+
+def _relu(x):
+    np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    # 1 / (1 + exp(-x)) without temporaries
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    np.reciprocal(x, out=x)
+
+
+def _tanh(x):
+    # note:layers.Tanh computes (1 - exp(-x)) / (1 + exp(-x)) = tanh(x / 2)
+    x *= 0.5
+    np.tanh(x, out=x)
+
+
+def _softmax(x):
+    # note:same axis as layers.Softmax
+    np.exp(x, out=x)
+    x /= x.sum(axis=0)
+
+
+_ACT_FUNCS = {None: None, "relu": _relu, "sigmoid": _sigmoid,
+              "tanh": _tanh, "softmax": _softmax}
+
+
+def _out_shape(in_shape, w_shape):
+    # (..., batch_size, num_in) @ (..., num_in, num_out), ensemble axes broadcast
+    lead = np.broadcast_shapes(in_shape[:-2], w_shape[:-2])
+    return lead + (in_shape[-2], w_shape[-1])
+
+
+_OP_KINDS = ("dense", "qdense", "affine", "layernorm", "embedding", "act")
+
+
+class FrozenNet(object):
+    """
+    A frozen network. `ops` is a list of op tuples (see module docstring),
+    `dtype` the dtype inputs are computed in.
+    """
+
+    def __init__(self, ops, dtype=np.float32):
+        for op in ops:
+            if op[0] not in _OP_KINDS or op[-1] not in ACTIVATIONS:
+                raise ValueError("Unsupported frozen op %r." % (op[:1] + op[-1:],))
+        self.ops = list(ops)
+        self.dtype = np.dtype(dtype)
+        self._buffers = {}
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for op in self.ops for a in op[1:-1] if a is not None)
+
+    def _plan(self, in_shape):
+        # one output buffer per op, activations run in place on it
+        scratch = None
+        plan, shape = [], in_shape
+        for op in self.ops:
+            kind, act, q = op[0], op[-1], None
+            if kind == "dense":
+                w, b = op[1:3]
+                shape = _out_shape(shape, w.shape)
+            elif kind == "qdense":
+                w_q, w_scale, b, x_scale = op[1:5]
+                # blocks of input rows sharing one float scratch buffer
+                row_size = w_q.size // w_q.shape[-2]
+                rows = max(1, QDENSE_BLOCK // row_size)
+                if scratch is None or rows * row_size > scratch.size:
+                    scratch = np.empty(max(QDENSE_BLOCK, rows * row_size), self.dtype)
+                blocks = []
+                for start in range(0, w_q.shape[-2], rows):
+                    stop = min(start + rows, w_q.shape[-2])
+                    w_block = scratch[:(stop - start) * row_size].reshape(
+                        w_q.shape[:-2] + (stop - start, w_q.shape[-1]))
+                    blocks.append((start, stop, w_block))
+                w = None
+                rescale = np.asarray(w_scale, self.dtype)
+                x_inv, x_buf = None, None
+                if x_scale is not None:
+                    rescale = rescale * np.asarray(x_scale, self.dtype)
+                    x_inv = np.asarray(1.0 / x_scale, self.dtype)
+                    x_buf = np.empty(shape, self.dtype)
+                out_shape = _out_shape(shape, w_q.shape)
+                partial = np.empty(out_shape, self.dtype) if len(blocks) > 1 else None
+                q = (w_q, rescale, x_inv, x_buf, blocks, partial)
+                shape = out_shape
+            elif kind == "affine":
+                w, b = op[1:3]
+                shape = np.broadcast_shapes(shape, w.shape)
+            elif kind == "layernorm":
+                w, b, q = op[1], op[2], op[3].item()
+                shape = np.broadcast_shapes(shape, w.shape)
+            elif kind == "embedding":
+                w, b = op[1], None
+                # note:ids are cast into a preallocated index buffer
+                ids, rows = np.empty(shape, np.intp), shape + w.shape[1:]
+                shape = shape[:1] + (int(np.prod(rows[1:])),)
+                out = np.empty(shape, self.dtype)
+                q = (ids, out.reshape(rows))
+                plan.append((kind, w, b, out, _ACT_FUNCS[act], q))
+                continue
+            else:
+                w, b = None, None
+            plan.append((kind, w, b, np.empty(shape, self.dtype), _ACT_FUNCS[act], q))
+        return plan
+
+    def run(self, inputs, copy=True):
+        """
+        Forward a batch of inputs. With copy=False the returned array is
+        the runtime's own output buffer, overwritten by the next call.
+        """
+        x = np.asarray(inputs, dtype=self.dtype)
+        plan = self._buffers.get(x.shape)
+        if plan is None:
+            plan = self._buffers[x.shape] = self._plan(x.shape)
+        for kind, w, b, out, act, q in plan:
+            if kind == "dense":
+                np.matmul(x, w, out=out)
+            elif kind == "qdense":
+                w_q, rescale, x_inv, x_buf, blocks, partial = q
+                if x_inv is not None:
+                    np.multiply(x, x_inv, out=x_buf)
+                    np.rint(x_buf, out=x_buf)
+                    np.clip(x_buf, -127, 127, out=x_buf)
+                    x = x_buf
+                for start, stop, w_block in blocks:
+                    np.copyto(w_block, w_q[..., start:stop, :])
+                    if start == 0:
+                        np.matmul(x[..., start:stop], w_block, out=out)
+                    else:
+                        np.matmul(x[..., start:stop], w_block, out=partial)
+                        out += partial
+                out *= rescale
+            elif kind == "affine":
+                np.multiply(x, w, out=out)
+            elif kind == "embedding":
+                ids, rows = q
+                np.copyto(ids, x, casting="unsafe")
+                np.take(w, ids, axis=0, out=rows)
+            elif kind == "layernorm":
+                np.subtract(x, x.mean(axis=-1, keepdims=True), out=out)
+                var = np.einsum("...i,...i->...", out, out)[..., None]
+                var /= out.shape[-1]
+                var += q
+                out /= np.sqrt(var, out=var)
+                out *= w
+            else:
+                np.copyto(out, x)
+            if b is not None:
+                out += b
+            if act is not None:
+                act(out)
+            x = out
+        return x.copy() if copy else x
+
+    __call__ = run
+
+    def clear_buffers(self):
+        self._buffers.clear()
+
+    def save(self, path):
+        header, arrays, offset = {"dtype": self.dtype.str, "ops": []}, [], 0
+        for op in self.ops:
+            entry = [op[0]]
+            for a in op[1:-1]:
+                if a is None:
+                    entry.append(None)
+                    continue
+                # note:not ascontiguousarray, which turns 0-d arrays (eps) into 1-d
+                a = np.asarray(a, order="C")
+                entry.append({"offset": offset, "shape": a.shape, "dtype": a.dtype.str})
+                arrays.append((offset, a))
+                offset += -(-a.nbytes // ALIGN) * ALIGN
+            entry.append(op[-1])
+            header["ops"].append(entry)
+        blob = json.dumps(header).encode("utf-8")
+        start = -(-(len(MAGIC) + 8 + len(blob)) // ALIGN) * ALIGN
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(blob)).astype("<u8").tobytes())
+            f.write(blob)
+            for pos, a in arrays:
+                f.seek(start + pos)
+                f.write(a.tobytes())
+            f.truncate(start + offset)
+
+
+def load(path, mmap=True):
+    """Load a frozen network written by FrozenNet.save (memory-mapped by default)."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a frozen powernn model." % path)
+        size = int(np.frombuffer(f.read(8), "<u8")[0])
+        header = json.loads(f.read(size).decode("utf-8"))
+    start = -(-(len(MAGIC) + 8 + size) // ALIGN) * ALIGN
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="r")[start:]
+    else:
+        data = np.fromfile(path, dtype=np.uint8)[start:]
+
+    ops = []
+    for entry in header["ops"]:
+        arrays = []
+        for spec in entry[1:-1]:
+            if spec is None:
+                arrays.append(None)
+                continue
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            a = data[spec["offset"]: spec["offset"] + count * dtype.itemsize]
+            # plain ndarray views of the map, without memmap overhead per op
+            arrays.append(np.asarray(a).view(dtype).reshape(spec["shape"]))
+        ops.append((entry[0],) + tuple(arrays) + (entry[-1],))
+    return FrozenNet(ops, dtype=header["dtype"])
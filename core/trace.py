@@ -0,0 +1,397 @@
+"""
+Trace-and-replay static execution plans.
+
+Tracing runs one forward + loss pass eagerly while recording every graph
+primitive of core.ops (the public functions ending with "_"). The records
+are turned into a StaticPlan that owns one output buffer per node and one
+gradient buffer per intermediate node. Replaying the plan for a batch of
+the same shape writes into those buffers with NumPy `out=` calls, so no
+Tensor, dependency list or closure is created per step.
+
+Parameters (and any other tensor not produced by a traced op) are read
+through `Tensor.values` on every replay, so optimizer updates are seen and
+their gradients are accumulated into `Tensor.grad` as in eager mode.
+Tensors built from raw values during tracing are baked into the plan as
+constants.
+"""
+
+import inspect
+
+import numpy as np
+
+import core.ops as ops
+from core.fusion import FusedChain
+from core.fusion import fuse_elementwise
+from core.Tensor import Tensor
+from core.Tensor import to_Tensor
+
+
+def _primitive_names():
+    return [name for name, fn in vars(ops).items()
+            if name.endswith("_") and not name.startswith("_")
+            and inspect.isfunction(fn)]
+
+
+# forward kernels writing into a preallocated `out`
+_FORWARD = {
+    "add_": lambda out, a, b: np.add(a, b, out=out),
+    "sub_": lambda out, a, b: np.subtract(a, b, out=out),
+    "mul_": lambda out, a, b: np.multiply(a, b, out=out),
+    "div_": lambda out, a, b: np.divide(a, b, out=out),
+    "pow_": lambda out, a, b: np.power(a, b, out=out),
+    "dot_": lambda out, a, b: np.matmul(a, b, out=out),
+    "maximum_": lambda out, a, b: np.maximum(a, b, out=out),
+    "minimum_": lambda out, a, b: np.minimum(a, b, out=out),
+    "exp_": lambda out, a: np.exp(a, out=out),
+    "log_": lambda out, a: np.log(a, out=out),
+    "neg_": lambda out, a: np.negative(a, out=out),
+    "max_": lambda out, a, axis: np.max(a, axis=axis, out=out),
+    "min_": lambda out, a, axis: np.min(a, axis=axis, out=out),
+    "sum_": lambda out, a, axis: np.sum(a, axis=axis, out=out),
+    "clip_": lambda out, a, min, max: np.clip(a, min, max, out=out),
+}
+
+# ops whose result is (usually) a view of the input, re-bound on each replay
+_VIEWS = {
+    "transpose_": lambda a, axes: a.transpose(axes),
+    "reshape_": lambda a, newshape: a.reshape(newshape),
+    "flatten_": lambda a: a.ravel(),
+    "getitem_": lambda a, key: a[key],
+}
+
+
+def _sum_grad(g, v, y, attrs, out):
+    if attrs["axis"] is not None:
+        g = np.expand_dims(g, attrs["axis"])
+    return np.broadcast_to(g, v[0].shape)
+
+
+def _max_grad(g, v, y, attrs, out):
+    if attrs["axis"] is not None:
+        g = np.expand_dims(g, attrs["axis"])
+        y = np.expand_dims(y, attrs["axis"])
+    return np.multiply(g, v[0] == y, out=out)
+
+
+def _div_grad_b(g, v, y, attrs, out):
+    # D_c / D_b = -a / b**2 = -c / b
+    out = np.multiply(g, y, out=out)
+    np.divide(out, v[1], out=out)
+    return np.negative(out, out=out)
+
+
+def _pow_grad_a(g, v, y, attrs, out):
+    out = np.power(v[0], v[1] - 1, out=out)
+    out *= v[1]
+    out *= g
+    return out
+
+
+def _pow_grad_b(g, v, y, attrs, out):
+    out = np.log(v[0], out=out)
+    out *= y
+    out *= g
+    return out
+
+
+def _clip_grad(g, v, y, attrs, out):
+    mask = np.ones(v[0].shape, dtype=bool)
+    if attrs["min"] is not None:
+        mask &= v[0] >= attrs["min"]
+    if attrs["max"] is not None:
+        mask &= v[0] <= attrs["max"]
+    return np.multiply(g, mask, out=out)
+
+
+def _getitem_grad(g, v, y, attrs, out):
+    if out is None:
+        out = np.zeros_like(v[0])
+    else:
+        out.fill(0)
+    out[attrs["key"]] = g
+    return out
+
+
+def _transpose_grad(g, v, y, attrs, out):
+    axes = attrs["axes"]
+    if axes is None:
+        return g.transpose()
+    return g.transpose(np.argsort(axes))
+
+
+# backward kernels: one (fn, fresh) per input, fn(grad, input_values,
+# output_values, attrs, out) returns the (unreduced) gradient of the input.
+# `fresh` kernels write into `out`, which the plan keeps as scratch.
+_BACKWARD = {
+    "add_": ((lambda g, v, y, kw, out: g, False),
+             (lambda g, v, y, kw, out: g, False)),
+    "sub_": ((lambda g, v, y, kw, out: g, False),
+             (lambda g, v, y, kw, out: np.negative(g, out=out), True)),
+    "mul_": ((lambda g, v, y, kw, out: np.multiply(g, v[1], out=out), True),
+             (lambda g, v, y, kw, out: np.multiply(g, v[0], out=out), True)),
+    "div_": ((lambda g, v, y, kw, out: np.divide(g, v[1], out=out), True),
+             (_div_grad_b, True)),
+    "pow_": ((_pow_grad_a, True), (_pow_grad_b, True)),
+    "dot_": ((lambda g, v, y, kw, out: np.matmul(g, ops._mT(v[1]), out=out), True),
+             (lambda g, v, y, kw, out: np.matmul(ops._mT(v[0]), g, out=out), True)),
+    "maximum_": ((lambda g, v, y, kw, out: np.multiply(g, v[0] >= v[1], out=out), True),
+                 (lambda g, v, y, kw, out: np.multiply(g, v[1] > v[0], out=out), True)),
+    "minimum_": ((lambda g, v, y, kw, out: np.multiply(g, v[0] <= v[1], out=out), True),
+                 (lambda g, v, y, kw, out: np.multiply(g, v[1] < v[0], out=out), True)),
+    "exp_": ((lambda g, v, y, kw, out: np.multiply(g, y, out=out), True),),
+    "log_": ((lambda g, v, y, kw, out: np.divide(g, v[0], out=out), True),),
+    "neg_": ((lambda g, v, y, kw, out: np.negative(g, out=out), True),),
+    "max_": ((_max_grad, True),),
+    "min_": ((_max_grad, True),),
+    "sum_": ((_sum_grad, False),),
+    "clip_": ((_clip_grad, True),),
+    "transpose_": ((_transpose_grad, False),),
+    "reshape_": ((lambda g, v, y, kw, out: g.reshape(v[0].shape), False),),
+    "flatten_": ((lambda g, v, y, kw, out: g.reshape(v[0].shape), False),),
+    "getitem_": ((_getitem_grad, True),),
+}
+
+
+class _Record(object):
+    """One traced call of a graph primitive."""
+
+    def __init__(self, name, fn, arguments, output):
+        self.name = name
+        self.fn = fn
+        self.arguments = arguments
+        self.output = output
+        self.inputs = [v for v in arguments.values() if isinstance(v, Tensor)]
+        self.attrs = {k: v for k, v in arguments.items()
+                      if not isinstance(v, Tensor)}
+        # gradient edges of ops without kernels, refreshed on each replay
+        self.edges = output.dependency
+
+
+class Recorder(object):
+    """Context manager recording the graph primitives called inside it."""
+
+    def __init__(self):
+        self.records = []
+        self._depth = 0
+        self._saved = {}
+
+    def __enter__(self):
+        for name in _primitive_names():
+            fn = getattr(ops, name)
+            self._saved[name] = fn
+            setattr(ops, name, self._wrap(name, fn))
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, fn in self._saved.items():
+            setattr(ops, name, fn)
+        self._saved = {}
+
+    def _wrap(self, name, fn):
+        signature = inspect.signature(fn)
+
+        def wrapper(*args, **kwargs):
+            # note:only the outermost primitive is recorded, so composite
+            # primitives such as sub_ become a single node
+            self._depth += 1
+            try:
+                out = fn(*args, **kwargs)
+            finally:
+                self._depth -= 1
+            if self._depth == 0:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                self.records.append(_Record(name, fn, bound.arguments, out))
+            return out
+
+        return wrapper
+
+
+class StaticPlan(object):
+    """
+    A traced training step (forward + loss + backward) with static buffers.
+
+    run() copies a batch into the input buffers and replays the step.
+    Batches with a different shape than the traced one run eagerly.
+    """
+
+    def __init__(self, model, inputs, targets, outputs, loss, records,
+                 fuse=True):
+        self.model = model
+        self.inputs = inputs
+        self.targets = targets
+        self.outputs = outputs
+        self.loss = loss
+
+        records = self._prune(records, [loss, outputs])
+        if fuse:
+            records = fuse_elementwise(records, [loss, outputs])
+        self._nodes = {id(rec.output) for rec in records}
+        self._nodes.update((id(inputs), id(targets)))
+        self._forward = [self._build_forward(rec) for rec in records]
+        self._backward = self._build_backward(records)
+
+    @staticmethod
+    def _prune(records, outputs):
+        # keep only the records the outputs depend on
+        needed = {id(t) for t in outputs}
+        kept = []
+        for rec in reversed(records):
+            if id(rec.output) in needed:
+                kept.append(rec)
+                needed.update(id(t) for t in rec.inputs)
+        return kept[::-1]
+
+    def _build_forward(self, rec):
+        out = rec.output
+        if isinstance(rec, FusedChain):
+            return rec.forward
+        if rec.name in _FORWARD:
+            kernel, attrs = _FORWARD[rec.name], rec.attrs
+            buf = out.values
+            if len(rec.inputs) == 1:
+                a, = rec.inputs
+                return lambda: kernel(buf, a.values, **attrs)
+            a, b = rec.inputs
+            return lambda: kernel(buf, a.values, b.values, **attrs)
+
+        if rec.name in _VIEWS:
+            kernel, attrs, a = _VIEWS[rec.name], rec.attrs, rec.inputs[0]
+
+            def view():
+                out._values = np.asarray(kernel(a.values, **attrs))
+            return view
+
+        # no kernel: rerun the op eagerly and keep its gradient edges
+        fn, arguments = rec.fn, rec.arguments
+
+        def opaque():
+            tmp = fn(**arguments)
+            out._values = tmp.values
+            rec.edges = tmp.dependency
+        return opaque
+
+    def _build_backward(self, records):
+        self._seed = np.ones(self.loss.shape, dtype=self.loss.dtype)
+        grads = {id(self.loss): self._seed}
+        steps = []
+        for rec in reversed(records):
+            g = grads.get(id(rec.output))
+            if g is None:
+                continue
+            targets = [(i, t) for i, t in enumerate(rec.inputs) if t.requires_grad]
+            if rec.name in _BACKWARD or isinstance(rec, FusedChain):
+                for i, t in targets:
+                    steps.append(self._build_edge(rec, i, t, g, grads))
+            elif rec.edges:
+                steps.append(self._build_opaque_edges(rec, targets, g, grads))
+        return steps
+
+    def _dest(self, t, grads):
+        """Return (buffer, first_writer) for the gradient of `t`."""
+        if id(t) not in self._nodes:
+            # leaf outside the plan (e.g. a parameter): accumulate into .grad
+            return None, False
+        if id(t) in grads:
+            return grads[id(t)], False
+        grads[id(t)] = np.empty(t.shape, dtype=t.dtype)
+        return grads[id(t)], True
+
+    @staticmethod
+    def _accumulate(t, buf, first, contrib):
+        if isinstance(contrib, ops.SparseRows):
+            # note:row-sparse gradients of lookup tables (leaves only)
+            t._accumulate_grad(contrib)
+            return
+        if contrib.shape != t.shape:
+            contrib = ops.handle_broadcasting(contrib, t)
+        if buf is None:
+            if t.grad is None:
+                t.zero_grad()
+            np.add(t.grad, contrib, out=t.grad, casting="same_kind")
+        elif first:
+            np.copyto(buf, contrib, casting="same_kind")
+        else:
+            np.add(buf, contrib, out=buf, casting="same_kind")
+
+    def _build_edge(self, rec, i, t, g, grads):
+        if isinstance(rec, FusedChain):
+            kernel, fresh = (lambda g, v, y, kw, out: rec.grad(g, out)), True
+        else:
+            kernel, fresh = _BACKWARD[rec.name][i]
+        buf, first = self._dest(t, grads)
+        inputs, out, attrs = rec.inputs, rec.output, rec.attrs
+        accumulate = self._accumulate
+        scratch = [None]
+
+        def edge():
+            values = [x.values for x in inputs]
+            contrib = kernel(g, values, out.values, attrs, scratch[0])
+            # note:ufuncs return numpy scalars for 0-d results
+            if fresh and isinstance(contrib, np.ndarray):
+                scratch[0] = contrib
+            accumulate(t, buf, first, contrib)
+        return edge
+
+    def _build_opaque_edges(self, rec, targets, g, grads):
+        dests = {}
+        for _, t in targets:
+            dests.setdefault(id(t), []).append(self._dest(t, grads))
+        accumulate = self._accumulate
+
+        def edges():
+            used = {}
+            for t, grad_fn in rec.edges:
+                # note:edges may point outside the inputs (e.g. checkpoint_
+                # sinks), those are accumulated like leaves
+                slots = dests.get(id(t))
+                if slots is None:
+                    buf, first = None, False
+                else:
+                    k = used.get(id(t), 0)
+                    used[id(t)] = k + 1
+                    buf, first = slots[k]
+                accumulate(t, buf, first, grad_fn(g))
+        return edges
+
+    def run(self, inputs, targets):
+        """Run forward, loss and backward for one batch, return the loss."""
+        x = inputs.values if isinstance(inputs, Tensor) else np.asarray(inputs)
+        y = targets.values if isinstance(targets, Tensor) else np.asarray(targets)
+        if x.shape != self.inputs.shape or y.shape != self.targets.shape:
+            return self._run_eager(inputs, targets)
+
+        np.copyto(self.inputs.values, x, casting="same_kind")
+        np.copyto(self.targets.values, y, casting="same_kind")
+        # note:seed backward with the current loss scale, Model.step unscales
+        scaler = self.model.loss_scaler
+        self._seed.fill(1.0 if scaler is None else scaler.loss_scale)
+        for step in self._forward:
+            step()
+        for step in self._backward:
+            step()
+        return self.loss.values.copy()
+
+    def _run_eager(self, inputs, targets):
+        pred = self.model.forward(to_Tensor(inputs))
+        loss = self.model.loss.loss(pred, to_Tensor(targets))
+        if self.model.loss_scaler is not None:
+            self.model.loss_scaler.scale(loss).backward()
+        else:
+            loss.backward()
+        return loss.values
+
+
+def trace_step(model, inputs, targets, fuse=True):
+    """
+    Trace model.forward + model.loss on one batch into a StaticPlan.
+    With `fuse`, elementwise chains are merged into fused kernels.
+    """
+    inputs = inputs.values if isinstance(inputs, Tensor) else inputs
+    targets = targets.values if isinstance(targets, Tensor) else targets
+    # the plan owns its input buffers
+    x, y = Tensor(np.array(inputs)), Tensor(np.array(targets))
+    with Recorder() as recorder:
+        outputs = model.forward(x)
+        loss = model.loss.loss(outputs, y)
+    return StaticPlan(model, x, y, outputs, loss, recorder.records, fuse=fuse)
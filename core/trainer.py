@@ -0,0 +1,459 @@
+"""
+Training loop around a Model.
+
+The Trainer runs epochs of mini-batch steps with gradient accumulation,
+learning rate schedules and early stopping. Validation and checkpointing
+run off the step loop:
+
+- at the end of an epoch the network is frozen (core.export), which copies
+  the parameters, and the frozen snapshot is evaluated in a background
+  thread while training continues. The frozen runtime is plain numpy and
+  does not touch the global autograd state (no_grad, buffer pool), and
+  numpy releases the GIL inside its kernels. Networks that cannot be
+  frozen are validated synchronously with Model.predict.
+- checkpoints are copies of the parameters (and optimizer state) pickled
+  by a background writer thread, written to a temporary file and renamed,
+  so a crash never leaves a half-written checkpoint behind.
+
+Early stopping acts on validation results as they come in, so training
+may run one epoch past the epoch that triggered it.
+
+The OnlineTrainer trains incrementally on a stream of samples instead of
+a dataset held in memory.
+"""
+
+import copy
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.export import freeze
+from core.Tensor import Tensor
+from utils.data_iterator import BatchIterator
+from utils.stream import RingBuffer
+from utils.stream import RunningNormalizer
+from utils.stream import as_batch
+
+
+def _write_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, -1)
+    os.replace(tmp, path)
+
+
+def _validate_frozen(frozen, evaluator, inputs, targets, batch_size):
+    start_time = time.time()
+    evaluator.reset()
+    for start in range(0, len(inputs), batch_size):
+        pred = frozen.run(inputs[start: start + batch_size], copy=False)
+        evaluator.update(pred, targets[start: start + batch_size])
+    return evaluator.result(), time.time() - start_time
+
+
+class Trainer(object):
+
+    def __init__(self,
+                 model,
+                 iterator=None,
+                 evaluator=None,
+                 accum_steps=1,
+                 scheduler=None,
+                 schedule_per_step=False,
+                 monitor=None,
+                 mode="max",
+                 patience=None,
+                 min_delta=0.0,
+                 restore_best=True,
+                 checkpoint_path=None,
+                 checkpoint_every=1,
+                 background=True,
+                 valid_batch_size=4096,
+                 verbose=True):
+        """
+        Args:
+            model: the Model to train
+            iterator: batch iterator, BatchIterator(32) by default
+            evaluator: a core.evaluator evaluator used for validation
+            accum_steps: number of mini-batches whose gradients are
+                averaged into one optimizer step
+            scheduler: an optimizer.BaseScheduler, stepped once per epoch
+                (or per optimizer step with `schedule_per_step`)
+            monitor: validation metric used for early stopping and for
+                picking the best parameters, e.g. "accuracy" or "rmse"
+            mode: "max" or "min", whether larger `monitor` values are better
+            patience: stop after this many validations without improvement
+            restore_best: load the best validated parameters after fit
+            checkpoint_path: write checkpoints here, "{epoch}" is replaced
+                by the epoch number
+            checkpoint_every: checkpoint every that many epochs
+            background: validate and checkpoint in background threads
+        """
+        assert mode in ("max", "min")
+        self.model = model
+        self.iterator = iterator or BatchIterator(batch_size=32)
+        self.evaluator = evaluator
+        self.accum_steps = accum_steps
+        self.scheduler = scheduler
+        self.schedule_per_step = schedule_per_step
+        self.monitor = monitor
+        self.mode = mode
+        self.patience = patience
+        self.min_delta = min_delta
+        self.restore_best = restore_best
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.background = background
+        self.valid_batch_size = valid_batch_size
+        self.verbose = verbose
+
+        self.history = []
+        self.best = None
+        self.best_epoch = None
+        self._best_params = None
+        self._wait = 0
+        self.stop_training = False
+
+        self._validator = None
+        self._writer = None
+        self._pending = []
+        self._writes = []
+
+    # ---- parameters ----
+
+    def _snapshot(self):
+        # copies of the parameters and buffers (running statistics) per layer
+        return [({k: np.array(v.values) for k, v in layer.params.items() if v is not None},
+                 {k: np.array(v) for k, v in getattr(layer, "buffers", {}).items()})
+                for layer in self.model.net.layers]
+
+    def _load_params(self, snapshot):
+        for layer, (values, buffers) in zip(self.model.net.layers, snapshot):
+            if any(layer.params.get(k) is None for k in values):
+                # layer not initialized yet
+                layer.bind_params({k: Tensor(np.array(v), requires_grad=True, dtype=v.dtype)
+                                   for k, v in values.items()})
+            else:
+                for k, v in values.items():
+                    # note:copy in place, parameters may be views of a flat buffer
+                    np.copyto(layer.params[k].values, v)
+            for k, v in buffers.items():
+                np.copyto(layer.buffers[k], v)
+
+    # ---- steps ----
+
+    def _backward(self, batch):
+        model = self.model
+        if model.plan is not None:
+            return model.plan.run(batch.inputs, batch.targets)
+        loss = model.loss.loss(model.forward(batch.inputs), batch.targets)
+        if model.loss_scaler is not None:
+            model.loss_scaler.scale(loss).backward()
+        else:
+            loss.backward()
+        return loss.values
+
+    def _apply_step(self, num_batches):
+        if num_batches > 1:
+            # accumulated gradients -> gradient of the mean loss
+            for params in self.model.net.get_parameters():
+                for v in params.values():
+                    if v is not None and v.grad is not None:
+                        v.grad *= 1.0 / num_batches
+        self.model.step()
+        if self.scheduler is not None and self.schedule_per_step:
+            self.scheduler.step()
+
+    def train_epoch(self, inputs, targets):
+        """Run one epoch, return the mean training loss."""
+        model = self.model
+        total, num_steps, num_batches = 0.0, 0, 0
+        for batch in self.iterator(inputs, targets):
+            if num_batches == 0:
+                model.zero_grad()
+            loss = self._backward(batch)
+            total += float(np.mean(loss))
+            num_steps += 1
+            num_batches += 1
+            if num_batches == self.accum_steps:
+                self._apply_step(num_batches)
+                num_batches = 0
+        if num_batches:
+            self._apply_step(num_batches)
+        return total / max(num_steps, 1)
+
+    # ---- validation ----
+
+    def _submit_validation(self, epoch, inputs, targets):
+        snapshot = self._snapshot() if self.restore_best else None
+        frozen = None
+        if self.background:
+            try:
+                frozen = freeze(self.model.net)
+            except ValueError:
+                frozen = None
+        if frozen is not None:
+            if self._validator is None:
+                self._validator = ThreadPoolExecutor(max_workers=1)
+            future = self._validator.submit(_validate_frozen, frozen, self.evaluator,
+                                            inputs, targets, self.valid_batch_size)
+            self._pending.append((epoch, future, snapshot))
+            return
+
+        phase = self.model.get_phase()
+        self.model.set_phase("TEST")
+        start_time = time.time()
+        pred = self.model.predict(inputs, batch_size=self.valid_batch_size)
+        self.model.set_phase(phase)
+        result = self.evaluator.evaluate(pred, targets), time.time() - start_time
+        self._on_validated(epoch, result, snapshot)
+
+    def _collect(self, wait=False):
+        # handle finished validations in epoch order
+        while self._pending and (wait or self._pending[0][1].done()):
+            epoch, future, snapshot = self._pending.pop(0)
+            self._on_validated(epoch, future.result(), snapshot)
+
+    def _improved(self, value):
+        if self.best is None:
+            return True
+        if self.mode == "max":
+            return value > self.best + self.min_delta
+        return value < self.best - self.min_delta
+
+    def _on_validated(self, epoch, result, snapshot):
+        metrics, valid_time = result
+        record = self.history[epoch]
+        record["valid"] = metrics
+        record["valid_time"] = valid_time
+        if self.verbose:
+            print("Epoch %d validation: %s" % (epoch, metrics))
+        if self.monitor is None:
+            return
+        # note:ensembles report one value per model, monitor their mean
+        value = float(np.mean(metrics[self.monitor]))
+        if self._improved(value):
+            self.best, self.best_epoch = value, epoch
+            self._best_params = snapshot
+            self._wait = 0
+        else:
+            self._wait += 1
+            if self.patience is not None and self._wait >= self.patience:
+                self.stop_training = True
+
+    # ---- checkpoints ----
+
+    def _submit_checkpoint(self, epoch):
+        path = self.checkpoint_path.format(epoch=epoch)
+        state = {"epoch": epoch,
+                 "params": self._snapshot(),
+                 "optimizer": copy.deepcopy(self.model.optimizer)}
+        if not self.background:
+            _write_checkpoint(path, state)
+            return
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1)
+        for future in [f for f in self._writes if f.done()]:
+            # note:re-raise errors of earlier writes
+            future.result()
+        self._writes = [f for f in self._writes if not f.done()]
+        self._writes.append(self._writer.submit(_write_checkpoint, path, state))
+
+    def load_checkpoint(self, path):
+        """Restore parameters and optimizer state, return the epoch of the checkpoint."""
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        self._load_params(state["params"])
+        self.model.optimizer = state["optimizer"]
+        if self.scheduler is not None:
+            self.scheduler._optim = self.model.optimizer
+        return state["epoch"]
+
+    # ---- loop ----
+
+    def fit(self, train_x, train_y, num_epochs, valid_x=None, valid_y=None):
+        """
+        Train for `num_epochs` epochs (or until early stopping) and return
+        the history, one dict per epoch.
+        """
+        validate = valid_x is not None and self.evaluator is not None
+        if validate:
+            valid_x = valid_x.values if isinstance(valid_x, Tensor) else valid_x
+            valid_y = valid_y.values if isinstance(valid_y, Tensor) else valid_y
+        self.stop_training = False
+        try:
+            for _ in range(num_epochs):
+                epoch = len(self.history)
+                self.model.set_phase("TRAIN")
+                start_time = time.time()
+                loss = self.train_epoch(train_x, train_y)
+                record = {"epoch": epoch, "loss": loss, "lr": self.model.optimizer.lr,
+                          "time": time.time() - start_time}
+                self.history.append(record)
+                if self.verbose:
+                    print("Epoch %d loss: %.6f time cost: %.4f" % (epoch, loss, record["time"]))
+
+                if self.scheduler is not None and not self.schedule_per_step:
+                    self.scheduler.step()
+                if self.checkpoint_path is not None and (epoch + 1) % self.checkpoint_every == 0:
+                    self._submit_checkpoint(epoch)
+                if validate:
+                    self._submit_validation(epoch, valid_x, valid_y)
+                    self._collect()
+                if self.stop_training:
+                    break
+            self._collect(wait=True)
+        finally:
+            self.close()
+
+        if self.restore_best and self._best_params is not None:
+            self._load_params(self._best_params)
+        return self.history
+
+    def close(self):
+        """Wait for background validation and checkpoint writes."""
+        for name in ("_validator", "_writer"):
+            executor = getattr(self, name)
+            if executor is not None:
+                executor.shutdown(wait=True)
+                setattr(self, name, None)
+        for future in self._writes:
+            future.result()
+        self._writes = []
+
+
+class OnlineTrainer(object):
+    """
+    Incremental training on a stream of samples.
+
+    Incoming samples go into a bounded replay buffer (utils.stream.RingBuffer)
+    and update running input (and optionally target) statistics. Every
+    `update_every` new samples, once the buffer holds `warmup` samples, the
+    model takes `steps_per_update` optimizer steps (Model.partial_fit) on
+    batches drawn from the buffer and normalized with the current
+    statistics. Memory stays O(buffer_size) however long the stream runs.
+    """
+
+    def __init__(self,
+                 model,
+                 buffer_size=10000,
+                 batch_size=64,
+                 update_every=32,
+                 steps_per_update=1,
+                 warmup=None,
+                 normalize_inputs=True,
+                 normalize_targets=False,
+                 max_count=None,
+                 rng=None):
+        """
+        Args:
+            model: the Model to train
+            buffer_size: capacity of the replay buffer in samples
+            update_every: new samples between two updates
+            warmup: samples needed before the first update, batch_size
+                by default
+            normalize_inputs / normalize_targets: standardize with running
+                statistics of the stream
+            max_count: cap on the history weight of the running statistics,
+                see RunningNormalizer
+            rng: np.random.Generator used to sample the buffer
+        """
+        self.model = model
+        self.buffer = RingBuffer(buffer_size, rng=rng)
+        self.batch_size = batch_size
+        self.update_every = update_every
+        self.steps_per_update = steps_per_update
+        self.warmup = batch_size if warmup is None else warmup
+        self.input_stats = RunningNormalizer(max_count=max_count) if normalize_inputs else None
+        self.target_stats = RunningNormalizer(max_count=max_count) if normalize_targets else None
+
+        self.num_seen = 0
+        self.num_updates = 0
+        self.last_loss = None
+        self._since_update = 0
+
+    def _normalize(self, inputs, targets=None):
+        if self.input_stats is not None:
+            inputs = self.input_stats.transform(inputs)
+        if targets is not None and self.target_stats is not None:
+            targets = self.target_stats.transform(targets)
+        return inputs, targets
+
+    def update(self):
+        """Take steps_per_update optimizer steps on batches from the buffer."""
+        self.model.set_phase("TRAIN")
+        for _ in range(self.steps_per_update):
+            inputs, targets = self._normalize(*self.buffer.sample(self.batch_size))
+            self.last_loss = float(np.mean(self.model.partial_fit(inputs, targets)))
+        self.num_updates += 1
+        self._since_update = 0
+        return self.last_loss
+
+    def observe(self, inputs, targets):
+        """
+        Feed one sample or a batch of samples (see utils.stream.as_batch).
+        Returns the loss of the last update if one was triggered, else None.
+        """
+        inputs, targets = as_batch(inputs, targets)
+        self.buffer.add(inputs, targets)
+        if self.input_stats is not None:
+            self.input_stats.update(inputs)
+        if self.target_stats is not None:
+            self.target_stats.update(targets)
+        self.num_seen += len(inputs)
+        self._since_update += len(inputs)
+        if self._since_update >= self.update_every and len(self.buffer) >= self.warmup:
+            return self.update()
+        return None
+
+    def fit_stream(self, stream, max_samples=None, callback=None):
+        """
+        Consume an iterator of (inputs, targets) until it is exhausted or
+        `max_samples` samples were seen. `callback(trainer, loss)` is called
+        after every update.
+        """
+        for inputs, targets in stream:
+            loss = self.observe(inputs, targets)
+            if loss is not None and callback is not None:
+                callback(self, loss)
+            if max_samples is not None and self.num_seen >= max_samples:
+                break
+        return self
+
+    async def afit_stream(self, stream, max_samples=None, callback=None):
+        """fit_stream for an async iterator (e.g. a feed read with asyncio)."""
+        async for inputs, targets in stream:
+            loss = self.observe(inputs, targets)
+            if loss is not None and callback is not None:
+                callback(self, loss)
+            if max_samples is not None and self.num_seen >= max_samples:
+                break
+        return self
+
+    def predict(self, inputs, batch_size=1024):
+        """Predictions for raw inputs, in the units of the raw targets."""
+        inputs, _ = self._normalize(np.asarray(inputs))
+        self.model.set_phase("TEST")
+        pred = self.model.predict(inputs, batch_size=batch_size)
+        self.model.set_phase("TRAIN")
+        if self.target_stats is not None:
+            pred = self.target_stats.inverse_transform(pred)
+        return pred
+
+    def freeze(self, dtype=np.float32):
+        """
+        Freeze the model for the runtime, with the current input / target
+        normalization folded in as affine ops around the network.
+        """
+        frozen = freeze(self.model.net, dtype)
+        if self.input_stats is not None and self.input_stats.mean is not None:
+            std = self.input_stats.std
+            frozen.ops.insert(0, ("affine", (1.0 / std).astype(dtype),
+                                  (-self.input_stats.mean / std).astype(dtype), None))
+        if self.target_stats is not None and self.target_stats.mean is not None:
+            frozen.ops.append(("affine", self.target_stats.std.astype(dtype),
+                               self.target_stats.mean.astype(dtype), None))
+        return frozen
@@ -7,10 +7,11 @@ import gzip
 import os
 import pickle
 import sys
-import time
 
 import numpy as np
 
+from core.dtype import LossScaler
+from core.dtype import set_storage_dtype
 from core.evaluator import AccEvaluator
 from core.layers import Dense
 from core.layers import ReLU
@@ -18,9 +19,10 @@ from core.losses import SoftmaxCrossEntropyLoss
 from core.model import Model
 from core.nn import Net
 from core.optimizer import Adam
-from core.tensor import Tensor
+from core.Tensor import Tensor
+from core.trainer import Trainer
 from utils.data_iterator import BatchIterator
-from utils.downloader import download_url
+from utils.dataset import download_url
 from utils.seeder import random_seed
 
 
@@ -45,9 +47,13 @@ def prepare_dataset(data_dir):
 def main(args):
     if args.seed >= 0:
         random_seed(args.seed);
+    if args.fp16:
+        # float16 parameter storage, float32 compute
+        set_storage_dtype(np.float16)
 
     train_set, valid_set, test_set = prepare_dataset(args.data_dir)
     train_x, train_y = train_set
+    valid_x, valid_y = valid_set
     test_x, test_y = test_set
     train_y = get_one_hot(train_y, 10)
     print(train_y.shape)
@@ -69,30 +75,21 @@ def main(args):
         
     ])
 
-    model = Model(net=net, loss=SoftmaxCrossEntropyLoss(), optimizer=Adam(lr=args.lr))
-
-    loss_layer = SoftmaxCrossEntropyLoss()    #todo 删除
-    iterator = BatchIterator(batch_size=args.batch_size)
-    evaluator = AccEvaluator()
-    loss_list = list()
-    for epoch in range(args.num_ep):
-        t_start = time.time()
-        for batch in iterator(train_x, train_y):
-            model.zero_grad()
-            pred = model.forward(batch.inputs)
-            loss = loss_layer.loss(pred, batch.targets)
-            loss.backward()
-            model.step()
-            loss_list.append(loss.values)
-        print("Epoch %d tim cost: %.4f" % (epoch, time.time() - t_start))
-        # evaluate
-        model.set_phase("TEST")
-        test_pred = model.forward(test_x)
-        test_pred_idx = np.argmax(test_pred, axis=1)
-        test_y_idx = test_y.values
-        res = evaluator.evaluate(test_pred_idx, test_y_idx)
-        print(res)
-        model.set_phase("TRAIN")
+    model = Model(net=net, loss=SoftmaxCrossEntropyLoss(), optimizer=Adam(lr=args.lr),
+                  loss_scaler=LossScaler() if args.fp16 else None)
+
+    trainer = Trainer(model,
+                      iterator=BatchIterator(batch_size=args.batch_size),
+                      evaluator=AccEvaluator(),
+                      monitor="accuracy",
+                      patience=args.patience,
+                      valid_batch_size=args.eval_batch_size)
+    trainer.fit(train_x, train_y, args.num_ep, valid_x, valid_y)
+
+    # evaluate
+    model.set_phase("TEST")
+    test_pred = model.predict(test_x, batch_size=args.eval_batch_size)
+    print(AccEvaluator().evaluate(test_pred, test_y))
 
 
 if __name__ == "__main__":
@@ -101,6 +98,11 @@ if __name__ == "__main__":
     parser.add_argument("--data_dir", default="./examples/mnist/data", type=str)
     parser.add_argument("--lr", default=1e-3, type=float)
     parser.add_argument("--batch_size", default=128, type=int)
+    parser.add_argument("--eval_batch_size", default=4096, type=int)
     parser.add_argument("--seed", default=-1, type=int)
+    parser.add_argument("--patience", default=None, type=int,
+                        help="stop after this many epochs without improvement")
+    parser.add_argument("--fp16", action="store_true",
+                        help="store parameters in float16 with loss scaling")
     args = parser.parse_args()
     main(args)
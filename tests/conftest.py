@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.dtype import default_dtype
+
+
+@pytest.fixture(autouse=True)
+def float64():
+    # note:finite differences need double precision
+    with default_dtype(np.float64):
+        yield
+
+
+def _numerical_grad(f, x, eps=1e-6):
+    """Central differences of the scalar f() w.r.t. the array x (changed in place)."""
+    grad = np.zeros(x.shape)
+    for idx in np.ndindex(*x.shape):
+        orig = x[idx]
+        x[idx] = orig + eps
+        up = f()
+        x[idx] = orig - eps
+        down = f()
+        x[idx] = orig
+        grad[idx] = (up - down) / (2 * eps)
+    return grad
+
+
+@pytest.fixture
+def numerical_grad():
+    return _numerical_grad
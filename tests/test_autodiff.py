@@ -0,0 +1,166 @@
+import numpy as np
+import pytest
+
+import core.ops as ops
+from core.autodiff import batch_jacobian
+from core.autodiff import jacobian
+from core.layers import BatchNorm1d
+from core.layers import Dense
+from core.layers import LayerNorm
+from core.layers import Sigmoid
+from core.layers import Tanh
+from core.nn import Net
+from core.Tensor import Tensor
+
+
+def _numerical_jacobian(fn, x, eps=1e-6):
+    y = fn(x)
+    jac = np.zeros(y.shape + x.shape)
+    for idx in np.ndindex(*x.shape):
+        up, down = x.copy(), x.copy()
+        up[idx] += eps
+        down[idx] -= eps
+        jac[(Ellipsis,) + idx] = (fn(up) - fn(down)) / (2 * eps)
+    return jac
+
+
+def _net():
+    net = Net([Dense(8), Tanh(), Dense(6), Sigmoid(), Dense(3)])
+    net.init_parameters(4, seed=0)
+    return net
+
+
+@pytest.mark.parametrize("mode", ["rev", "fwd"])
+def test_jacobian_matches_finite_differences(mode):
+    net = _net()
+    x = np.random.default_rng(0).normal(size=(2, 4))
+    expected = _numerical_jacobian(lambda v: net.forward(Tensor(v)).values, x)
+    np.testing.assert_allclose(jacobian(net.forward, x, mode=mode), expected,
+                               rtol=1e-6, atol=1e-8)
+    np.testing.assert_allclose(jacobian(net.forward, x, mode=mode, chunk_size=2), expected,
+                               rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize("mode", ["rev", "fwd"])
+def test_jacobian_of_ensemble_with_shared_inputs(mode):
+    # (batch, num_in) inputs shared by the models of (K, num_in, num_out) layers
+    net = Net([Dense(5, num_models=3), Tanh(), Dense(2, num_models=3)])
+    net.init_parameters(4, seed=0)
+    x = np.random.default_rng(4).normal(size=(2, 4))
+    expected = _numerical_jacobian(lambda v: net.forward(Tensor(v)).values, x)
+    np.testing.assert_allclose(jacobian(net.forward, x, mode=mode), expected,
+                               rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize("mode", ["rev", "fwd"])
+def test_batch_jacobian_matches_per_sample_jacobians(mode):
+    net = _net()
+    x = np.random.default_rng(1).normal(size=(5, 4))
+    jac = batch_jacobian(net.forward, x, mode=mode)
+    for i in range(len(x)):
+        expected = _numerical_jacobian(lambda v: net.forward(Tensor(v[None])).values[0], x[i])
+        np.testing.assert_allclose(jac[i], expected, rtol=1e-6, atol=1e-8)
+
+
+def _grid(n=4, seed=0):
+    rng = np.random.default_rng(seed)
+    # a ring of lines plus shunts: symmetric complex admittance matrix
+    y_line = rng.uniform(1, 5, n) - 1j * rng.uniform(5, 20, n)
+    ybus = np.zeros((n, n), complex)
+    for k in range(n):
+        i, j = k, (k + 1) % n
+        ybus[i, j] -= y_line[k]
+        ybus[j, i] -= y_line[k]
+        ybus[i, i] += y_line[k]
+        ybus[j, j] += y_line[k]
+    ybus[np.diag_indices(n)] += 1j * rng.uniform(0.01, 0.1, n)
+    vm = rng.uniform(0.95, 1.05, (3, n))
+    va = rng.uniform(-0.2, 0.2, (3, n))
+    p, q = rng.normal(size=(3, n)), rng.normal(size=(3, n))
+    return ybus, vm, va, p, q
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_power_flow_residual_gradients(sparse, numerical_grad):
+    ybus, vm, va, p, q = _grid()
+    if sparse:
+        ybus = pytest.importorskip("scipy.sparse").csr_matrix(ybus)
+    inputs = [Tensor(a, requires_grad=True) for a in (vm, va, p, q)]
+    weights = np.random.default_rng(1).normal(size=(3, 2 * vm.shape[-1]))
+
+    def loss():
+        return ops.sum(ops.power_flow_residual(*inputs, ybus) * weights)
+
+    loss().backward()
+    for t in inputs:
+        expected = numerical_grad(lambda: float(loss().values), t.values)
+        np.testing.assert_allclose(t.grad, expected, rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize("mode", ["rev", "fwd"])
+def test_power_flow_residual_jacobian(mode):
+    ybus, vm, va, p, q = _grid(seed=2)
+    vm, va, p, q = vm[0], va[0], p[0], q[0]
+
+    def fn(angles):
+        return ops.power_flow_residual(vm, angles, p, q, ybus)
+
+    expected = _numerical_jacobian(lambda a: fn(Tensor(a)).values, va)
+    np.testing.assert_allclose(jacobian(fn, va, mode=mode), expected, rtol=1e-6, atol=1e-8)
+
+
+def _norm_net(phase, num_models=None):
+    layers = [Dense(8, num_models=num_models), BatchNorm1d(num_models=num_models), Tanh(),
+              Dense(6, num_models=num_models), LayerNorm(num_models=num_models),
+              Dense(3, num_models=num_models)]
+    net = Net(layers)
+    net.init_parameters(4, seed=0)
+    rng = np.random.default_rng(5)
+    for layer in net.layers:
+        for name, p in layer.params.items():
+            if name in ("gamma", "beta"):
+                p.values[...] = rng.normal(size=p.shape)
+        for buf in layer.buffers.values():
+            buf[...] = rng.uniform(0.5, 1.5, size=buf.shape)
+    net.set_phase(phase)
+    return net
+
+
+@pytest.mark.parametrize("mode", ["rev", "fwd"])
+@pytest.mark.parametrize("phase", ["TEST", "TRAIN"])
+@pytest.mark.parametrize("num_models", [None, 2])
+def test_jacobian_through_normalization(mode, phase, num_models):
+    net = _norm_net(phase, num_models)
+    x = np.random.default_rng(6).normal(size=(5, 4))
+
+    def forward(v):
+        # note:in TRAIN phase the outputs use the batch statistics only
+        return net.forward(v if isinstance(v, Tensor) else Tensor(v))
+
+    expected = _numerical_jacobian(lambda v: forward(v).values, x)
+    buffers = [b.copy() for layer in net.layers for b in layer.buffers.values()]
+    np.testing.assert_allclose(jacobian(forward, x, mode=mode), expected, rtol=1e-5, atol=1e-7)
+    for buf, before in zip((b for layer in net.layers for b in layer.buffers.values()), buffers):
+        np.testing.assert_array_equal(buf, before)
+    if phase == "TEST" and num_models is None:
+        jac = batch_jacobian(forward, x, mode=mode)
+        for i in range(len(x)):
+            np.testing.assert_allclose(jac[i], expected[i, :, i], rtol=1e-5, atol=1e-7)
+
+
+def test_normalize_parameter_tangents():
+    rng = np.random.default_rng(7)
+    x = rng.normal(size=(6, 5))
+    beta = Tensor(rng.normal(size=(1, 5)))
+    for fixed in (False, True):
+        stats = dict(mean=x.mean(axis=0, keepdims=True) + 0.1, var=x.var(axis=0, keepdims=True)
+                     + 0.2) if fixed else {}
+
+        def fn(gamma):
+            return ops.normalize(Tensor(x), gamma, beta, axis=0, **stats)
+
+        gamma = rng.normal(size=(1, 5))
+        expected = _numerical_jacobian(lambda g: fn(Tensor(g)).values, gamma)
+        for mode in ("rev", "fwd"):
+            np.testing.assert_allclose(jacobian(fn, gamma, mode=mode), expected,
+                                       rtol=1e-6, atol=1e-8)
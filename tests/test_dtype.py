@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import core.ops as ops
+from core.dtype import default_dtype
+from core.dtype import set_storage_dtype
+from core.layers import Dense
+from core.layers import Sigmoid
+from core.losses import MSELoss
+from core.nn import Net
+from core.Tensor import Tensor
+
+
+@pytest.fixture
+def float32():
+    with default_dtype(np.float32):
+        yield
+
+
+@pytest.mark.parametrize("values", [2, 2.5, [1.0, 2.0], np.ones(3), np.ones(3, np.float16)])
+def test_floats_and_python_numbers_take_the_default_dtype(float32, values):
+    assert Tensor(values).dtype == np.float32
+
+
+@pytest.mark.parametrize("values", [[1, 2], np.array([1, 2]), np.array([1, 2], np.int32),
+                                    np.array([True, False]), [True, False], True])
+def test_integer_and_bool_values_keep_their_dtype(float32, values):
+    # the same rule for arrays and sequences: labels and indices stay exact
+    assert Tensor(values).dtype == np.asarray(values).dtype
+
+
+def test_scalar_operands_and_gradients_do_not_promote(float32):
+    x = Tensor(np.linspace(-1, 1, 6).reshape(2, 3), requires_grad=True)
+    y = 1.0 / (1.0 + ops.exp(-x)) * 2 - 0.5
+    assert y.dtype == np.float32
+    ops.sum(y).backward()
+    assert x.grad.dtype == np.float32
+
+
+def test_float16_storage_computes_in_default_dtype(float32):
+    set_storage_dtype(np.float16)
+    try:
+        net = Net([Dense(8), Sigmoid(), Dense(1)])
+        net.init_parameters(4, seed=0)
+    finally:
+        set_storage_dtype(None)
+    params = [p for layer in net.get_parameters() for p in layer.values()]
+    assert all(p.dtype == np.float16 for p in params)
+    out = net.forward(Tensor(np.ones((5, 4))))
+    assert out.dtype == np.float32
+    MSELoss().loss(out, Tensor(np.zeros((5, 1)))).backward()
+    assert all(p.grad.dtype == np.float16 for p in params)
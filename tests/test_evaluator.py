@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from core.evaluator import AccEvaluator
+from core.evaluator import ConfusionMatrixEvaluator
+from core.evaluator import MAEEvaluator
+from core.evaluator import MAPEEvaluator
+from core.evaluator import MSEEvaluator
+from core.evaluator import RMSEEvaluator
+
+
+def _stream(evaluator, preds, targets, batch_size):
+    evaluator.reset()
+    for start in range(0, targets.shape[0], batch_size):
+        # ensemble predictions carry the batch on axis 1
+        chunk = preds[..., start: start + batch_size, :]
+        evaluator.update(chunk, targets[start: start + batch_size])
+    return evaluator.result()
+
+
+def _assert_same(streamed, expected):
+    assert streamed.keys() == expected.keys()
+    for key in expected:
+        np.testing.assert_allclose(streamed[key], expected[key], rtol=1e-12)
+
+
+def _classification(ensemble):
+    rng = np.random.default_rng(0)
+    targets = rng.integers(0, 4, size=50)
+    scores = rng.normal(size=((3,) if ensemble else ()) + (50, 4))
+    return scores, targets
+
+
+def _regression(ensemble):
+    rng = np.random.default_rng(1)
+    targets = rng.normal(size=(50, 2))
+    # zero targets are skipped by MAPE
+    targets[::7] = 0.0
+    preds = targets + rng.normal(scale=0.1, size=((3,) if ensemble else ()) + (50, 2))
+    return preds, targets
+
+
+@pytest.mark.parametrize("ensemble", [False, True])
+@pytest.mark.parametrize("evaluator", [AccEvaluator(), ConfusionMatrixEvaluator(4)])
+def test_streaming_classification_matches_one_shot(evaluator, ensemble):
+    scores, targets = _classification(ensemble)
+    expected = evaluator.evaluate(scores, targets)
+    for batch_size in (1, 7, 50):
+        _assert_same(_stream(evaluator, scores, targets, batch_size), expected)
+    hits = scores.argmax(axis=-1) == targets
+    np.testing.assert_allclose(expected["accuracy"], hits.mean(axis=-1))
+
+
+@pytest.mark.parametrize("ensemble", [False, True])
+@pytest.mark.parametrize("evaluator, key, reference", [
+    (MAEEvaluator(), "mae", lambda err, t: np.abs(err).mean(axis=(-2, -1))),
+    (MSEEvaluator(), "mse", lambda err, t: (err ** 2).mean(axis=(-2, -1))),
+    (RMSEEvaluator(), "rmse", lambda err, t: np.sqrt((err ** 2).mean(axis=(-2, -1)))),
+    (MAPEEvaluator(), "mape", lambda err, t: 100.0 * np.abs(err[..., t != 0] / t[t != 0])
+     .mean(axis=-1)),
+])
+def test_streaming_regression_matches_one_shot(evaluator, key, reference, ensemble):
+    preds, targets = _regression(ensemble)
+    expected = evaluator.evaluate(preds, targets)
+    for batch_size in (1, 7, 50):
+        _assert_same(_stream(evaluator, preds, targets, batch_size), expected)
+    np.testing.assert_allclose(expected[key], reference(preds - targets, targets), rtol=1e-12)
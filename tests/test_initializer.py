@@ -0,0 +1,57 @@
+import numpy as np
+
+from core.layers import Dense
+from core.layers import Tanh
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import SGD
+from core.Tensor import Tensor
+from utils.seeder import random_seed
+
+
+def _params(net):
+    return [p.values for layer in net.get_parameters() for p in layer.values()]
+
+
+def _net(num_out=1, seed=None):
+    net = Net([Dense(8), Tanh(), Dense(num_out)])
+    net.init_parameters(4, seed=seed)
+    return net
+
+
+def test_same_seed_gives_identical_parameters():
+    for p, q in zip(_params(_net(seed=3)), _params(_net(seed=3))):
+        np.testing.assert_array_equal(p, q)
+    assert not np.array_equal(_net(seed=3).flat_parameters, _net(seed=4).flat_parameters)
+    # unseeded nets follow the global seed
+    random_seed(5)
+    first = _net().flat_parameters
+    random_seed(5)
+    np.testing.assert_array_equal(_net().flat_parameters, first)
+
+
+def test_layers_draw_from_their_own_streams():
+    # the first layer does not depend on the size of the last one
+    p, q = _params(_net(num_out=1, seed=3)), _params(_net(num_out=5, seed=3))
+    np.testing.assert_array_equal(p[0], q[0])
+    np.testing.assert_array_equal(p[1], q[1])
+
+
+def test_flat_buffer_aliases_parameters():
+    net = _net(seed=0)
+    params = _params(net)
+    assert sum(p.size for p in params) == net.flat_parameters.size
+    for p in params:
+        assert np.shares_memory(p, net.flat_parameters)
+    net.flat_parameters[:] = 0.0
+    assert all(not p.any() for p in params)
+
+    # optimizer steps land in the flat buffer
+    net.init_parameters(4, seed=0)
+    model = Model(net, MSELoss(), SGD(lr=0.1))
+    before = net.flat_parameters.copy()
+    model.partial_fit(Tensor(np.ones((2, 4))), Tensor(np.zeros((2, 1))))
+    assert not np.array_equal(net.flat_parameters, before)
+    np.testing.assert_array_equal(np.concatenate([p.ravel() for p in _params(net)]),
+                                  net.flat_parameters)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from core.layers import Dense
+from core.layers import ReLU
+from core.memory import MemoryTracker
+from core.nn import Net
+from core.Tensor import Tensor
+
+
+def test_layer_bytes_match_array_sizes():
+    batch, item = 64, np.dtype(np.float64).itemsize
+    net = Net([Dense(32), ReLU(), Dense(4)])
+    with MemoryTracker() as tracker:
+        net.init_parameters(16, seed=0)
+        x = Tensor(np.ones((batch, 16)))
+        num_params = 16 * 32 + 32 + 32 * 4 + 4
+        # one flat parameter buffer, a gradient per parameter and the inputs
+        assert tracker.live == {"values": (num_params + batch * 16) * item,
+                                "grads": num_params * item, "closures": 0}
+        start = tracker.live_bytes
+        out = net.forward(x)
+
+    # Dense: the matmul and the bias add results
+    assert tracker.layer_deltas["0.Linear"] == 2 * batch * 32 * item
+    # ReLU: its result and the boolean mask its backward keeps
+    assert tracker.layer_deltas["1.ReLU"] == batch * 32 * item + batch * 32
+    assert tracker.layer_deltas["2.Linear"] == 2 * batch * 4 * item
+    live = start
+    for key in ("0.Linear", "1.ReLU", "2.Linear"):
+        live += tracker.layer_deltas[key]
+        # nothing is freed during the forward, so a layer peaks at its end
+        assert tracker.layer_peaks[key] == live
+    assert tracker.live_bytes == tracker.peak_bytes == live
+    # the output and the results that only it references go with it
+    del out
+    assert tracker.live_bytes == live - 2 * batch * 4 * item
@@ -0,0 +1,44 @@
+import numpy as np
+
+from core.layers import Dense
+from core.layers import Tanh
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+from core.Tensor import Tensor
+
+K = 3
+
+
+def _model(num_models=None):
+    net = Net([Dense(8, num_models=num_models), Tanh(), Dense(1, num_models=num_models)])
+    net.init_parameters(5, seed=0)
+    return Model(net, MSELoss(), Adam(1e-2))
+
+
+def test_predict_chunks_per_model_inputs():
+    model = _model(num_models=K)
+    x = np.random.default_rng(0).normal(size=(K, 10, 5))
+    pred = model.predict(x, batch_size=4)
+    assert pred.shape == (K, 10, 1)
+    np.testing.assert_allclose(pred, model.forward(Tensor(x)).values)
+
+
+def test_ensemble_trains_like_separate_models():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(K, 16, 5)), rng.normal(size=(K, 16, 1))
+    ensemble = _model(num_models=K)
+    models = [_model() for _ in range(K)]
+    for k, model in enumerate(models):
+        for layer, ens_layer in zip(model.net.layers, ensemble.net.layers):
+            for name, param in layer.params.items():
+                param.values[...] = ens_layer.params[name].values[k]
+
+    for _ in range(5):
+        losses = ensemble.partial_fit(x, y)
+        separate = [model.partial_fit(x[k], y[k]) for k, model in enumerate(models)]
+        np.testing.assert_allclose(losses, separate)
+    pred = ensemble.predict(x, batch_size=4)
+    for k, model in enumerate(models):
+        np.testing.assert_allclose(pred[k], model.predict(x[k], batch_size=4))
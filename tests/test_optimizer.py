@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import core.ops as ops
+from core.layers import Embedding
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import SGD
+from core.optimizer import Adam
+from core.optimizer import Momentum
+from core.Tensor import Tensor
+
+
+@pytest.mark.parametrize("optim", [SGD, Momentum, Adam])
+def test_sparse_step_matches_dense_step(optim):
+    rng = np.random.default_rng(0)
+    model = Model(Net([Embedding(10, 3)]), MSELoss(), optim(lr=0.1))
+    table = model.net.layers[0].params["w"]
+    dense = Tensor(table.values.copy(), requires_grad=True)
+    dense_optim = optim(lr=0.1)
+    initial = table.values.copy()
+    # row 4 is looked up twice per step, rows 0, 2, 3, 5, 6, 8, 9 never
+    ids = np.array([1, 4, 4, 7])
+    touched = np.isin(np.arange(10), ids)
+
+    for _ in range(3):
+        model.zero_grad()
+        ops.sum(model.forward(ids) * rng.normal(size=(4, 3))).backward()
+        assert isinstance(table.grad, ops.SparseRows)
+        grad = table.grad.to_dense()
+        model.step()
+        step = dense_optim.compute_step([{"w": grad}], [{"w": dense}])[0]["w"]
+        dense.values += step
+
+        np.testing.assert_allclose(table.values[touched], dense.values[touched], rtol=1e-12)
+        np.testing.assert_array_equal(table.values[~touched], initial[~touched])
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from core.evaluator import AccEvaluator
+from core.export import freeze
+from core.layers import BatchNorm1d
+from core.layers import Dense
+from core.layers import Embedding
+from core.layers import LayerNorm
+from core.layers import ReLU
+from core.layers import Sigmoid
+from core.layers import Tanh
+from core.nn import Net
+from core.quantize import quantize
+from core.quantize import report
+from core.runtime import FrozenNet
+from core.runtime import load
+from core.Tensor import Tensor
+
+
+def _ops(rng):
+    f = np.float32
+    w = rng.normal(size=(6, 8)).astype(f)
+    return {
+        "dense": [("dense", w, rng.normal(size=(1, 8)).astype(f), "relu")],
+        "affine": [("affine", rng.normal(size=(1, 6)).astype(f),
+                    rng.normal(size=(1, 6)).astype(f), "tanh")],
+        "layernorm": [("layernorm", rng.normal(size=(1, 6)).astype(f),
+                       rng.normal(size=(1, 6)).astype(f), np.array(1e-5, f), None)],
+        "act": [("act", "sigmoid")],
+        "qdense": quantize(FrozenNet([("dense", w, np.zeros((1, 8), f), None)])).ops,
+    }
+
+
+@pytest.mark.parametrize("kind", ["dense", "qdense", "affine", "layernorm", "act"])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load_round_trip(kind, mmap, tmp_path):
+    rng = np.random.default_rng(0)
+    frozen = FrozenNet(_ops(rng)[kind])
+    assert frozen.ops[0][0] == kind
+    x = rng.normal(size=(5, 6)).astype(np.float32)
+    path = str(tmp_path / "model.bin")
+    frozen.save(path)
+    np.testing.assert_array_equal(load(path, mmap=mmap).run(x), frozen.run(x))
+
+
+def test_embedding_round_trip(tmp_path):
+    rng = np.random.default_rng(1)
+    frozen = FrozenNet([("embedding", rng.normal(size=(10, 3)).astype(np.float32), None)])
+    ids = rng.integers(0, 10, size=(4, 2))
+    path = str(tmp_path / "model.bin")
+    frozen.save(path)
+    out = load(path).run(ids)
+    assert out.shape == (4, 6)
+    np.testing.assert_array_equal(out, frozen.run(ids))
+
+
+def test_exported_net_round_trip(tmp_path):
+    net = Net([Dense(16), LayerNorm(), Tanh(), Dense(8), BatchNorm1d(), ReLU(),
+               LayerNorm(), BatchNorm1d(), Sigmoid(), Dense(2)])
+    net.init_parameters(6, seed=0)
+    net.set_phase("TEST")
+    x = np.random.default_rng(2).normal(size=(7, 6))
+    frozen = freeze(net)
+    kinds = {op[0] for op in frozen.ops}
+    assert {"dense", "layernorm", "affine"} <= kinds
+    path = str(tmp_path / "model.bin")
+    frozen.save(path)
+    np.testing.assert_allclose(load(path).run(x), net.forward(Tensor(x)).values, rtol=1e-4, atol=1e-5)
+
+
+def test_embedding_net_round_trip(tmp_path):
+    net = Net([Embedding(50, 4), Dense(3)])
+    net.init_parameters(2, seed=0)
+    ids = np.random.default_rng(3).integers(0, 50, size=(5, 2))
+    path = str(tmp_path / "model.bin")
+    freeze(net).save(path)
+    np.testing.assert_allclose(load(path).run(ids), net.forward(Tensor(ids)).values, rtol=1e-5, atol=1e-6)
+
+
+def test_quantized_weight_error_is_bounded():
+    rng = np.random.default_rng(4)
+    w, x = rng.normal(size=(32, 16)).astype(np.float32), rng.normal(size=(64, 32))
+    qdense = quantize(FrozenNet([("dense", w, np.zeros((1, 16), np.float32), None)]))
+    _, w_q, w_scale, _, _, _ = qdense.ops[0]
+    # rounding moves every weight by at most half a step of its channel
+    assert np.all(np.abs(w_q * w_scale - w) <= w_scale / 2 + 1e-7)
+    bound = np.abs(x) @ np.broadcast_to(w_scale / 2, w.shape) + 1e-4
+    assert np.all(np.abs(qdense.run(x) - x @ w) <= bound)
+
+
+@pytest.mark.parametrize("activations", [False, True])
+def test_quantized_accuracy_loss_is_small(activations):
+    net = Net([Dense(64), ReLU(), Dense(64), ReLU(), Dense(10)])
+    net.init_parameters(20, seed=0)
+    frozen = freeze(net)
+    x = np.random.default_rng(5).normal(size=(2000, 20)).astype(np.float32)
+    labels = frozen.run(x).argmax(axis=-1)
+    quantized = quantize(frozen, x[:500], activations=activations)
+    result = report(frozen, quantized, x, labels, AccEvaluator())
+    assert result["quantized_bytes"] < 0.3 * result["float_bytes"]
+    scale = np.abs(frozen.run(x)).mean()
+    assert result["mean_abs_diff"] < 0.05 * scale
+    assert result["delta"]["accuracy"] > -0.05
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+import core.fusion as fusion
+from core.dtype import LossScaler
+from core.layers import Dense
+from core.layers import ReLU
+from core.layers import Sigmoid
+from core.layers import Tanh
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import SGD
+from core.Tensor import Tensor
+
+
+def _model():
+    net = Net([Dense(16), Sigmoid(), Dense(16), Tanh(), Dense(8), ReLU(), Dense(1)])
+    net.init_parameters(6, seed=0)
+    return Model(net, MSELoss(), SGD(lr=0.1))
+
+
+def _grads(model):
+    return [p.grad.copy() for layer in model.net.get_parameters() for p in layer.values()]
+
+
+def _eager(model, x, y):
+    model.zero_grad()
+    loss = model.loss.loss(model.forward(Tensor(x)), Tensor(y))
+    loss.backward()
+    return loss.values, _grads(model)
+
+
+@pytest.mark.parametrize("fuse", [False, True])
+def test_plan_matches_eager(fuse):
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=(32, 6)), rng.normal(size=(32, 1))
+    model = _model()
+    plan = model.compile(x, y, fuse=fuse)
+    for _ in range(2):
+        # new batch values, same shape: replayed by the plan
+        x, y = rng.normal(size=(32, 6)), rng.normal(size=(32, 1))
+        loss, expected = _eager(model, x, y)
+        model.zero_grad()
+        np.testing.assert_allclose(plan.run(x, y), loss, rtol=1e-10)
+        for g, e in zip(_grads(model), expected):
+            np.testing.assert_allclose(g, e, rtol=1e-9, atol=1e-12)
+
+
+def test_plan_runs_other_shapes_eagerly():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(32, 6)), rng.normal(size=(32, 1))
+    model = _model()
+    plan = model.compile(x, y)
+    x, y = x[:10], y[:10]
+    loss, expected = _eager(model, x, y)
+    model.zero_grad()
+    np.testing.assert_allclose(plan.run(x, y), loss)
+    for g, e in zip(_grads(model), expected):
+        np.testing.assert_allclose(g, e)
+
+
+@pytest.mark.parametrize("batch_size", [32, 10])
+def test_plan_applies_loss_scale(batch_size):
+    rng = np.random.default_rng(2)
+    x, y = rng.normal(size=(32, 6)), rng.normal(size=(32, 1))
+    steps = []
+    for compiled in (False, True):
+        model = _model()
+        model.loss_scaler = LossScaler(init_scale=1024)
+        if compiled:
+            model.compile(x, y)
+        before = [p.values.copy() for layer in model.net.get_parameters() for p in layer.values()]
+        model.partial_fit(x[:batch_size], y[:batch_size])
+        after = [p.values for layer in model.net.get_parameters() for p in layer.values()]
+        steps.append([a - b for a, b in zip(after, before)])
+    for compiled, eager in zip(steps[1], steps[0]):
+        np.testing.assert_allclose(compiled, eager, rtol=1e-8, atol=1e-12)
+
+
+class _CountingNumexpr(object):
+
+    def __init__(self, numexpr):
+        self.numexpr = numexpr
+        self.calls = 0
+
+    def evaluate(self, *args, **kwargs):
+        self.calls += 1
+        return self.numexpr.evaluate(*args, **kwargs)
+
+
+@pytest.mark.parametrize("with_numexpr", [False, True])
+def test_fused_plan_matches_unfused(with_numexpr, monkeypatch):
+    numexpr = None
+    if with_numexpr:
+        numexpr = _CountingNumexpr(pytest.importorskip("numexpr"))
+    monkeypatch.setattr(fusion, "_numexpr", numexpr)
+    rng = np.random.default_rng(3)
+    # the input sigmoid is a chain on a constant input: numexpr runs it
+    x = rng.normal(size=(2, fusion.NUMEXPR_MIN_SIZE // 8, 8))
+    y = rng.normal(size=(2, fusion.NUMEXPR_MIN_SIZE // 8, 1))
+    results = []
+    for fuse in (False, True):
+        net = Net([Sigmoid(), Dense(16), Tanh(), Dense(1)])
+        net.init_parameters(8, seed=0)
+        model = Model(net, MSELoss(), SGD(lr=0.1))
+        plan = model.compile(x[0], y[0], fuse=fuse)
+        model.zero_grad()
+        results.append((plan.run(x[1], y[1]), _grads(model)))
+    (loss, grads), (fused_loss, fused_grads) = results
+    np.testing.assert_allclose(fused_loss, loss, rtol=1e-12)
+    for g, e in zip(fused_grads, grads):
+        np.testing.assert_allclose(g, e, rtol=1e-10, atol=1e-14)
+    if with_numexpr:
+        assert numexpr.calls > 0
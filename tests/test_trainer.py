@@ -0,0 +1,93 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from core.evaluator import BaseEvaluator
+from core.layers import Dense
+from core.layers import Tanh
+from core.losses import MSELoss
+from core.model import Model
+from core.nn import Net
+from core.optimizer import Adam
+from core.trainer import Trainer
+from utils.data_iterator import BatchIterator
+
+
+class _Scripted(BaseEvaluator):
+    """Reports the next of the given "rmse" values on every validation."""
+
+    def __init__(self, values):
+        self.values = list(values)
+        super().__init__()
+
+    def reset(self):
+        pass
+
+    def update(self, preds, targets):
+        pass
+
+    def result(self):
+        return {"rmse": self.values.pop(0)}
+
+
+def _model():
+    net = Net([Dense(8), Tanh(), Dense(1)])
+    net.init_parameters(4, seed=0)
+    return Model(net, MSELoss(), Adam(1e-2))
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(64, 4)), rng.normal(size=(64, 1))
+
+
+def _params(model):
+    return [p.values.copy() for layer in model.net.get_parameters() for p in layer.values()]
+
+
+def _trainer(model, values, **kwargs):
+    return Trainer(model, BatchIterator(16, rng=np.random.default_rng(1)),
+                   evaluator=_Scripted(values), monitor="rmse", mode="min",
+                   verbose=False, **kwargs)
+
+
+def test_early_stopping_at_patience():
+    x, y = _data()
+    trainer = _trainer(_model(), [1.0, 0.5, 0.6, 0.7, 0.8, 0.9], patience=2, background=False)
+    history = trainer.fit(x, y, num_epochs=6, valid_x=x, valid_y=y)
+    assert len(history) == 4
+    assert trainer.best_epoch == 1 and trainer.best == 0.5
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_restores_best_parameters(background, tmp_path):
+    x, y = _data()
+    model = _model()
+    path = str(tmp_path / "epoch{epoch}.pkl")
+    trainer = _trainer(model, [1.0, 0.5, 0.6, 0.7], checkpoint_path=path,
+                       background=background)
+    trainer.fit(x, y, num_epochs=4, valid_x=x, valid_y=y)
+    assert trainer.best_epoch == 1
+    # the checkpoint of an epoch holds the parameters validated for it
+    with open(path.format(epoch=1), "rb") as f:
+        best = [v for values, _ in pickle.load(f)["params"] for v in values.values()]
+    for p, b in zip(_params(model), best):
+        np.testing.assert_array_equal(p, b)
+
+
+def test_checkpoint_round_trip(tmp_path):
+    x, y = _data()
+    model = _model()
+    path = str(tmp_path / "last.pkl")
+    Trainer(model, BatchIterator(16), checkpoint_path=path, verbose=False).fit(x, y, 3)
+
+    restored = _model()
+    restored.partial_fit(x, y)
+    assert Trainer(restored, verbose=False).load_checkpoint(path) == 2
+    for p, q in zip(_params(restored), _params(model)):
+        np.testing.assert_array_equal(p, q)
+    # the optimizer state comes back too: both continue identically
+    np.testing.assert_array_equal(restored.partial_fit(x, y), model.partial_fit(x, y))
+    for p, q in zip(_params(restored), _params(model)):
+        np.testing.assert_array_equal(p, q)
@@ -0,0 +1,45 @@
+"""Data Iterator class."""
+
+from collections import namedtuple
+
+import numpy as np
+
+from core.Tensor import Tensor
+from utils.seeder import get_rng
+
+Batch = namedtuple("Batch", ["inputs", "targets"])
+
+
+class BaseIterator(object):
+
+    def __call__(self, inputs, targets):
+        raise NotImplementedError
+
+
+class BatchIterator(BaseIterator):
+    """
+    Yield mini-batches of Tensors.
+
+    `inputs` and `targets` may be numpy arrays or Tensors. Floating batches
+    are cast to the default dtype, integer labels keep their dtype.
+    Shuffling draws from `rng` (a np.random.Generator), or from the global
+    stream of utils.seeder.
+    """
+
+    def __init__(self, batch_size=32, shuffle=True, rng=None):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = rng
+
+    def __call__(self, inputs, targets):
+        inputs = inputs.values if isinstance(inputs, Tensor) else inputs
+        targets = targets.values if isinstance(targets, Tensor) else targets
+
+        indices = np.arange(len(inputs))
+        if self.shuffle:
+            (get_rng() if self.rng is None else self.rng).shuffle(indices)
+
+        starts = np.arange(0, len(inputs), self.batch_size)
+        for start in starts:
+            idx = indices[start: start + self.batch_size]
+            yield Batch(inputs=Tensor(inputs[idx]), targets=Tensor(targets[idx]))
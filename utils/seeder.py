@@ -0,0 +1,60 @@
+"""
+Random streams.
+
+The global stream is a np.random.Generator built from a SeedSequence.
+Initializers and iterators draw from it unless they are handed their own
+Generator. Independent child streams for layers, workers or ensemble
+members are spawned from the same SeedSequence, so a seeded run draws
+the same numbers regardless of how the work is split up.
+"""
+
+import random
+
+import numpy as np
+
+_seed_seq = None
+_rng = None
+
+
+def random_seed(seed):
+    """Seed the global Generator, np.random and the random module."""
+    global _seed_seq, _rng
+    np.random.seed(seed)
+    random.seed(seed)
+    _seed_seq = np.random.SeedSequence(seed)
+    _rng = np.random.Generator(np.random.PCG64(_seed_seq))
+
+
+def _root():
+    global _seed_seq
+    if _seed_seq is None:
+        # note:unseeded runs draw fresh OS entropy
+        _seed_seq = np.random.SeedSequence()
+    return _seed_seq
+
+
+def get_rng():
+    """The global Generator."""
+    global _rng
+    if _rng is None:
+        _rng = np.random.Generator(np.random.PCG64(_root()))
+    return _rng
+
+
+def spawn_seeds(n, seed=None):
+    """
+    n independent child SeedSequences, of `seed` (an int or SeedSequence)
+    or of the global seed. Successive calls return new children.
+    """
+    if seed is None:
+        parent = _root()
+    elif isinstance(seed, np.random.SeedSequence):
+        parent = seed
+    else:
+        parent = np.random.SeedSequence(seed)
+    return parent.spawn(n)
+
+
+def spawn_rngs(n, seed=None):
+    """n independent Generators, e.g. one per worker process."""
+    return [np.random.Generator(np.random.PCG64(s)) for s in spawn_seeds(n, seed)]
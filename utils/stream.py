@@ -0,0 +1,142 @@
+"""
+Streaming data utilities: a bounded replay buffer and incremental
+normalization statistics. Both allocate once and hold O(capacity) and
+O(num_features) memory however long the stream runs.
+"""
+
+import numpy as np
+
+from core.dtype import get_default_dtype
+from utils.seeder import get_rng
+
+
+def as_batch(inputs, targets):
+    """
+    (inputs, targets) of one sample, shapes (num_in,) and (num_out,) or
+    scalar, or of a batch, shapes (n, num_in) and (n, num_out) or (n,),
+    as 2-D arrays with one row per sample.
+    """
+    inputs, targets = np.asarray(inputs), np.asarray(targets)
+    if inputs.ndim == 1:
+        return inputs[None], targets.reshape(1, -1)
+    return inputs, targets.reshape(len(inputs), -1)
+
+
+class RingBuffer(object):
+    """
+    Fixed-capacity replay buffer of (input, target) rows stored in two
+    preallocated ring arrays; once full, new rows overwrite the oldest.
+    The arrays are widened (e.g. int to float) when a later batch does not
+    fit their dtype, so no sample is truncated.
+    """
+
+    def __init__(self, capacity, rng=None):
+        self.capacity = capacity
+        self.rng = rng
+        self.inputs = None
+        self.targets = None
+        self._pos = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, inputs, targets):
+        inputs, targets = as_batch(inputs, targets)
+        if self.inputs is None:
+            self.inputs = np.empty((self.capacity,) + inputs.shape[1:], inputs.dtype)
+            self.targets = np.empty((self.capacity,) + targets.shape[1:], targets.dtype)
+        self.inputs = self._fit(self.inputs, inputs)
+        self.targets = self._fit(self.targets, targets)
+        if len(inputs) > self.capacity:
+            inputs, targets = inputs[-self.capacity:], targets[-self.capacity:]
+        n = len(inputs)
+        idx = (self._pos + np.arange(n)) % self.capacity
+        self.inputs[idx] = inputs
+        self.targets[idx] = targets
+        self._pos = (self._pos + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    @staticmethod
+    def _fit(buf, batch):
+        if np.can_cast(batch.dtype, buf.dtype, "safe"):
+            return buf
+        return buf.astype(np.result_type(buf, batch))
+
+    def sample(self, batch_size):
+        """A batch drawn uniformly (with replacement) from the stored rows."""
+        if self._size == 0:
+            raise ValueError("Cannot sample from an empty buffer.")
+        rng = get_rng() if self.rng is None else self.rng
+        idx = rng.integers(0, self._size, size=batch_size)
+        return self.inputs[idx], self.targets[idx]
+
+    def latest(self, n):
+        """The n most recently added rows, oldest first."""
+        n = min(n, self._size)
+        idx = (self._pos - n + np.arange(n)) % self.capacity
+        return self.inputs[idx], self.targets[idx]
+
+
+class RunningNormalizer(object):
+    """
+    Per-feature mean and variance of a stream, merged batch by batch with
+    the parallel variance formula (Chan et al.) in float64.
+
+    With `max_count` the weight of the history is capped at that many
+    samples, so the statistics follow a drifting stream instead of
+    freezing after a long run.
+    """
+
+    def __init__(self, eps=1e-8, max_count=None):
+        self.eps = eps
+        self.max_count = max_count
+        self.count = 0
+        self.mean = None
+        self._m2 = None
+
+    def update(self, values):
+        values = np.asarray(values, np.float64)
+        values = values.reshape(-1, values.shape[-1])
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        if self.mean is None:
+            self.count, self.mean, self._m2 = n, batch_mean, batch_m2
+            return
+        count = self.count
+        if self.max_count is not None and count > self.max_count:
+            self._m2 *= self.max_count / count
+            count = self.max_count
+        total = count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self._m2 += batch_m2 + delta ** 2 * (count * n / total)
+        self.count = total
+
+    @property
+    def var(self):
+        return self._m2 / max(self.count, 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.var + self.eps)
+
+    @staticmethod
+    def _dtype(values):
+        # note:integer feeds (counters, raw readings) come out as floats
+        return values.dtype if values.dtype.kind == "f" else get_default_dtype()
+
+    def transform(self, values):
+        values = np.asarray(values)
+        if self.mean is None:
+            return values.astype(self._dtype(values), copy=False)
+        return ((values - self.mean) / self.std).astype(self._dtype(values), copy=False)
+
+    def inverse_transform(self, values):
+        values = np.asarray(values)
+        if self.mean is None:
+            return values.astype(self._dtype(values), copy=False)
+        return (values * self.std + self.mean).astype(self._dtype(values), copy=False)